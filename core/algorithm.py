@@ -1,5 +1,45 @@
 # -*- coding: utf-8 -*-
+import copy
+import json
+import numpy as np
+from core.parallelizer import parallel_task
 from core.population import Population
+from core.checkpoint import get_random_states, set_random_states
+from core.rng import MAX_SEED
+
+
+@parallel_task
+def breed_offspring_parallel(**kwargs):
+    """
+    Crossover and mutation of a single pair of parents, picked by index
+    from broadcasted genome matrix, and fitness of both offspring.
+    Randomizers are seeded per task (integer or key of 'RandomStreams'),
+    so offspring do not depend on which worker breeds them.
+    The randomizer is set on task's own crossover and chromosomes
+    (inherited by their offspring), never on shared classes, so tasks
+    can run in threads. Returns [(genes, fitness), ...].
+    """
+    phenotype = kwargs['phenotype']
+    genomes = kwargs['breeding_genomes']
+    prototype = kwargs['breeding_prototype']
+
+    randomizer = np.random.RandomState(kwargs['seed'])
+    crossover = copy.copy(kwargs['breeding_crossover'])
+    crossover._randomizer = randomizer
+    parents = []
+    for index in kwargs['parents']:
+        chromosome = prototype.from_array(genomes[index])
+        chromosome._randomizer = randomizer
+        parents.append(phenotype(chromosome=chromosome))
+
+    offspring = crossover.run(*parents)
+    for individual in offspring:
+        individual.mutate(kwargs['breeding_mutation_rate'])
+
+    return [
+        (individual.chromosome.to_array(), individual._calculate_fitness())
+        for individual in offspring
+    ]
 
 
 class Algorithm(object):
@@ -10,7 +50,14 @@ class Algorithm(object):
                  population_size=10,
                  mutation_rate=0.01,
                  elitism_count=0,
-                 parallelizer=None):
+                 parallelizer=None,
+                 population_class=Population,
+                 fitness_cache=None,
+                 checkpoint=None,
+                 timings_file=None,
+                 worker_breeding=False,
+                 batch_breeding=False,
+                 random_streams=None):
         # Classes
         self.phenotype = phenotype
 
@@ -25,7 +72,34 @@ class Algorithm(object):
 
         # Etc
         self._parallelizer = parallelizer
+        # Population or ArrayPopulation
+        self._population_class = population_class
+        # Optional FitnessCache shared by all generations
+        self._fitness_cache = fitness_cache
+        # Optional Checkpoint to periodically save state to and resume from
+        self._checkpoint = checkpoint
+        # Optional file to append per-generation phase timings to,
+        # as JSON lines
+        self._timings_file = timings_file
+        # Workers breed offspring from parent indexes
+        # (see 'breed_offspring_parallel'), master only selects
+        self._worker_breeding = worker_breeding
+        # Offspring are bred as genome matrices (see 'Crossover.run_batch'),
+        # without creating individuals
+        self._batch_breeding = batch_breeding
+        if batch_breeding and not crossover.batch_matrices:
+            raise ValueError(
+                "Batch breeding needs crossover of genome matrices")
+        # Optional RandomStreams: GA operators get new randomizers
+        # every generation and worker breeding tasks their own streams,
+        # so a run is reproduced from the seed alone
+        self._random_streams = random_streams
+        self._generation = 0
         self._population = None
+
+        # Per-generation statistics collected by caller,
+        # saved into checkpoint together with algorithm state
+        self.iteration_stats = []
         # Odd elitist size - selection/crossover/mutation is done in pairs
         # so eventually the new population will get one extra individual
         # which needs to be dealt with
@@ -38,34 +112,57 @@ class Algorithm(object):
     def population(self):
         return self._population
 
+    def _create_population(self, size=0):
+        return self._population_class(
+            self.phenotype,
+            size=size,
+            parallelizer=self._parallelizer,
+            fitness_cache=self._fitness_cache)
+
     def _next_population(self):
+        if self._worker_breeding:
+            return self._next_population_bred_by_workers()
+        if self._batch_breeding:
+            return self._next_population_bred_in_batch()
+
         # Start with an empty population
-        new_population = Population(
-            self.phenotype,
-            size=0,
-            parallelizer=self._parallelizer)
+        new_population = self._create_population()
+        timer = new_population.timer
 
         # Pick best individuals from previous population if necessary
+        timer.switch('sorting')
         new_population += self.population.best_individuals(
             self.elitism_count)
 
-        # Form the new population
-        while len(new_population) < self.population_size:
-            # Selection
-            individual1 = self._selection.run(self.population)
-            individual2 = self._selection.run(self.population)
+        # Selection: parents of all offspring pairs at once
+        timer.switch('selection')
+        pair_count = max(
+            0, (self.population_size - len(new_population) + 1) // 2)
+        parents = self._selection.select(self.population, pair_count * 2)
+
+        # Workers evaluate offspring while the rest is being bred
+        pipelined = (
+            self._parallelizer is not None and self._parallelizer.pipelined)
 
+        # Form the new population
+        for individual1, individual2 in zip(parents[0::2], parents[1::2]):
             # Crossover
             # Individuals are copied, regardless of whether
             # crossover actually occurs.
+            timer.switch('crossover')
             offspring1, offspring2 = self._crossover.run(
                 individual1, individual2)
 
             # Mutation
+            timer.switch('mutation')
             offspring1.mutate(self.mutation_rate)
             offspring2.mutate(self.mutation_rate)
 
+            timer.switch('bookkeeping')
             new_population += [offspring1, offspring2]
+            if pipelined:
+                size = len(new_population)
+                new_population.start_evaluation([size - 2, size - 1])
 
         # If elitism param is odd number, the new population might have got
         # one extra individual. Remove the worst?
@@ -77,6 +174,126 @@ class Algorithm(object):
 
         return new_population
 
+    def _next_population_bred_in_batch(self):
+        """
+        Same as '_next_population', but crossover and mutation are done
+        for all offspring at once, on genome matrix of the population
+        """
+        population = self.population
+        new_population = self._create_population()
+        timer = new_population.timer
+
+        timer.switch('sorting')
+        new_population += population.best_individuals(self.elitism_count)
+
+        timer.switch('selection')
+        pair_count = max(
+            0, (self.population_size - len(new_population) + 1) // 2)
+        parents = self._selection.select_indices(population, pair_count * 2)
+        if parents is None:
+            raise ValueError(
+                "Batch breeding needs selection of population indexes")
+
+        timer.switch('crossover')
+        genomes = population.genomes
+        prototype = population.chromosome(0)
+        offspring1, offspring2 = self._crossover.run_batch(
+            genomes[parents[0::2]], genomes[parents[1::2]],
+            prototype=prototype)
+        # Pairs stay next to each other, as in '_next_population'
+        offspring = np.empty(
+            (2 * pair_count,) + offspring1.shape[1:], offspring1.dtype)
+        offspring[0::2] = offspring1
+        offspring[1::2] = offspring2
+
+        timer.switch('mutation')
+        offspring = prototype.mutate_array(offspring, self.mutation_rate)
+
+        timer.switch('bookkeeping')
+        new_population.add_genomes(offspring, None, prototype)
+
+        if self._remove_extra_individual is True:
+            new_population.calculate_fitness(
+                truncate_if_above=self.population_size)
+        else:
+            new_population.calculate_fitness()
+
+        return new_population
+
+    def _next_population_bred_by_workers(self):
+        """
+        Same as '_next_population', but the master broadcasts genome
+        matrix once and sends only parent indexes and random seeds.
+        Fitness cache is not used, offspring are evaluated where bred.
+        """
+        population = self.population
+        new_population = self._create_population()
+        timer = new_population.timer
+
+        timer.switch('sorting')
+        new_population += population.best_individuals(self.elitism_count)
+
+        timer.switch('selection')
+        pair_count = max(
+            0, (self.population_size - len(new_population) + 1) // 2)
+        parents = self._selection.select_indices(population, pair_count * 2)
+        if parents is None:
+            raise ValueError(
+                "Worker breeding needs selection of population indexes")
+        # Drawn by master, so the run can be reproduced
+        if self._random_streams is not None:
+            seeds = [
+                self._random_streams.key('breeding', self._generation, pair)
+                for pair in xrange(pair_count)
+            ]
+        else:
+            seeds = self._crossover._randomizer.randint(
+                MAX_SEED, size=pair_count).tolist()
+
+        timer.switch('dispatch')
+        prototype = population.chromosome(0)
+        data = {
+            'breeding_genomes': population.genomes,
+            'breeding_prototype': prototype,
+            'breeding_crossover': self._crossover,
+            'breeding_mutation_rate': self.mutation_rate,
+        }
+        tasks = [
+            (pair, {'parents': tuple(parent_pair), 'seed': seed})
+            for pair, (parent_pair, seed) in enumerate(zip(
+                parents.reshape(-1, 2).tolist(), seeds))
+        ]
+        if self._parallelizer is None:
+            data['phenotype'] = self.phenotype
+            results = [
+                (pair, breed_offspring_parallel(**dict(kwargs, **data)))
+                for pair, kwargs in tasks
+            ]
+        else:
+            self._parallelizer.broadcast(**data)
+            self._parallelizer.start_prepared_tasks(
+                'breed_offspring_parallel', tasks)
+            timer.switch('wait')
+            results = list(self._parallelizer.finished_tasks())
+
+        timer.switch('bookkeeping')
+        offspring = [None] * pair_count
+        for pair, pair_offspring in results:
+            offspring[pair] = pair_offspring
+        offspring = [child for pair in offspring for child in pair]
+        new_population.add_genomes(
+            [genes for genes, _ in offspring],
+            [fitness for _, fitness in offspring],
+            prototype)
+
+        if self._remove_extra_individual is True:
+            new_population.calculate_fitness(
+                truncate_if_above=self.population_size)
+        else:
+            new_population.calculate_fitness()
+
+        return new_population
+
     def run(self, generations=None):
         """
         Runs genetic algorithm for a number of iterations,
@@ -84,28 +301,268 @@ class Algorithm(object):
         If iteration count is not specified, algorithm would run
         until terminated explicitly.
         Yields current population AND generation number.
+        Per-generation timing record (seconds spent in each phase) is not
+        yielded as a third item, so that existing 'for population,
+        generation in run()' loops keep working. Read it from yielded
+        population instead, as 'population.timings', or from JSON lines
+        written to 'timings_file'.
         """
         if generations is not None and generations < 1:
             raise ValueError(
                 "Generation count must be positive, non-zero integer")
 
-        # Initial random population for generation-0:
-        self._population = Population(
-            self.phenotype,
-            self.population_size,
-            parallelizer=self._parallelizer)
+        if self._checkpoint is not None and self._checkpoint.exists():
+            # Continue interrupted run
+            generation = self._restore_checkpoint()
+        else:
+            # Initial random population for generation-0:
+            self._install_streams(0)
+            self._population = self._create_population(self.population_size)
+            self._population.calculate_fitness()
+            generation = 0
+
+        # Run specified amount of iterations or indefinitely
+        while generations is None or generation < generations:
+            self._install_streams(generation + 1)
+            self._population = self._next_population()
+            generation += 1
+            if self._timings_file is not None:
+                self._write_timings(generation)
+            yield self.population, generation
+
+            # Caller has already processed this generation
+            if self._checkpoint is not None:
+                if self._checkpoint.due(generation):
+                    self._save_checkpoint(generation)
+
+    def _install_streams(self, generation):
+        """
+        Randomizers of the specified generation, if using RandomStreams
+        """
+        self._generation = generation
+        if self._random_streams is not None:
+            self._random_streams.install(generation)
+
+    def _write_timings(self, generation):
+        """
+        Append phase timings of the current generation as a JSON line
+        """
+        record = self.population.timings
+        record['generation'] = generation
+        with open(self._timings_file, 'a') as fp:
+            fp.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def _save_checkpoint(self, generation):
+        """
+        Population genomes and fitness, generation number,
+        randomizer states and collected statistics
+        """
+        population = self.population
+        genomes = np.array([
+            population.chromosome(index).to_array()
+            for index in xrange(len(population))
+        ])
+        self._checkpoint.save(
+            generation=generation,
+            genomes=genomes,
+            fitness=population.fitness_values,
+            iteration_stats=json.dumps(self.iteration_stats),
+            **get_random_states())
+
+    def _restore_checkpoint(self):
+        """
+        Restore state saved by '_save_checkpoint',
+        return the number of last completed generation
+        """
+        state = self._checkpoint.load()
+
+        # Any new chromosome serves as a template for saved genomes.
+        # Creating it consumes random numbers, so restore randomizers later
+        prototype = self.phenotype().chromosome
+        self._population = self._create_population()
+        for genes, fitness in zip(state['genomes'], state['fitness']):
+            individual = self.phenotype(
+                chromosome=prototype.from_array(genes))
+            individual.fitness = float(fitness)
+            self._population += individual
         self._population.calculate_fitness()
 
-        # Run specified amount of iterations
-        if generations:
-            for generation in xrange(1, generations + 1):
-                self._population = self._next_population()
-                yield self.population, generation
+        self.iteration_stats = json.loads(str(state['iteration_stats']))
+        set_random_states(state)
+        return int(state['generation'])
+
+
+class SteadyStateAlgorithm(Algorithm):
+    """
+    Asynchronous steady state GA without generation barrier.
+    As soon as any worker returns fitness of an offspring, it is inserted
+    into population according to replacement policy and a new offspring
+    is bred and dispatched, so workers never wait for each other.
+    Every 'population_size' evaluations make one pseudo-generation.
+
+    Replacement policies:
+    : 'worst' - offspring always replaces the worst individual
+    : 'worst_if_better' - only if offspring is fitter than the worst one
+    """
+    REPLACEMENT_POLICIES = ('worst', 'worst_if_better')
+
+    def __init__(self, *args, **kwargs):
+        if kwargs.get('checkpoint') is not None:
+            raise ValueError("Steady state algorithm can not be checkpointed")
+        if kwargs.get('worker_breeding'):
+            raise ValueError("Steady state algorithm breeds on master")
+        if kwargs.get('batch_breeding'):
+            raise ValueError("Steady state algorithm breeds one by one")
+        if kwargs.get('random_streams') is not None:
+            raise ValueError(
+                "Steady state algorithm depends on worker timing")
+        if kwargs.get('timings_file') is not None:
+            raise ValueError(
+                "Steady state algorithm does not record generation timings")
+        replacement = kwargs.pop('replacement', 'worst')
+        if replacement not in self.REPLACEMENT_POLICIES:
+            raise ValueError("Unknown replacement policy: %s" % replacement)
+        self.replacement = replacement
+        super(SteadyStateAlgorithm, self).__init__(*args, **kwargs)
+
+        # Fitness evaluations since the start of the run
+        self.evaluations = 0
+
+        # Bred offspring waiting to be dispatched
+        self._offspring = []
+        # Dispatched offspring by task ID
+        self._running = {}
+        # Results available without waiting for workers
+        self._finished = []
+        self._task_count = 0
+        # Fitness cache use in the current pseudo-generation
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def _breed(self):
+        """
+        New mutated offspring, bred in pairs
+        """
+        if not self._offspring:
+            parent1, parent2 = self._selection.select(self.population, 2)
+            self._offspring = list(self._crossover.run(parent1, parent2))
+            for offspring in self._offspring:
+                offspring.mutate(self.mutation_rate)
+        return self._offspring.pop()
+
+    def _dispatch(self, offspring):
+        """
+        Start fitness calculation of a single offspring
+        """
+        task_id = self._task_count
+        self._task_count += 1
+        self._running[task_id] = offspring
+
+        if self._fitness_cache is not None:
+            fitness = self._fitness_cache.get(
+                self._fitness_cache.key(offspring.chromosome))
+            if fitness is not None:
+                self._cache_hits += 1
+                self._finished.append((task_id, fitness))
+                return
+            self._cache_misses += 1
 
-        # Run indefintely
+        if self._parallelizer is None:
+            # Serial evaluation
+            self._finished.append((task_id, offspring._calculate_fitness()))
         else:
-            generation = 0
-            while True:
-                self._population = self._next_population()
-                generation += 1
-                yield self.population, generation
+            self._parallelizer.start_prepared_task(
+                task_id, 'calculate_fitness_parallel',
+                chromosome=offspring.chromosome)
+
+    def _next_evaluated(self):
+        """
+        Wait for any offspring to get its fitness
+        """
+        if self._finished:
+            task_id, fitness = self._finished.pop(0)
+        else:
+            task_id, fitness = self._parallelizer.next_finished_task()
+
+        offspring = self._running.pop(task_id)
+        offspring.fitness = fitness
+        if self._fitness_cache is not None:
+            self._fitness_cache.put(
+                self._fitness_cache.key(offspring.chromosome), fitness)
+        return offspring
+
+    def _insert(self, offspring):
+        """
+        Apply replacement policy
+        """
+        worst_index = self.population.worst_index
+        if self.replacement == 'worst_if_better':
+            worst_fitness = self.population.fitness_values[worst_index]
+            if offspring.fitness <= worst_fitness:
+                return
+        self.population.replace(worst_index, offspring)
+
+    def _publish_statistics(self):
+        """
+        Cache use and worker metrics of the last pseudo-generation,
+        where generational algorithm has them after each evaluation
+        """
+        if self._fitness_cache is not None:
+            count = self._cache_hits + self._cache_misses
+            self.population.cache_statistics = {
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'hit_rate': (
+                    float(self._cache_hits) / count if count else 0.0),
+                'size': len(self._fitness_cache),
+            }
+            self._cache_hits = self._cache_misses = 0
+        if self._parallelizer is not None:
+            self._parallelizer.snapshot_metrics()
+
+    def run(self, generations=None):
+        """
+        Same as in generational algorithm, but the same (updated)
+        population instance is yielded after each pseudo-generation.
+        Evaluation count is available as 'evaluations' attribute.
+        """
+        if generations is not None and generations < 1:
+            raise ValueError(
+                "Generation count must be positive, non-zero integer")
+
+        # Initial random population is evaluated as usual
+        self._population = self._create_population(self.population_size)
+        self._population.calculate_fitness()
+        self.evaluations = 0
+        self._cache_hits = self._cache_misses = 0
+
+        if self._parallelizer is None:
+            worker_count = 1
+        else:
+            worker_count = self._parallelizer.worker_count
+
+        generation = 0
+        try:
+            # Keep every worker busy
+            for _ in xrange(worker_count):
+                self._dispatch(self._breed())
+
+            while generations is None or generation < generations:
+                self._insert(self._next_evaluated())
+                self.evaluations += 1
+
+                # Replace finished task immediately
+                self._dispatch(self._breed())
+
+                if self.evaluations % self.population_size == 0:
+                    generation += 1
+                    self._publish_statistics()
+                    yield self.population, generation
+        finally:
+            # Discard offspring still being evaluated
+            if self._parallelizer is not None:
+                for _ in self._parallelizer.finished_tasks():
+                    pass
+            self._running = {}
+            self._finished = []
+            self._offspring = []
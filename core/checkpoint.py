@@ -0,0 +1,103 @@
+import os
+import time
+import numpy as np
+from core.rng import RANDOMIZERS
+
+
+def get_random_states():
+    """
+    States of all GA operator randomizers (see 'RANDOMIZERS')
+    and of the global one (np.random, saved as 'numpy') as numpy arrays
+    """
+    states = {}
+    randomizers = dict(
+        (name, owner._randomizer) for name, owner in RANDOMIZERS.items())
+    randomizers['numpy'] = np.random
+    for name, randomizer in randomizers.items():
+        _, keys, position, has_gauss, cached_gaussian = randomizer.get_state()
+        states['rng_%s_keys' % name] = keys
+        states['rng_%s_rest' % name] = np.array(
+            [position, has_gauss, cached_gaussian], dtype=float)
+    return states
+
+
+def set_random_states(states):
+    """
+    Counterpart of 'get_random_states'
+    """
+    randomizers = dict(
+        (name, owner._randomizer) for name, owner in RANDOMIZERS.items())
+    randomizers['numpy'] = np.random
+    for name, randomizer in randomizers.items():
+        keys = states['rng_%s_keys' % name]
+        position, has_gauss, cached_gaussian = states['rng_%s_rest' % name]
+        randomizer.set_state((
+            'MT19937', keys,
+            int(position), int(has_gauss), float(cached_gaussian)))
+
+
+class Checkpoint(object):
+    """
+    Binary (.npz) snapshot of a running algorithm, written every
+    'interval' generations. Each snapshot is a full one (population
+    genomes change every generation, so there is little to save
+    incrementally), written into a temporary file which then replaces
+    the previous one, so an interrupted write never corrupts existing
+    checkpoint.
+    Snapshots are skipped while time spent saving would exceed
+    'max_overhead' fraction of time spent running, which matters
+    for generations not much longer than the snapshot itself
+    (None - always save on interval). Skipped snapshots are counted
+    in 'skipped_count', as an interrupted run then loses more
+    generations than 'interval'.
+    """
+    def __init__(self, filepath, interval=1, max_overhead=0.01):
+        self.filepath = filepath
+        self.interval = interval
+        self.max_overhead = max_overhead
+
+        # Seconds spent writing the last snapshot
+        self.save_time = None
+        self._saved_at = None
+        # Snapshots skipped because of 'max_overhead'
+        self.skipped_count = 0
+
+    def exists(self):
+        return os.path.isfile(self.filepath)
+
+    def due(self, generation):
+        if generation % self.interval != 0:
+            return False
+        if self.max_overhead is None or self.save_time is None:
+            return True
+        elapsed = time.time() - self._saved_at
+        if self.save_time <= self.max_overhead * elapsed:
+            return True
+        self.skipped_count += 1
+        return False
+
+    def save(self, **arrays):
+        """
+        Atomically replace checkpoint with specified named arrays
+        """
+        start = time.time()
+        temp_filepath = self.filepath + '.tmp'
+        with open(temp_filepath, 'wb') as fp:
+            np.savez(fp, **arrays)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.rename(temp_filepath, self.filepath)
+        self._saved_at = time.time()
+        self.save_time = self._saved_at - start
+
+    def load(self):
+        """
+        Dictionary of all saved arrays
+        """
+        with open(self.filepath, 'rb') as fp:
+            archive = np.load(fp)
+            return dict((name, archive[name]) for name in archive.files)
+
+    def remove(self):
+        if self.exists():
+            os.remove(self.filepath)
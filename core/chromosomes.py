@@ -9,6 +9,9 @@ class Chromosome(object):
         Abstract base class for all types of chromosomes.
         Instances are considered immutable and all operations
         (mutate, split, concat) return new chromosomes.
+        Parameters (e.g. min/max) are shared by derived chromosomes,
+        slices and copies share content as well, until one of them
+        changes it (copy-on-write, see '__setitem__').
     """
     __metaclass__ = ABCMeta
 
@@ -16,6 +19,9 @@ class Chromosome(object):
     # This helps to unit test the code dealing with random data.
     _randomizer = np.random.RandomState()
 
+    # Content might be referenced (viewed) by other chromosomes
+    _shared = False
+
     def __init__(self, content):
         self._content = content
 
@@ -24,14 +30,22 @@ class Chromosome(object):
         Mutate each chromosome gene with specified probability
         and return a new chromosome
         """
-        new_chromosome = self[:]
-        for index, gene in enumerate(new_chromosome):
-            # Draw a random number from [0, 1)
-            do_mutation = self._randomizer.random_sample() < rate
-            if do_mutation:
-                new_chromosome._content[index] = self._mutate_gene(gene, index)
+        return self.from_array(self.mutate_array(self.to_array(), rate))
 
-        return new_chromosome
+    def mutate_array(self, genes, rate):
+        """
+        Mutate genes of a single chromosome (1-D array) or of
+        a whole population genome matrix (2-D array) at once:
+        one Bernoulli mask draw for all genes and one replacement draw
+        for the genes hit. Returns a new array.
+        """
+        genes = np.array(genes)
+        # Draw random numbers from [0, 1) for all genes
+        hits = np.nonzero(self._randomizer.random_sample(genes.shape) < rate)
+        if len(hits[0]) > 0:
+            # Last coordinate is the gene index within chromosome
+            genes[hits] = self._mutate_genes(genes[hits], hits[-1])
+        return genes
 
     def split(self, split_point):
         """
@@ -53,14 +67,12 @@ class Chromosome(object):
             chromo2 = self[split_point:]
             return chromo1, chromo2
 
-    def concat(self, other):
+    def concat(self, *others):
         """
-        Concatenates this chromosome with another.
+        Concatenates this chromosome with others, into a single new one.
         Used in crossover.
         """
-        new_chromosome = copy.deepcopy(self)
-        new_chromosome._content = self._concat_genes(other)
-        return new_chromosome
+        return self._derive(self._concat_genes(*others))
 
     @abstractmethod
     def _mutate_gene(self, gene, index):
@@ -69,12 +81,73 @@ class Chromosome(object):
         """
         pass
 
-    @abstractmethod
-    def _concat_genes(self, gene, index):
+    def _mutate_genes(self, genes, indexes):
         """
-        Concatenate genetic content
+        Mutate several genes (array) located at specified indexes.
+        Implementations should override this with a vectorized version.
         """
-        pass
+        return np.array([
+            self._mutate_gene(gene, index)
+            for gene, index in zip(genes, indexes)
+        ])
+
+    def _concat_genes(self, *others):
+        """
+        Concatenate genetic content, with a single allocation
+        """
+        return np.concatenate(
+            [self._content] + [other._content for other in others])
+
+    def to_array(self):
+        """
+        Genes as a flat numpy array, e.g. a row of population genome matrix
+        """
+        return np.asarray(self._content)
+
+    def from_array(self, genes):
+        """
+        New chromosome of the same kind and parameters,
+        holding specified genes. Counterpart of 'to_array'.
+        """
+        return self._derive(np.array(genes))
+
+    def to_wire(self):
+        """
+        Flat numpy array sent to workers by typed transport
+        (see 'Parallelizer.start_array_tasks'), genes by default
+        """
+        return self.to_array()
+
+    def from_wire(self, row):
+        """
+        Counterpart of 'to_wire'
+        """
+        return self.from_array(row)
+
+    def _derive(self, content, shared=False):
+        """
+        Chromosome of the same kind, sharing parameters with this one,
+        holding specified content. Shared content (e.g. view of this
+        chromosome's array) gets copied by the first one changing it.
+        """
+        new_chromosome = object.__new__(type(self))
+        new_chromosome.__dict__.update(self.__dict__)
+        new_chromosome._content = content
+        new_chromosome._shared = shared
+        if shared:
+            self._shared = True
+        return new_chromosome
+
+    def _own_content(self):
+        """
+        Make content safe to change in place
+        """
+        if self._shared:
+            self._content = copy.copy(self._content)
+            self._shared = False
+
+    def __copy__(self):
+        return self._derive(self._content, shared=True)
 
     def pick_split_point(self):
         """
@@ -96,15 +169,14 @@ class Chromosome(object):
 
     def __getitem__(self, key):
         if isinstance(key, slice):
-            # Return a chromosome
-            new_chromosome = copy.deepcopy(self)
-            new_chromosome._content = self._content.__getitem__(key)
-            return new_chromosome
+            # Return a chromosome, viewing the same genes
+            return self._derive(self._content.__getitem__(key), shared=True)
         else:
             # Return one gene
             return self._content.__getitem__(key)
 
     def __setitem__(self, key, value):
+        self._own_content()
         self._content.__setitem__(key, value)
 
 
@@ -128,11 +200,18 @@ class _FixedIntegerChromosome(Chromosome):
         return self._randomizer.random_integers(
             self.min_val, self.max_val, 1)
 
-    def _concat_genes(self, other):
+    def _mutate_genes(self, genes, indexes):
+        return self._randomizer.random_integers(
+            self.min_val, self.max_val, len(indexes))
+
+    def active_genes(self):
         """
-        Concatenate both numpy arrays
+        All genes are active, see '_VarIntegerChromosome'
         """
-        return np.concatenate((self[:], other[:]))
+        return self._content
+
+    def active_gene_count(self):
+        return len(self._content)
 
 
 class _VarIntegerChromosome(Chromosome):
@@ -144,8 +223,11 @@ class _VarIntegerChromosome(Chromosome):
     Genes are deactivated either in initial random-string generation
     or in mutation, in addition to usual random integer picking from
     min/max interval.
+    Genes are kept in an integer array, together with boolean array
+    of active genes (both shared copy-on-write, as chromosome content).
     Iterating such chromosome only yields active genes,
-    but length and indexer methods work with all genes in a standard way.
+    but length and indexer methods work with all genes in a standard way,
+    inactive genes being None.
     """
     def __init__(self, length, min_val, max_val, null_gene_rate):
         self.length = length
@@ -154,13 +236,13 @@ class _VarIntegerChromosome(Chromosome):
         self.null_gene_rate = null_gene_rate
 
         # Generate integer array as in ordinary integer chromosome
-        initial_genes = list(self._randomizer.random_integers(
-            self.min_val, self.max_val, self.length))
+        initial_genes = self._randomizer.random_integers(
+            self.min_val, self.max_val, self.length)
 
         # Randomly disable some of the genes
-        for idx, gene in enumerate(initial_genes):
-            if self._randomizer.random_sample() < self.null_gene_rate:
-                initial_genes[idx] = None
+        self._active = (
+            self._randomizer.random_sample(self.length) >=
+            self.null_gene_rate)
 
         # Finalize creation
         super(_VarIntegerChromosome, self).__init__(initial_genes)
@@ -174,25 +256,75 @@ class _VarIntegerChromosome(Chromosome):
             return None
         else:
             return self._randomizer.random_integers(
-                self.min_val, self.max_val, 1)
+                self.min_val, self.max_val)
 
-    def _concat_genes(self, other):
+    def _mutate_genes(self, genes, indexes):
         """
-        Concatenate two simple lists
+        Genes come from 'to_array', so inactive ones are (min_val - 1)
         """
-        return self._content + other._content
+        count = len(indexes)
+        deactivated = (
+            self._randomizer.random_sample(count) < self.null_gene_rate)
+        new_genes = self._randomizer.random_integers(
+            self.min_val, self.max_val, count)
+        new_genes[deactivated] = self.min_val - 1
+        return new_genes
+
+    def concat(self, *others):
+        new_chromosome = super(_VarIntegerChromosome, self).concat(*others)
+        new_chromosome._active = np.concatenate(
+            [self._active] + [other._active for other in others])
+        return new_chromosome
+
+    def _own_content(self):
+        if self._shared:
+            self._active = self._active.copy()
+        super(_VarIntegerChromosome, self)._own_content()
 
     def __iter__(self):
         """
-        Enumerate active (non-None) genes
+        Enumerate active genes
         """
-        for idx in xrange(len(self)):
-            gene = self[idx]
-            if gene is not None:
-                yield gene
+        return iter(self.active_genes())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            new_chromosome = super(_VarIntegerChromosome, self).__getitem__(
+                key)
+            new_chromosome._active = self._active[key]
+            return new_chromosome
+        if not self._active[key]:
+            return None
+        return int(self._content[key])
+
+    def __setitem__(self, key, value):
+        self._own_content()
+        if value is None:
+            self._active[key] = False
+        else:
+            self._content[key] = value
+            self._active[key] = True
+
+    def active_genes(self):
+        """
+        Array of active genes, in chromosome order
+        """
+        return self._content[self._active]
 
     def active_gene_count(self):
-        return len([active_gene for active_gene in self])
+        return int(np.count_nonzero(self._active))
+
+    def to_array(self):
+        """
+        Inactive genes are stored as (min_val - 1)
+        """
+        return np.where(self._active, self._content, self.min_val - 1)
+
+    def from_array(self, genes):
+        genes = np.array(genes)
+        new_chromosome = self._derive(genes)
+        new_chromosome._active = genes >= self.min_val
+        return new_chromosome
 
 
 class IntegerChromosome(object):
@@ -248,18 +380,54 @@ class IntListChromosome(Chromosome):
         return self._randomizer.random_integers(
             self.min_val, self.max_val, 1)
 
-    def _concat_genes(self, other):
-        """
-        Concatenate both numpy arrays
-        """
-        return np.concatenate((self[:], other[:]))
+
+def _tail_mask(length):
+    """
+    Mask of valid bits in the last byte of packed bits
+    """
+    return (0xFF << (-length % 8)) & 0xFF
+
+
+def _shift_bits(words, start, length):
+    """
+    Packed bits [start, start + length) of packed 'words',
+    moved to the beginning of a new byte array
+    """
+    first, offset = divmod(start, 8)
+    count = (length + 7) // 8
+    if offset == 0:
+        bits = words[first:first + count].copy()
+    else:
+        # One more byte for the bits shifted in from the right
+        padded = np.zeros(count + 1, dtype=np.uint8)
+        tail = words[first:first + count + 1]
+        padded[:len(tail)] = tail
+        bits = (padded[:-1] << offset) | (padded[1:] >> (8 - offset))
+    if count:
+        bits[-1] &= _tail_mask(length)
+    return bits
 
 
 class BinaryChromosome(Chromosome):
+    """
+    Bits are packed into bytes (most significant bit first),
+    with unused bits of the last byte always zero.
+    'to_array' and 'from_array' work with one bit per array element,
+    as do genome matrices. Splicing and mutation work on packed bytes,
+    which are also sent to workers, together with length ('to_wire').
+    """
     def __init__(self, initial_length):
-        # Numpy array of bits
-        super(BinaryChromosome, self).__init__(
-            self._randomizer.randint(2, size=initial_length))
+        self.length = initial_length
+        super(BinaryChromosome, self).__init__(np.packbits(
+            self._randomizer.randint(2, size=initial_length)))
+
+    def mutate(self, rate):
+        """
+        Flip bits by XOR with random mask
+        """
+        hits = self._randomizer.random_sample(self.length) < rate
+        return self._derive(
+            self._content ^ np.packbits(hits.view(np.uint8)))
 
     def _mutate_gene(self, gene, index):
         """
@@ -267,14 +435,136 @@ class BinaryChromosome(Chromosome):
         """
         return 1 - gene
 
-    def _concat_genes(self, other):
+    def _mutate_genes(self, genes, indexes):
+        return 1 - genes
+
+    def concat(self, *others):
+        new_chromosome = self._derive(self._concat_genes(*others))
+        new_chromosome.length = self.length + sum(
+            other.length for other in others)
+        return new_chromosome
+
+    def _concat_genes(self, *others):
+        """
+        Bytes of each chromosome shifted right by the number
+        of bits used in the last byte of the preceding ones
+        """
+        parts = (self,) + others
+        length = sum(part.length for part in parts)
+        words = np.zeros((length + 7) // 8, dtype=np.uint8)
+        position = 0
+        for part in parts:
+            first, offset = divmod(position, 8)
+            part_words = part._content
+            end = first + len(part_words)
+            if offset == 0:
+                words[first:end] = part_words
+            else:
+                words[first:end] |= part_words >> offset
+                low = (part_words << (8 - offset)) & 0xFF
+                end = min(end + 1, len(words))
+                words[first + 1:end] |= low[:end - first - 1]
+            position += part.length
+        return words
+
+    def to_array(self):
+        return np.unpackbits(self._content)[:self.length]
+
+    def from_array(self, genes):
+        new_chromosome = self._derive(np.packbits(
+            (np.asarray(genes) != 0).view(np.uint8)))
+        new_chromosome.length = len(genes)
+        return new_chromosome
+
+    def to_wire(self):
         """
-        Concatenate both numpy arrays
+        Length (int64 as bytes), followed by packed bits
         """
-        return np.concatenate((self[:], other[:]))
+        return np.concatenate((
+            np.array([self.length], dtype=np.int64).view(np.uint8),
+            self._content))
+
+    def from_wire(self, row):
+        row = np.asarray(row, dtype=np.uint8)
+        new_chromosome = self._derive(row[8:].copy())
+        new_chromosome.length = int(row[:8].view(np.int64)[0])
+        return new_chromosome
+
+    def to_ints(self, width, gray=False):
+        """
+        Unsigned integers encoded by consecutive 'width' bit fields,
+        optionally in Gray code
+        """
+        if width > 63 or self.length % width != 0:
+            raise ValueError(
+                "Invalid integer width for chromosome of length %i" %
+                self.length)
+        bits = self.to_array().reshape(-1, width)
+        if gray:
+            # Binary bit is XOR of all Gray code bits up to it
+            bits = np.bitwise_xor.accumulate(bits, axis=1)
+        weights = 2 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+        return bits.astype(np.int64).dot(weights)
+
+    def __eq__(self, other):
+        return (
+            self.length == other.length and
+            (self._content == other._content).all())
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.to_array())
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.length)
+            if step != 1:
+                return self.from_array(self.to_array()[key])
+            length = max(stop - start, 0)
+            if start % 8 == 0 and (length % 8 == 0 or stop == self.length):
+                # Whole bytes, padding included: view
+                first = start // 8
+                new_chromosome = self._derive(
+                    self._content[first:first + (length + 7) // 8],
+                    shared=True)
+            else:
+                new_chromosome = self._derive(
+                    _shift_bits(self._content, start, length))
+            new_chromosome.length = length
+            return new_chromosome
+        index = self._bit_index(key)
+        return (self._content[index >> 3] >> (7 - (index & 7))) & 1
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            genes = self.to_array()
+            genes[key] = value
+            self._content = self.from_array(genes)._content
+            self._shared = False
+            return
+        self._own_content()
+        index = self._bit_index(key)
+        bit = 0x80 >> (index & 7)
+        if value:
+            self._content[index >> 3] |= bit
+        else:
+            self._content[index >> 3] &= ~bit & 0xFF
+
+    def _bit_index(self, key):
+        index = int(key)
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("Bit index out of range")
+        return index
 
     def __repr__(self):
-        return ''.join(str(int(c)) for c in self)
+        return (self.to_array() + ord('0')).tostring()
 
 
 class RealChromosome(Chromosome):
@@ -285,14 +575,16 @@ class RealChromosome(Chromosome):
 
         if content is None:
             # Generate random initial values
-            content = np.random.uniform(self.min_val, self.max_val, self.length)
+            content = self._randomizer.uniform(
+                self.min_val, self.max_val, self.length)
         super(RealChromosome, self).__init__(content)
 
     def _mutate_gene(self, gene, index):
-        return np.random.uniform(self.min_val, self.max_val)
+        return self._randomizer.uniform(self.min_val, self.max_val)
 
-    def _concat_genes(self, other):
-        return np.concatenate((self[:], other[:]))
+    def _mutate_genes(self, genes, indexes):
+        return self._randomizer.uniform(
+            self.min_val, self.max_val, len(indexes))
 
 
 class RealStatChromosome(Chromosome):
@@ -307,7 +599,7 @@ class RealStatChromosome(Chromosome):
             # Draw random numbers from different distribution
             # for each index
             content = [
-                np.random.normal(
+                self._randomizer.normal(
                     self.means[idx],
                     np.sqrt(self.variances[idx])
                 )
@@ -321,10 +613,15 @@ class RealStatChromosome(Chromosome):
         Draw a random number from normal distribution
         with specified mean and variance
         """
-        return np.random.normal(
+        return self._randomizer.normal(
             self.means[index],
             np.sqrt(self.variances[index])      # std deviation
         )
 
-    def _concat_genes(self, other):
-        return np.concatenate((self[:], other[:]))
+    def _mutate_genes(self, genes, indexes):
+        """
+        Same as above, for all indexes at once
+        """
+        return self._randomizer.normal(
+            np.asarray(self.means)[indexes],
+            np.sqrt(np.asarray(self.variances)[indexes]))
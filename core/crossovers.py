@@ -32,6 +32,10 @@ class Crossover(object):
     __metaclass__ = ABCMeta
     # Can be replaced with fake one in unit tests
     _randomizer = np.random.RandomState()
+    # 'run_batch' returns matrices shaped as those of parents,
+    # needed by batch breeding (see 'Algorithm'). Set by crossovers
+    # keeping offspring length, with or without '_run_batch_specific'
+    batch_matrices = False
 
     def __init__(self, rate):
         self._rate = rate
@@ -60,19 +64,70 @@ class Crossover(object):
                 parent1.chromosome,
                 parent2.chromosome)
         else:
-            chromo1 = copy.deepcopy(parent1.chromosome)
-            chromo2 = copy.deepcopy(parent2.chromosome)
+            # Copy-on-write, chromosomes are immutable
+            chromo1 = copy.copy(parent1.chromosome)
+            chromo2 = copy.copy(parent2.chromosome)
 
         offspring1.chromosome = chromo1
         offspring2.chromosome = chromo2
         return offspring1, offspring2
 
+    def run_batch(self, genomes1, genomes2, rate=None, prototype=None):
+        """
+        Crossover of parent genome matrices, row by row: row i of
+        'genomes1' is crossed with row i of 'genomes2'. Returns two
+        offspring genome matrices. Rate might be given per row (array).
+        Rows without crossover are copied from parents.
+        Crossovers without batch form need 'prototype', any chromosome
+        of parents' genotype, to cross rows as chromosomes.
+        """
+        if rate is None:
+            rate = self.rate
+        genomes1 = np.asarray(genomes1)
+        genomes2 = np.asarray(genomes2)
+
+        do_crossover = self._randomizer.random_sample(len(genomes1)) < rate
+        offspring1, offspring2 = self._run_batch_specific(
+            genomes1, genomes2, prototype)
+        offspring1[~do_crossover] = genomes1[~do_crossover]
+        offspring2[~do_crossover] = genomes2[~do_crossover]
+        return offspring1, offspring2
+
     @abstractmethod
     def _run_specific(self, chromo1, chromo2):
         pass
 
+    def _run_batch_specific(self, genomes1, genomes2, prototype=None):
+        """
+        Crossover of all rows, returns new matrices.
+        Rows are crossed one by one with '_run_specific', as chromosomes
+        rebuilt from 'prototype', unless a crossover has faster batch form.
+        """
+        if prototype is None:
+            raise ValueError(
+                "Crossover of genome rows needs prototype chromosome")
+        # Offspring rows must be of parents' length
+        offspring1 = np.empty_like(genomes1)
+        offspring2 = np.empty_like(genomes2)
+        for row in xrange(len(genomes1)):
+            chromo1, chromo2 = self._run_specific(
+                prototype.from_array(genomes1[row]),
+                prototype.from_array(genomes2[row]))
+            offspring1[row] = chromo1.to_array()
+            offspring2[row] = chromo2.to_array()
+        return offspring1, offspring2
+
+    def _pick_split_points(self, genomes, count=1):
+        """
+        Random points for each row, as in 'Chromosome.pick_split_point'
+        """
+        return self._randomizer.random_integers(
+            0, genomes.shape[1] - 1, (len(genomes), count))
+
 
 class OnePointCrossover(Crossover):
+    batch_matrices = True
+
     def __init__(self, *args, **kwargs):
         super(OnePointCrossover, self).__init__(*args, **kwargs)
 
@@ -85,8 +140,18 @@ class OnePointCrossover(Crossover):
         offspring2 = chromo2_part1.concat(chromo1_part2)
         return offspring1, offspring2
 
+    def _run_batch_specific(self, genomes1, genomes2, prototype=None):
+        # Genes after the split point come from the other parent
+        points = self._pick_split_points(genomes1)
+        swap = np.arange(genomes1.shape[1]) >= points
+        return (
+            np.where(swap, genomes2, genomes1),
+            np.where(swap, genomes1, genomes2))
+
 
 class TwoPointCrossover(Crossover):
+    batch_matrices = True
+
     def __init__(self, *args, **kwargs):
         super(TwoPointCrossover, self).__init__(*args, **kwargs)
 
@@ -104,19 +169,30 @@ class TwoPointCrossover(Crossover):
         # Now recombine them:
         # offspring1: | 1111 | 2222 | 1111 |
         # offspring2: | 2222 | 1111 | 2222 |
-        offspring1 = chromo1_1.concat(chromo2_2).concat(chromo1_3)
-        offspring2 = chromo2_1.concat(chromo1_2).concat(chromo2_3)
+        offspring1 = chromo1_1.concat(chromo2_2, chromo1_3)
+        offspring2 = chromo2_1.concat(chromo1_2, chromo2_3)
         return offspring1, offspring2
 
+    def _run_batch_specific(self, genomes1, genomes2, prototype=None):
+        # Middle part comes from the other parent
+        points = np.sort(self._pick_split_points(genomes1, 2), axis=1)
+        indexes = np.arange(genomes1.shape[1])
+        swap = (indexes >= points[:, :1]) & (indexes < points[:, 1:])
+        return (
+            np.where(swap, genomes2, genomes1),
+            np.where(swap, genomes1, genomes2))
+
 
 class UniformCrossover(Crossover):
+    batch_matrices = True
+
     def __init__(self, *args, **kwargs):
         super(UniformCrossover, self).__init__(*args, **kwargs)
 
     def _run_specific(self, chromo1, chromo2):
-        # Offspring
-        o1 = copy.deepcopy(chromo1)
-        o2 = copy.deepcopy(chromo2)
+        # Offspring, genes are copied on the first swap
+        o1 = copy.copy(chromo1)
+        o2 = copy.copy(chromo2)
         for index in xrange(len(chromo1)):
             # Hardcoded 0.5 probability - might be nice to pass this in
             rnd = self._randomizer.randint(2)
@@ -125,8 +201,18 @@ class UniformCrossover(Crossover):
                 o1[index], o2[index] = o2[index], o1[index]
         return o1, o2
 
+    def _run_batch_specific(self, genomes1, genomes2, prototype=None):
+        swap = self._randomizer.randint(2, size=genomes1.shape) == 1
+        return (
+            np.where(swap, genomes2, genomes1),
+            np.where(swap, genomes1, genomes2))
+
 
 class CutSpliceCrossover(Crossover):
+    """
+    Offspring lengths differ from those of parents,
+    so 'run_batch' returns lists of rows instead of matrices
+    """
     def __init__(self, *args, **kwargs):
         super(CutSpliceCrossover, self).__init__(*args, **kwargs)
 
@@ -143,11 +229,39 @@ class CutSpliceCrossover(Crossover):
         offspring2 = chromo1_2.concat(chromo2_1)
         return offspring1, offspring2
 
+    def run_batch(self, genomes1, genomes2, rate=None, prototype=None):
+        if rate is None:
+            rate = self.rate
+        genomes1 = np.asarray(genomes1)
+        genomes2 = np.asarray(genomes2)
+        count, length = genomes1.shape
+
+        do_crossover = self._randomizer.random_sample(count) < rate
+        point1 = self._pick_split_points(genomes1)
+        point2 = self._pick_split_points(genomes2)
+        # No crossover: offspring are copies of parents
+        point1[~do_crossover] = length
+        point2[~do_crossover] = length
+
+        # Rows of both parents side by side, genes picked by masks
+        # are in offspring order
+        both = np.hstack((genomes1, genomes2))
+        indexes = np.arange(length)
+        keep1 = np.hstack((indexes < point1, indexes >= point2))
+        keep2 = np.hstack((indexes >= point1, indexes < point2))
+        lengths1 = keep1.sum(axis=1)
+        lengths2 = keep2.sum(axis=1)
+        offspring1 = np.split(both[keep1], np.cumsum(lengths1)[:-1])
+        offspring2 = np.split(both[keep2], np.cumsum(lengths2)[:-1])
+        return offspring1, offspring2
+
 
 class WholeArithmeticCrossover(Crossover):
     """
     For real-coded chromosomes only
     """
+    batch_matrices = True
+
     def __init__(self, alpha=0.3, *args, **kwargs):
         self.alpha = alpha
         super(WholeArithmeticCrossover, self).__init__(*args, **kwargs)
@@ -167,3 +281,7 @@ class WholeArithmeticCrossover(Crossover):
             chromo2.length, chromo2.min_val, chromo2.max_val,
             content=np.array(offspring[1]))
         return offspring1, offspring2
+
+    def _run_batch_specific(self, genomes1, genomes2, prototype=None):
+        difference = self.alpha * (genomes1 - genomes2)
+        return genomes2 + difference, genomes1 - difference
@@ -0,0 +1,63 @@
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+
+class FitnessCache(object):
+    """
+    Remembers fitness values of already evaluated chromosomes,
+    keyed by a hash of chromosome content.
+    Least recently used entries are evicted when size limit is reached.
+    Only valid for deterministic fitness functions.
+    """
+    def __init__(self, max_size=10000):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+        # Cumulative statistics
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(chromosome):
+        """
+        Content hash of chromosome genes
+        """
+        genes = np.ascontiguousarray(chromosome.to_array())
+        digest = hashlib.sha1(genes.tostring())
+        digest.update(type(chromosome).__name__)
+        digest.update(str(genes.dtype))
+        return digest.digest()
+
+    def get(self, key):
+        """
+        Cached fitness value or None
+        """
+        try:
+            fitness = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        # Mark as most recently used
+        self._entries[key] = fitness
+        self.hits += 1
+        return fitness
+
+    def put(self, key, fitness):
+        self._entries.pop(key, None)
+        self._entries[key] = fitness
+        while len(self._entries) > self.max_size:
+            # Least recently used entry goes first
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return float(self.hits) / lookups if lookups > 0 else 0.0
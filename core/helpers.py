@@ -25,7 +25,7 @@ class Helpers(object):
         try:
             # In case a binary numpy array gets passed
             if isinstance(binary, np.ndarray):
-                binary = ''.join([str(char) for char in binary])
+                binary = (binary.astype(np.uint8) + ord('0')).tostring()
             return int(binary, 2)
         except ValueError:
             return None
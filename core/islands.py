@@ -0,0 +1,235 @@
+import numpy as np
+from core.parallelizer import Parallelizer, MASTER_PROC_ID, MPI
+from core.rng import RandomStreams
+
+
+# Messages between island masters
+TAG_MIGRATION = 3000
+
+
+def ring_topology(island_count, epoch, seed=0):
+    """
+    Island i sends migrants to island i + 1
+    """
+    return [(island + 1) % island_count for island in xrange(island_count)]
+
+
+def random_topology(island_count, epoch, seed=0):
+    """
+    Random ring, different in every migration epoch.
+    Each island sends to and receives from exactly one other island.
+    All island masters get the same ring from the same seed and epoch.
+    """
+    order = RandomStreams(seed).stream(
+        'topology', epoch).permutation(island_count)
+    destinations = [None] * island_count
+    for position, island in enumerate(order):
+        destinations[island] = order[(position + 1) % island_count]
+    return destinations
+
+
+TOPOLOGIES = {
+    'ring': ring_topology,
+    'random': random_topology,
+}
+
+
+class IslandModel(object):
+    """
+    Splits world communicator into several islands, each one with its own
+    master, workers and population. Every 'migration_interval' generations
+    island masters send copies of their best individuals to another
+    island, where they replace the worst individuals.
+    Migrants are sent and received without blocking the evolution.
+
+    with IslandModel(island_count=4) as islands:
+        if islands.master_process:
+            islands.parallelizer.broadcast(phenotype=phenotype)
+            algorithm = Algorithm(
+                phenotype, crossover, selection,
+                parallelizer=islands.parallelizer,
+                random_streams=islands.random_streams)
+            for population, generation in islands.run(algorithm, 100):
+                print islands.global_best.fitness
+
+    All islands must run the same number of generations, as statistics are
+    exchanged collectively. Use 'fitness_threshold' to stop all of them
+    at once, instead of breaking the loop on a single island.
+    Each island gets its own 'random_streams', derived from 'seed'.
+    Migration uses matched probes, i.e. mpi4py >= 2.0 and MPI-3 library.
+    """
+    def __init__(self, island_count, migration_interval=10,
+                 migration_size=1, topology='ring', seed=0, comm=None):
+        if topology not in TOPOLOGIES:
+            raise ValueError("Unknown migration topology: %s" % topology)
+
+        if comm is None:
+            if MPI is None:
+                raise ValueError("Island model needs MPI (mpi4py)")
+            comm = MPI.COMM_WORLD
+        self.comm = comm
+        proc_count = self.comm.Get_size()
+        proc_id = self.comm.Get_rank()
+        if not 0 < island_count <= proc_count:
+            raise ValueError("Invalid island count: %i" % island_count)
+
+        self.island_count = island_count
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+        self.topology = TOPOLOGIES[topology]
+        self.seed = seed
+
+        # Consecutive process IDs make an island
+        self.island_id = proc_id * island_count // proc_count
+        self.island_comm = self.comm.Split(self.island_id, proc_id)
+
+        # Island masters talk to each other through separate communicator
+        if self.island_comm.Get_rank() == MASTER_PROC_ID:
+            self.masters_comm = self.comm.Split(0, proc_id)
+        else:
+            self.masters_comm = self.comm.Split(MPI.UNDEFINED, proc_id)
+
+        # Independent random numbers of this island's algorithm
+        self.random_streams = RandomStreams(seed).spawn(
+            'island', self.island_id)
+
+        self.parallelizer = None
+
+        # Per-island statistics from the last exchange, by island ID
+        self.statistics = []
+        # Best individual among all islands
+        self.global_best = None
+
+        self._send_request = None
+        # Island expected to send migrants, None - no migration running
+        self._migration_source = None
+
+    def __enter__(self):
+        """
+        Start island workers
+        """
+        self.parallelizer = Parallelizer(comm=self.island_comm).__enter__()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.parallelizer.__exit__(type, value, traceback)
+        if self.masters_comm != MPI.COMM_NULL:
+            self.masters_comm.Free()
+        self.island_comm.Free()
+
+    @property
+    def master_process(self):
+        return self.island_comm.Get_rank() == MASTER_PROC_ID
+
+    def run(self, algorithm, generations=None, fitness_threshold=None):
+        """
+        Run algorithm of this island with periodic migration.
+        Yields population and generation number, as the algorithm does.
+        """
+        phenotype = algorithm.phenotype
+        try:
+            for population, generation in algorithm.run(generations):
+                # Integrate migrants as soon as they arrive
+                self._immigrate(population, phenotype, wait=False)
+
+                last = generation == generations
+                epoch = generation % self.migration_interval == 0
+                if epoch or last:
+                    self._exchange_statistics(population, generation)
+                    if not last:
+                        self._emigrate(population, generation)
+
+                yield population, generation
+
+                # Same decision on all islands after statistics exchange
+                if (epoch or last) and fitness_threshold is not None:
+                    if self.global_best.fitness >= fitness_threshold:
+                        break
+        finally:
+            self._finish()
+
+    def _emigrate(self, population, generation):
+        """
+        Send copies of the best individuals to the next island
+        and start receiving migrants from the previous one
+        """
+        # Previous migration must be complete
+        self._immigrate(population, population.phenotype, wait=True)
+        if self._send_request is not None:
+            self._send_request.Wait()
+
+        epoch = generation // self.migration_interval
+        destinations = self.topology(self.island_count, epoch, self.seed)
+        source = destinations.index(self.island_id)
+
+        migrants = [
+            (individual.chromosome, individual.fitness)
+            for individual in population.best_individuals(
+                self.migration_size)
+        ]
+        self._send_request = self.masters_comm.isend(
+            migrants, dest=destinations[self.island_id], tag=TAG_MIGRATION)
+        self._migration_source = source
+
+    def _immigrate(self, population, phenotype, wait=False):
+        """
+        Replace the worst individuals with received migrants, if any
+        """
+        migrants = self._receive_migrants(wait)
+        if migrants is None:
+            return
+        for chromosome, fitness in migrants:
+            individual = phenotype(chromosome=chromosome)
+            individual.fitness = fitness
+            population.replace(population.worst_index, individual)
+
+    def _receive_migrants(self, wait):
+        """
+        Migrants from the source island, None if not arrived (yet).
+        Matched probe first, so that migrants of any size fit.
+        """
+        if self._migration_source is None:
+            return None
+        if wait:
+            message = self.masters_comm.mprobe(
+                source=self._migration_source, tag=TAG_MIGRATION)
+        else:
+            message = self.masters_comm.improbe(
+                source=self._migration_source, tag=TAG_MIGRATION)
+            if message is None:
+                return None
+        self._migration_source = None
+        return message.recv()
+
+    def _exchange_statistics(self, population, generation):
+        """
+        Collect statistics of all islands and find global best individual
+        """
+        best = population.best_individual
+        island_statistics = {
+            'island': self.island_id,
+            'generation': generation,
+            'best_fitness': best.fitness,
+            'average_fitness': population.average_fitness,
+            'best_chromosome': best.chromosome,
+        }
+        self.statistics = sorted(
+            self.masters_comm.allgather(island_statistics),
+            key=lambda statistics: statistics['island'])
+
+        best_statistics = max(
+            self.statistics,
+            key=lambda statistics: statistics['best_fitness'])
+        self.global_best = population.phenotype(
+            chromosome=best_statistics['best_chromosome'])
+        self.global_best.fitness = best_statistics['best_fitness']
+
+    def _finish(self):
+        """
+        Complete outstanding migration.
+        Islands run in lockstep, so every receive has a matching send.
+        """
+        self._receive_migrants(wait=True)
+        if self._send_request is not None:
+            self._send_request.Wait()
+            self._send_request = None
@@ -4,8 +4,22 @@ except:
    import pickle
 
 import dill     # For function pickling
-from mpi4py import MPI
 import cProfile
+import math
+import time
+import json
+import traceback
+import multiprocessing
+import multiprocessing.pool
+import numpy as np
+from collections import deque
+from cStringIO import StringIO
+
+# MPI is not needed for serial runs and local process pools
+try:
+    from mpi4py import MPI
+except ImportError:
+    MPI = None
 
 # For debugging
 _PROFILING_ENABLED = False
@@ -18,11 +32,43 @@ MASTER_PROC_ID = 0
 # Messages
 TAG_START_TASK = 1000
 TAG_START_PREPARED_TASK = 1001
+TAG_START_PREPARED_BATCH = 1002
+TAG_START_ARRAY_BATCH = 1003
 TAG_TASK_COMPLETE = 1100
+TAG_BATCH_COMPLETE = 1101
+TAG_ARRAY_BATCH_COMPLETE = 1102
 TAG_BROADCAST_DATA = 1200
+TAG_REGISTER_GENOTYPE = 1201
 TAG_TERMINATE = 2000
 
 
+# Batch dispatch: message round trip overhead should not exceed
+# this fraction of chunk computation time...
+MAX_MESSAGE_OVERHEAD = 0.1
+# ...while each worker still gets at least this many chunks,
+# so that faster workers can take over the work of slower ones
+MIN_CHUNKS_PER_WORKER = 4
+# Weight of the latest measurement in task time/overhead estimates
+ESTIMATE_SMOOTHING = 0.5
+
+# Speculative re-execution: per-task runtimes remembered...
+RUNTIME_HISTORY = 1000
+# ...and needed before any task is considered slow
+MIN_RUNTIME_SAMPLES = 20
+# Seconds between checks for slow tasks while waiting for results
+SPECULATION_POLL_INTERVAL = 0.001
+
+# Process/thread pool: seconds between checks for completed pool calls
+POOL_POLL_INTERVAL = 0.001
+
+
+# Broadcast: numpy arrays of at least this size are placed into
+# node-local shared memory instead of being copied to every worker...
+SHARED_ARRAY_MIN_BYTES = 1 << 16
+# ...each starting at a multiple of this offset
+SHARED_ARRAY_ALIGNMENT = 64
+
+
 PREPARED_TASKS = {}
 
 
@@ -55,11 +101,207 @@ def parallel_task(decorated_function):
     return decorated_function
 
 
+def _dumps_shared(data, min_bytes=SHARED_ARRAY_MIN_BYTES):
+    """
+    Pickle data, except for large numpy arrays, which are replaced by
+    their offsets in a shared memory segment. Returns pickled data,
+    (offset, array) pairs to copy into the segment and its size.
+    The same memory viewed by several arrays is stored once.
+    """
+    arrays = []
+    offsets = {}
+    size = [0]
+
+    def persistent_id(obj):
+        if (type(obj) is not np.ndarray or obj.nbytes < min_bytes or
+                obj.dtype.hasobject):
+            return None
+        key = (
+            obj.__array_interface__['data'][0],
+            obj.shape, obj.strides, obj.dtype.str)
+        if key not in offsets:
+            # Keeps the array alive, so its address is not reused
+            arrays.append((size[0], obj))
+            offsets[key] = size[0]
+            size[0] += -(-obj.nbytes // SHARED_ARRAY_ALIGNMENT) * (
+                SHARED_ARRAY_ALIGNMENT)
+        return (offsets[key], obj.dtype, obj.shape)
+
+    buffer = StringIO()
+    pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+    pickler.persistent_id = persistent_id
+    pickler.dump(data)
+    return buffer.getvalue(), arrays, size[0]
+
+
+def _copy_shared(arrays, segment):
+    """
+    Fill shared memory segment (uint8 array), see '_dumps_shared'
+    """
+    for offset, array in arrays:
+        data = np.ascontiguousarray(array).reshape(-1).view(np.uint8)
+        segment[offset:offset + array.nbytes] = data
+
+
+def _loads_shared(pickled, segment):
+    """
+    Counterpart of '_dumps_shared', shared arrays become
+    read-only views of the segment
+    """
+    def persistent_load(pid):
+        offset, dtype, shape = pid
+        count = int(np.prod(shape))
+        array = segment[offset:offset + count * dtype.itemsize].view(dtype)
+        array = array.reshape(shape)
+        array.flags.writeable = False
+        return array
+
+    unpickler = pickle.Unpickler(StringIO(pickled))
+    unpickler.persistent_load = persistent_load
+    return unpickler.load()
+
+
+def _shared_windows_supported(comm):
+    """
+    Node-local shared memory needs MPI-3 library and mpi4py >= 2.0
+    """
+    return (
+        hasattr(comm, 'Split_type') and
+        MPI.Get_version() >= (3, 0))
+
+
+"""
+Parallelizer 'factory'
+"""
+def get_parallelizer(params):
+    parallelizer_type = params.get('parallelizer', 'mpi')
+    if parallelizer_type == 'mpi':
+        parallelizer = Parallelizer(
+            typed_transport=params.get('typed_transport', False),
+            speculation_percentile=params.get('speculation_percentile'),
+            metrics_file=params.get('metrics_file'))
+    elif parallelizer_type == 'hierarchical':
+        parallelizer = HierarchicalParallelizer(
+            typed_transport=params.get('typed_transport', False),
+            speculation_percentile=params.get('speculation_percentile'),
+            group_size=params.get('group_size') or None,
+            metrics_file=params.get('metrics_file'))
+    elif parallelizer_type == 'collective':
+        parallelizer = CollectiveParallelizer(
+            metrics_file=params.get('metrics_file'))
+    elif parallelizer_type == 'pipelined':
+        parallelizer = PipelinedParallelizer(
+            metrics_file=params.get('metrics_file'))
+    elif parallelizer_type == 'pool':
+        parallelizer = PoolParallelizer(
+            processes=params.get('processes') or None)
+    elif parallelizer_type == 'threads':
+        parallelizer = ThreadPoolParallelizer(
+            processes=params.get('processes') or None)
+    else:
+        raise ValueError(
+            "Unknown parallelizer type: %s" % parallelizer_type)
+    return parallelizer
+
+
+class WorkerMetrics(object):
+    """
+    Utilization and message totals of each worker, as seen by master:
+    - busy: seconds with at least one task message sent to the worker
+      and not replied yet
+    - idle: rest of the batch, i.e. time since previous batch ended
+    - tasks: completed tasks, not counting discarded duplicates
+    - bytes_sent/bytes_received: task messages and replies
+    and seconds the master was blocked waiting for replies.
+    """
+    FIELDS = ('busy', 'idle', 'tasks', 'bytes_sent', 'bytes_received')
+
+    def __init__(self, worker_ids):
+        self._in_flight = dict((worker_id, 0) for worker_id in worker_ids)
+        self._busy_since = {}
+        self._started = None
+        self._batch = self._empty()
+        self.totals = self._empty()
+        self.totals['batches'] = 0
+
+    def _empty(self):
+        return {
+            'wall_time': 0.0,
+            'master_blocked': 0.0,
+            'workers': dict(
+                (worker_id, dict.fromkeys(self.FIELDS, 0))
+                for worker_id in self._in_flight),
+        }
+
+    def sent(self, worker_id, byte_count):
+        now = time.time()
+        if self._started is None:
+            self._started = now
+        if self._in_flight[worker_id] == 0:
+            self._busy_since[worker_id] = now
+        self._in_flight[worker_id] += 1
+        self._batch['workers'][worker_id]['bytes_sent'] += byte_count
+
+    def received(self, worker_id, byte_count, task_count):
+        worker = self._batch['workers'][worker_id]
+        self._in_flight[worker_id] -= 1
+        if self._in_flight[worker_id] == 0:
+            worker['busy'] += time.time() - self._busy_since.pop(worker_id)
+        worker['tasks'] += task_count
+        worker['bytes_received'] += byte_count
+
+    def blocked(self, seconds):
+        self._batch['master_blocked'] += seconds
+
+    def snapshot(self):
+        """
+        Close current batch, return its metrics and add them to totals
+        """
+        now = time.time()
+        batch = self._batch
+        batch['wall_time'] = now - (now if self._started is None
+                                    else self._started)
+        for worker_id, worker in batch['workers'].iteritems():
+            # Duplicates of completed tasks may still be running
+            if worker_id in self._busy_since:
+                worker['busy'] += now - self._busy_since[worker_id]
+                self._busy_since[worker_id] = now
+            worker['idle'] = max(0.0, batch['wall_time'] - worker['busy'])
+
+        self.totals['batches'] += 1
+        for name in ('wall_time', 'master_blocked'):
+            self.totals[name] += batch[name]
+        for worker_id, worker in batch['workers'].iteritems():
+            for name in self.FIELDS:
+                self.totals['workers'][worker_id][name] += worker[name]
+
+        self._started = now
+        self._batch = self._empty()
+        return batch
+
+    def write(self, filepath):
+        with open(filepath, 'w') as fp:
+            json.dump(self.totals, fp)
+
+
 class Parallelizer(object):
-    def __init__(self, prepared_tasks=None):
-        self.comm = MPI.COMM_WORLD
-        self.proc_count = self.comm.Get_size()
-        self.proc_id = self.comm.Get_rank()
+    # Tasks can be submitted without blocking the master
+    pipelined = False
+
+    def __init__(self, prepared_tasks=None, comm=None, chunk_size=None,
+                 typed_transport=False, speculation_percentile=None,
+                 metrics_file=None):
+        # Master and workers can also be a part of larger world
+        if comm is None and MPI is not None:
+            comm = MPI.COMM_WORLD
+        self.comm = comm
+        if comm is None:
+            # No MPI, master process only
+            self.proc_count = 1
+            self.proc_id = MASTER_PROC_ID
+        else:
+            self.proc_count = self.comm.Get_size()
+            self.proc_id = self.comm.Get_rank()
 
         self.prepared_tasks = {}
         if prepared_tasks is not None:
@@ -70,6 +312,40 @@ class Parallelizer(object):
         # Workers
         self.received_data = {}
 
+        # Tasks per batch message, None - adapt to measured times
+        self._chunk_size = chunk_size
+        # Estimated seconds per task and per message round trip
+        # on top of computation, measured by batch dispatch
+        self.task_time = None
+        self.message_overhead = None
+
+        # Tasks running longer than this percentile of task runtimes
+        # are sent to one more (idle) worker, None - never
+        self.speculation_percentile = speculation_percentile
+        # Recent round trip times, per task
+        self._runtimes = deque(maxlen=RUNTIME_HISTORY)
+
+        # Metrics of the last finished batch (see 'WorkerMetrics'),
+        # totals are written to 'metrics_file' on exit
+        self.metrics = None
+        self.metrics_file = metrics_file
+        self._metrics = None
+
+        # Broadcast through node-local shared memory: ranks of this node,
+        # node-local masters (incl. master) and (keys, window) of each
+        # segment, freed once all of its keys get broadcasted again
+        self._shared_comm = None
+        self._shared_leaders_comm = None
+        self._shared_windows = []
+
+        # Send chromosomes as raw gene arrays (see 'start_array_tasks')
+        self.typed_transport = typed_transport
+        # Genotype ID and gene type by task name (master),
+        # task name, prototype chromosome and gene type
+        # by genotype ID (workers)
+        self._genotypes = {}
+        self._genotype_count = 0
+
     def __enter__(self):
         """
         Start the workers
@@ -90,6 +366,18 @@ class Parallelizer(object):
                 self._available_workers = self._get_worker_ids()
                 self._task_results = {}
                 self._task_semaphore = 0
+
+                # Every message gets an ID, echoed back by worker,
+                # so that results of re-sent messages are recognized
+                self._message_count = 0
+                # Message ID -> (tag, payload, task count),
+                # for messages without results yet
+                self._running = {}
+                # Worker ID -> (message ID, send time)
+                self._busy_workers = {}
+                # IDs of running messages sent more than once
+                self._speculated = set()
+                self._metrics = WorkerMetrics(self._get_worker_ids())
                 return self
             else:
                 # Enter the worker loop
@@ -101,11 +389,7 @@ class Parallelizer(object):
         Breaks loops of all non-master processes
         """
         if self.master_process:
-            # Stop workers
-            for worker_id in self._get_worker_ids():
-                self.comm.send(
-                    None, dest=worker_id,
-                    tag=TAG_TERMINATE)
+            self._stop_workers()
 
         # For debugging
         if _PROFILING_ENABLED:
@@ -113,6 +397,19 @@ class Parallelizer(object):
             self.profile.dump_stats(
                 _PROFILE_FILENAME + str(self.proc_id) + _PROFILE_EXTENSION)
 
+    def _stop_workers(self):
+        # Let workers finish duplicates of already completed tasks
+        while getattr(self, '_busy_workers', None):
+            self._wait_for_worker()
+        if self.metrics_file is not None and self._metrics is not None:
+            self._metrics.write(self.metrics_file)
+
+        for worker_id in self._get_worker_ids():
+            self.comm.send(
+                None, dest=worker_id,
+                tag=TAG_TERMINATE)
+        self._free_shared()
+
     def get_prepared_task(self, task_name):
         """
         Return function/parallel task with specified name
@@ -129,6 +426,10 @@ class Parallelizer(object):
     def master_process(self):
         return self.proc_id == MASTER_PROC_ID
 
+    @property
+    def worker_count(self):
+        return len(self._get_worker_ids())
+
     def _get_available_worker_id(self):
         """
         Return ID of the first available worker
@@ -146,15 +447,13 @@ class Parallelizer(object):
         """
         Send a callable task (lambda) .
         """
+        message_id = self._next_message_id()
         payload = (
+            message_id,
             task_id,
             pickle.dumps(task, pickle.HIGHEST_PROTOCOL),
         )
-        self.comm.send(
-            payload,
-            dest=self._get_available_worker_id(),
-            tag=TAG_START_TASK)
-        self._task_semaphore += 1
+        self._start_message(message_id, TAG_START_TASK, payload, 1)
 
     def start_prepared_task(self, task_id, task_name, **kwargs):
         """
@@ -162,19 +461,150 @@ class Parallelizer(object):
         """
         if self.get_prepared_task(task_name) is not None:
             pickled_kwargs = pickle.dumps(kwargs, pickle.HIGHEST_PROTOCOL)
+            message_id = self._next_message_id()
             payload = (
+                message_id,
                 task_id,
                 task_name,
                 pickled_kwargs,
             )
-            self.comm.send(
-                payload,
-                dest=self._get_available_worker_id(),
-                tag=TAG_START_PREPARED_TASK)
-            self._task_semaphore += 1
+            self._start_message(
+                message_id, TAG_START_PREPARED_TASK, payload, 1)
         else:
             raise ValueError("Prepared task with such name was not found")
 
+    def start_prepared_tasks(self, task_name, tasks):
+        """
+        Invoke a predefined task for each of (task_id, kwargs) pairs.
+        Tasks are packed into chunks, one message per chunk, and each
+        worker replies once per chunk. Results are collected as usual.
+        """
+        if self.get_prepared_task(task_name) is None:
+            raise ValueError("Prepared task with such name was not found")
+
+        tasks = list(tasks)
+        chunk_size = self.chunk_size(len(tasks))
+        for start in xrange(0, len(tasks), chunk_size):
+            chunk = tasks[start:start + chunk_size]
+            message_id = self._next_message_id()
+            payload = (
+                message_id,
+                task_name,
+                pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL),
+            )
+            self._start_message(
+                message_id, TAG_START_PREPARED_BATCH, payload, len(chunk))
+
+    def start_array_tasks(self, task_name, task_ids, genomes, prototype):
+        """
+        Same as 'start_prepared_tasks' with a single 'chromosome' kwarg,
+        but chromosomes are sent as matrix rows in typed buffers, without
+        pickling. Rows are as given by 'Chromosome.to_wire', i.e. genes
+        of genome matrix, except for e.g. packed binary chromosomes.
+        Workers rebuild chromosomes from 'prototype' (any chromosome of
+        the same genotype), which is sent to them once per task name.
+        Task results must be numbers.
+
+        Message: int64 header [message ID, genotype ID, task count,
+        task IDs...] followed by genes. Reply: float64 [message ID,
+        compute time, task IDs..., results...].
+        """
+        if self.get_prepared_task(task_name) is None:
+            raise ValueError("Prepared task with such name was not found")
+        if task_name not in self._genotypes:
+            self.register_genotype(task_name, prototype)
+        genotype_id, dtype = self._genotypes[task_name]
+
+        # Workers interpret genes as registered prototype does
+        genomes = np.asarray(genomes, dtype=dtype)
+        chunk_size = self.chunk_size(len(task_ids))
+        for start in xrange(0, len(task_ids), chunk_size):
+            chunk_ids = task_ids[start:start + chunk_size]
+            genes = genomes[start:start + chunk_size]
+            header_size = 8 * (len(chunk_ids) + 3)
+            buffer = np.empty(header_size + genes.nbytes, dtype=np.uint8)
+            header = buffer[:header_size].view(np.int64)
+            message_id = self._next_message_id()
+            header[:3] = message_id, genotype_id, len(chunk_ids)
+            header[3:] = chunk_ids
+            buffer[header_size:].view(dtype)[:] = genes.reshape(-1)
+
+            self._start_message(
+                message_id, TAG_START_ARRAY_BATCH, buffer, len(chunk_ids))
+
+    def _next_message_id(self):
+        message_id = self._message_count
+        self._message_count += 1
+        return message_id
+
+    def _start_message(self, message_id, tag, payload, task_count):
+        """
+        Send message to the first available worker
+        """
+        if tag != TAG_START_ARRAY_BATCH:
+            # Pickled once, received by workers as any other message
+            payload = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+        worker_id = self._get_available_worker_id()
+        self._running[message_id] = (tag, payload, task_count)
+        self._task_semaphore += 1
+        self._send_message(worker_id, message_id)
+
+    def _send_message(self, worker_id, message_id):
+        tag, payload, _ = self._running[message_id]
+        self._busy_workers[worker_id] = (message_id, time.time())
+        self.comm.Send([payload, MPI.BYTE], dest=worker_id, tag=tag)
+        self._metrics.sent(worker_id, len(payload))
+
+    def register_genotype(self, task_name, prototype):
+        """
+        Let workers know how to rebuild chromosomes for specified task.
+        Done by 'start_array_tasks' for new task names, call it directly
+        when the same task gets chromosomes of another genotype.
+        """
+        genotype_id = self._genotype_count
+        self._genotype_count += 1
+        self._genotypes[task_name] = (
+            genotype_id, prototype.to_wire().dtype)
+        for worker_id in self._get_worker_ids():
+            self.comm.send(
+                (genotype_id, task_name, prototype),
+                dest=worker_id,
+                tag=TAG_REGISTER_GENOTYPE)
+
+    def chunk_size(self, task_count):
+        """
+        Tasks per message, so that message overhead stays small compared
+        to computation, without leaving workers idle at the end of batch
+        """
+        if self._chunk_size is not None:
+            return self._chunk_size
+
+        balanced = int(math.ceil(
+            float(task_count) / (MIN_CHUNKS_PER_WORKER * self.worker_count)))
+        balanced = max(1, balanced)
+        if not self.task_time:
+            # Nothing measured yet
+            return balanced
+
+        amortized = int(math.ceil(
+            self.message_overhead / (MAX_MESSAGE_OVERHEAD * self.task_time)))
+        return max(1, min(amortized, balanced))
+
+    def _update_estimates(self, round_trip, task_count, compute_time):
+        """
+        Adjust task time and message overhead to the latest chunk
+        """
+        task_time = compute_time / task_count
+        overhead = max(0.0, round_trip - compute_time)
+        if self.task_time is None:
+            self.task_time = task_time
+            self.message_overhead = overhead
+        else:
+            self.task_time += ESTIMATE_SMOOTHING * (
+                task_time - self.task_time)
+            self.message_overhead += ESTIMATE_SMOOTHING * (
+                overhead - self.message_overhead)
+
     def finished_tasks(self):
         """
         Wait for all workers to finish their tasks,
@@ -183,22 +613,51 @@ class Parallelizer(object):
         """
         if self.master_process:
             # Some tasks still running?
-            running_tasks = self._task_semaphore
-            for _ in xrange(running_tasks):
-                self._wait_for_worker()
+            while self._task_semaphore > 0:
+                self._available_workers.append(self._wait_or_speculate())
+            self.metrics = self._metrics.snapshot()
 
             # All tasks complete, return results
             for task_id, task_result in self._task_results.iteritems():
                 yield task_id, task_result
 
-            # Reset everything
-            self._available_workers = self._get_worker_ids()
+            # Reset everything, except for workers
+            # still running duplicates of completed tasks
+            self._available_workers = [
+                worker_id
+                for worker_id in self._get_worker_ids()
+                if worker_id not in self._busy_workers
+            ]
             self._task_results = {}
 
+    def snapshot_metrics(self):
+        """
+        Close current batch of worker metrics (see 'metrics'), for callers
+        collecting results one by one, without 'finished_tasks'
+        """
+        if self._metrics is not None:
+            self.metrics = self._metrics.snapshot()
+        return self.metrics
+
+    def next_finished_task(self):
+        """
+        Wait until any single task completes and return its
+        (task_id, task_result), without waiting for the rest of them.
+        Used for asynchronous processing instead of 'finished_tasks'.
+        """
+        while not self._task_results:
+            if self._task_semaphore == 0:
+                raise RuntimeError("No running tasks")
+            # Worker becomes available for the next task
+            self._available_workers.append(self._wait_for_worker())
+        return self._task_results.popitem()
+
     def broadcast(self, **kwargs):
         """
         Distribute arbitrary key/value pairs to workers
-        to be later used in calculations
+        to be later used in calculations.
+        Large numpy arrays are shared by all workers of a node,
+        as read-only views (see '_bcast_shared').
         """
         if self.master_process:
             # Notify all workers about incoming data so they block
@@ -210,27 +669,174 @@ class Parallelizer(object):
                     tag=TAG_BROADCAST_DATA)
 
             # Broadcast the data itself
-            self.comm.bcast(kwargs, root=MASTER_PROC_ID)
+            self._bcast_shared(kwargs)
         return self
 
+    def _bcast_shared(self, data=None):
+        """
+        Collective broadcast from master. Large arrays are copied once
+        per node, into shared memory segment allocated by the lowest
+        rank of the node, and unpickled as views of that segment.
+        Segment is released when all of its keys are replaced by later
+        broadcasts (e.g. genome matrix sent every generation).
+        Without MPI-3 shared windows, every rank gets its own copy.
+        """
+        if not _shared_windows_supported(self.comm):
+            message = self.comm.bcast(data, root=MASTER_PROC_ID)
+            return data if self.master_process else message
+
+        if self._shared_comm is None:
+            self._shared_comm = self.comm.Split_type(
+                MPI.COMM_TYPE_SHARED, key=self.proc_id)
+            node_master = self._shared_comm.Get_rank() == 0
+            self._shared_leaders_comm = self.comm.Split(
+                0 if node_master else MPI.UNDEFINED, self.proc_id)
+
+        arrays = None
+        message = None
+        if self.master_process:
+            pickled, arrays, size = _dumps_shared(data)
+            message = (pickled, size)
+        pickled, size = self.comm.bcast(message, root=MASTER_PROC_ID)
+        if size == 0:
+            if not self.master_process:
+                data = pickle.loads(pickled)
+            self._release_shared(data)
+            return data
+
+        node_master = self._shared_comm.Get_rank() == 0
+        window = MPI.Win.Allocate_shared(
+            size if node_master else 0, 1, comm=self._shared_comm)
+        memory, _ = window.Shared_query(0)
+        segment = np.frombuffer(memory, dtype=np.uint8, count=size)
+
+        if node_master:
+            # Master copies arrays, other nodes receive them
+            if self.master_process:
+                _copy_shared(arrays, segment)
+            self._shared_leaders_comm.Bcast(
+                [segment, MPI.BYTE], root=MASTER_PROC_ID)
+        # Segment is ready for the whole node
+        window.Fence()
+        if not self.master_process:
+            data = _loads_shared(pickled, segment)
+        self._release_shared(data)
+        self._shared_windows.append((set(data), window))
+        return data
+
+    def _release_shared(self, data):
+        """
+        Collective release of segments whose keys are all in new data.
+        Every rank of a node releases the same segments in same order.
+        """
+        windows = []
+        for keys, window in self._shared_windows:
+            keys -= set(data)
+            if keys:
+                windows.append((keys, window))
+            else:
+                window.Free()
+        self._shared_windows = windows
+
+    def _free_shared(self):
+        """
+        Collective release of broadcast shared memory
+        """
+        # Views of released segments
+        if not self.master_process:
+            self.received_data = {}
+        for _, window in self._shared_windows:
+            window.Free()
+        self._shared_windows = []
+
+    def _wait_or_speculate(self):
+        """
+        Wait for any worker. Meanwhile, if there are idle workers,
+        send them copies of tasks running longer than usual.
+        """
+        if (self.speculation_percentile is None or
+                len(self._runtimes) < MIN_RUNTIME_SAMPLES):
+            return self._wait_for_worker()
+
+        threshold = np.percentile(
+            self._runtimes, self.speculation_percentile)
+        start = time.time()
+        while (self._available_workers and
+               not self.comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPI.ANY_TAG)):
+            now = time.time()
+            for message_id, sent_at in self._busy_workers.values():
+                if not self._available_workers:
+                    break
+                if (message_id in self._speculated or
+                        message_id not in self._running):
+                    continue
+                task_count = self._running[message_id][2]
+                if now - sent_at > threshold * task_count:
+                    # Whichever copy finishes first wins
+                    self._speculated.add(message_id)
+                    self._send_message(
+                        self._available_workers.pop(), message_id)
+            time.sleep(SPECULATION_POLL_INTERVAL)
+        self._metrics.blocked(time.time() - start)
+        return self._wait_for_worker()
+
     def _wait_for_worker(self):
         """
         Blocking receive from worker process to get notification
-        about completed task
+        about completed task. Late results of tasks sent more than once
+        are discarded.
         """
+        start = time.time()
         status = MPI.Status()
-        message = self.comm.recv(
+        self.comm.Probe(
             source=MPI.ANY_SOURCE,
-            tag=TAG_TASK_COMPLETE,
+            tag=MPI.ANY_TAG,
             status=status)
-        task_id, task_result = message
+        byte_count = status.Get_count(MPI.BYTE)
+        if status.tag == TAG_ARRAY_BATCH_COMPLETE:
+            message = np.empty(status.Get_count(MPI.DOUBLE))
+            self.comm.Recv(
+                [message, MPI.DOUBLE],
+                source=status.source,
+                tag=status.tag)
+        else:
+            message = self.comm.recv(
+                source=status.source,
+                tag=status.tag)
+        self._metrics.blocked(time.time() - start)
 
-        # Store result and decrease running task count
-        self._task_results[task_id] = task_result
-        self._task_semaphore -= 1
+        # Unpack result(s)
+        compute_time = None
+        if status.tag == TAG_TASK_COMPLETE:
+            message_id, task_id, task_result = message
+            results = [(task_id, task_result)]
+        elif status.tag == TAG_BATCH_COMPLETE:
+            message_id, results, compute_time = message
+        elif status.tag == TAG_ARRAY_BATCH_COMPLETE:
+            message_id, compute_time = int(message[0]), message[1]
+            count = (len(message) - 2) // 2
+            task_ids = message[2:count + 2].astype(int)
+            results = zip(task_ids, message[count + 2:])
+        else:
+            raise RuntimeError("Master: invalid message")
 
-        # Worker ID
-        return status.source
+        worker_id = status.source
+        _, sent_at = self._busy_workers.pop(worker_id)
+        task_count = 0
+        if message_id in self._running:
+            # Store result(s) and decrease running task count
+            _, _, task_count = self._running.pop(message_id)
+            self._speculated.discard(message_id)
+            self._task_results.update(results)
+            self._task_semaphore -= 1
+
+            round_trip = time.time() - sent_at
+            self._runtimes.append(round_trip / task_count)
+            if compute_time is not None:
+                self._update_estimates(round_trip, task_count, compute_time)
+        self._metrics.received(worker_id, byte_count, task_count)
+
+        return worker_id
 
     def _get_worker_ids(self):
         """
@@ -251,53 +857,891 @@ class Parallelizer(object):
         while True:
             # Listen for any messages
             status = MPI.Status()
-            message = self.comm.recv(
+            self.comm.Probe(
                 source=MASTER_PROC_ID,
                 tag=MPI.ANY_TAG,
                 status=status)
 
+            if status.tag == TAG_START_ARRAY_BATCH:
+                # Typed buffer, not a pickled message
+                self._run_array_batch(status.Get_count(MPI.BYTE))
+                continue
+
+            message = self.comm.recv(
+                source=MASTER_PROC_ID,
+                tag=status.tag)
+
             if status.tag == TAG_START_TASK:
                 # Unpack task info
-                task_id, task = message
+                message_id, task_id, task = message
                 task = pickle.loads(task)
                 # Run the task and send results to master
-                result = task()
-                payload = (task_id, result)
+                result = self._run_task(task_id, task)
+                payload = (message_id, task_id, result)
                 self.comm.send(
                     payload,
                     dest=MASTER_PROC_ID, tag=TAG_TASK_COMPLETE)
 
             elif status.tag == TAG_START_PREPARED_TASK:
                 # Unpack all task info and get the task itself
-                task_id, task_name, kwargs = message
+                message_id, task_id, task_name, kwargs = message
                 kwargs = pickle.loads(kwargs)
-                # Add any previously broadcasted/received keyword arguments
-                # THIS MIGHT OVERRIDE EXISTING ARGUMENTS!
-                kwargs = dict(kwargs.items() + self.received_data.items())
 
                 # Run the task and send results back
-                task = self.get_prepared_task(task_name)
-                result = task(**kwargs)
-                payload = (task_id, result)
+                [(_, result)] = self._run_prepared_tasks(
+                    task_name, [(task_id, kwargs)])
+                payload = (message_id, task_id, result)
                 self.comm.send(
                     payload,
                     dest=MASTER_PROC_ID, tag=TAG_TASK_COMPLETE)
 
+            elif status.tag == TAG_START_PREPARED_BATCH:
+                message_id, task_name, chunk = message
+                chunk = pickle.loads(chunk)
+
+                # Run all tasks of the chunk, reply once
+                start = time.time()
+                chunk_results = self._run_prepared_tasks(task_name, chunk)
+                payload = (message_id, chunk_results, time.time() - start)
+                self.comm.send(
+                    payload,
+                    dest=MASTER_PROC_ID, tag=TAG_BATCH_COMPLETE)
+
+            elif status.tag == TAG_REGISTER_GENOTYPE:
+                genotype_id, task_name, prototype = message
+                self._genotypes[genotype_id] = (
+                    task_name, prototype, prototype.to_wire().dtype)
+
             elif status.tag == TAG_BROADCAST_DATA:
                 # Receive dictionary from master process
                 # and store its keys/values
-                received_data = {}
-                received_data = self.comm.bcast(
-                    received_data, root=MASTER_PROC_ID)
-                self.received_data.update(received_data)
+                self._receive_data(self._bcast_shared())
 
             elif status.tag == TAG_TERMINATE:
                 # Exit loop
+                self._free_shared()
                 break
             else:
                 raise RuntimeError(
                     "Worker: invalid command")
 
+    def _run_array_batch(self, byte_count):
+        """
+        Receive chunk of genome matrix rows, see 'start_array_tasks'
+        """
+        buffer = np.empty(byte_count, dtype=np.uint8)
+        self.comm.Recv(
+            [buffer, MPI.BYTE],
+            source=MASTER_PROC_ID,
+            tag=TAG_START_ARRAY_BATCH)
+
+        message_id, genotype_id, count = buffer[:24].view(np.int64)
+        header_size = 8 * (count + 3)
+        task_ids = buffer[24:header_size].view(np.int64)
+        task_name, prototype, dtype = self._genotypes[genotype_id]
+        genomes = buffer[header_size:].view(dtype).reshape(count, -1)
+
+        start = time.time()
+        results = self._run_array_tasks(
+            task_name, task_ids, genomes, prototype)
+
+        reply = np.empty(2 * count + 2)
+        reply[:2] = message_id, time.time() - start
+        reply[2:count + 2] = task_ids
+        reply[count + 2:] = results
+        self.comm.Send(
+            [reply, MPI.DOUBLE],
+            dest=MASTER_PROC_ID,
+            tag=TAG_ARRAY_BATCH_COMPLETE)
+
+
+    def _run_task(self, task_id, task):
+        return task()
+
+    def _run_prepared_tasks(self, task_name, tasks):
+        """
+        (task_id, result) pairs of prepared tasks run by this worker
+        """
+        task = self.get_prepared_task(task_name)
+        # Add any previously broadcasted/received keyword arguments
+        # THIS MIGHT OVERRIDE EXISTING ARGUMENTS!
+        return [
+            (task_id, task(**dict(
+                kwargs.items() + self.received_data.items())))
+            for task_id, kwargs in tasks
+        ]
+
+    def _run_array_tasks(self, task_name, task_ids, genomes, prototype):
+        """
+        Results of prepared task for each row (see 'start_array_tasks')
+        """
+        # Broadcasted data plus chromosome, copied once per chunk,
+        # so that broadcasted data is never changed
+        task = self.get_prepared_task(task_name)
+        kwargs = dict(self.received_data)
+        results = np.empty(len(task_ids))
+        for index, genes in enumerate(genomes):
+            kwargs['chromosome'] = prototype.from_wire(genes)
+            results[index] = task(**kwargs)
+        return results
+
+    def _receive_data(self, received_data):
+        self.received_data.update(received_data)
+
+
+class PipelinedParallelizer(Parallelizer):
+    """
+    Master never blocks when starting tasks. Tasks wait in a submission
+    queue until a worker is free and results are collected by polling
+    non-blocking probes, so the master can do other work (e.g. breed
+    more offspring) while workers compute. Results are received only
+    once probed, so their size is not limited.
+    Each worker gets up to 'depth' tasks in advance, so it can start
+    the next one right after finishing the previous one.
+    Tasks are sent one by one, without chunking.
+    """
+    pipelined = True
+
+    def __init__(self, prepared_tasks=None, comm=None, depth=2,
+                 metrics_file=None):
+        super(PipelinedParallelizer, self).__init__(
+            prepared_tasks=prepared_tasks, comm=comm,
+            metrics_file=metrics_file)
+        self.depth = depth
+
+    def __enter__(self):
+        """
+        Start the workers and wait for their results
+        """
+        parallelizer = super(PipelinedParallelizer, self).__enter__()
+        if parallelizer is self and self.master_process:
+            # (tag, payload) of tasks not sent yet
+            self._queue = deque()
+            # Sent tasks without results, by worker ID
+            self._in_flight = dict(
+                (worker_id, 0) for worker_id in self._get_worker_ids())
+            self._send_requests = []
+        return parallelizer
+
+    def __exit__(self, type, value, traceback):
+        # Null parallelizer might have been used instead
+        if self.master_process and self.proc_count > 1:
+            # Wait for tasks still running
+            while self._task_semaphore > 0:
+                self._wait_for_result()
+            MPI.Request.Waitall(self._send_requests)
+        super(PipelinedParallelizer, self).__exit__(type, value, traceback)
+
+    def start_task(self, task_id, task):
+        """
+        Queue a callable task (lambda)
+        """
+        payload = (
+            self._next_message_id(),
+            task_id,
+            pickle.dumps(task, pickle.HIGHEST_PROTOCOL),
+        )
+        self._queue.append((TAG_START_TASK, payload))
+        self._task_semaphore += 1
+        self.poll()
+
+    def start_prepared_task(self, task_id, task_name, **kwargs):
+        """
+        Queue a predefined task
+        """
+        if self.get_prepared_task(task_name) is None:
+            raise ValueError("Prepared task with such name was not found")
+        payload = (
+            self._next_message_id(),
+            task_id,
+            task_name,
+            pickle.dumps(kwargs, pickle.HIGHEST_PROTOCOL),
+        )
+        self._queue.append((TAG_START_PREPARED_TASK, payload))
+        self._task_semaphore += 1
+        self.poll()
+
+    def start_prepared_tasks(self, task_name, tasks):
+        for task_id, kwargs in tasks:
+            self.start_prepared_task(task_id, task_name, **kwargs)
+
+    def poll(self):
+        """
+        Collect already available results and send queued tasks
+        to workers with free slots, without waiting for anything
+        """
+        status = MPI.Status()
+        while True:
+            # Matched probe, so results of any size are received whole
+            message = self.comm.improbe(
+                source=MPI.ANY_SOURCE, tag=TAG_TASK_COMPLETE, status=status)
+            if message is None:
+                break
+            self._complete(message, status)
+        self._send_queued()
+
+    def finished_tasks(self):
+        """
+        Wait for all submitted tasks, return all results collected
+        so far and prepare for next batch of tasks
+        """
+        while self._task_semaphore > 0:
+            self._wait_for_result()
+        self.metrics = self._metrics.snapshot()
+
+        for task_id, task_result in self._task_results.iteritems():
+            yield task_id, task_result
+        self._task_results = {}
+
+    def next_finished_task(self):
+        """
+        Wait until any single task completes and return its
+        (task_id, task_result)
+        """
+        self.poll()
+        if not self._task_results:
+            if self._task_semaphore == 0:
+                raise RuntimeError("No running tasks")
+            self._wait_for_result()
+        return self._task_results.popitem()
+
+    def _wait_for_result(self):
+        """
+        Block until any worker returns a result
+        """
+        self._send_queued()
+        start = time.time()
+        status = MPI.Status()
+        message = self.comm.mprobe(
+            source=MPI.ANY_SOURCE, tag=TAG_TASK_COMPLETE, status=status)
+        self._metrics.blocked(time.time() - start)
+        self._complete(message, status)
+        self._send_queued()
+
+    def _complete(self, message, status):
+        """
+        Receive probed result of a task and store it
+        """
+        _, task_id, task_result = message.recv()
+        self._task_results[task_id] = task_result
+        self._task_semaphore -= 1
+
+        worker_id = status.source
+        self._in_flight[worker_id] -= 1
+        self._metrics.received(worker_id, status.Get_count(MPI.BYTE), 1)
+
+    def _send_queued(self):
+        """
+        Fill free worker slots from submission queue, least busy first
+        """
+        while self._queue:
+            worker_id = min(self._in_flight, key=self._in_flight.get)
+            if self._in_flight[worker_id] >= self.depth:
+                break
+            tag, payload = self._queue.popleft()
+            # Request keeps pickled payload until it is sent
+            payload = pickle.dumps(payload, pickle.HIGHEST_PROTOCOL)
+            self._send_requests.append(self.comm.Isend(
+                [payload, MPI.BYTE], dest=worker_id, tag=tag))
+            self._in_flight[worker_id] += 1
+            self._metrics.sent(worker_id, len(payload))
+
+        # Forget completed sends
+        self._send_requests = [
+            request for request in self._send_requests
+            if not request.Test()
+        ]
+
+
+class HierarchicalParallelizer(Parallelizer):
+    """
+    Two-level dispatch for large allocations. Master (world rank 0)
+    sends task batches to one sub-master per node, which splits them
+    among workers of that node and replies once with all results.
+    Master only talks to sub-masters, so its message handling
+    grows with node count instead of rank count.
+
+    Nodes are discovered from MPI processor names. 'group_size' limits
+    ranks per group, so that large nodes get several sub-masters
+    (None - one group per node). Sub-masters only relay messages.
+    """
+    def __init__(self, prepared_tasks=None, comm=None, chunk_size=None,
+                 typed_transport=False, speculation_percentile=None,
+                 group_size=None, metrics_file=None):
+        super(HierarchicalParallelizer, self).__init__(
+            prepared_tasks=prepared_tasks, comm=comm, chunk_size=chunk_size,
+            typed_transport=typed_transport,
+            speculation_percentile=speculation_percentile,
+            metrics_file=metrics_file)
+        self.group_size = group_size
+        # Local parallelizer of a sub-master
+        self._local = None
+        self.node_comm = None
+        if self.comm is None or self.proc_count < 2:
+            return
+
+        world = self.comm
+        groups = self._get_groups(
+            world.allgather(MPI.Get_processor_name()), group_size)
+        group_id = None
+        for index, ranks in enumerate(groups):
+            if self.proc_id in ranks:
+                group_id = index
+        is_leader = (
+            group_id is not None and groups[group_id][0] == self.proc_id)
+
+        # Master and sub-masters
+        top_comm = world.Split(
+            0 if self.master_process or is_leader else MPI.UNDEFINED,
+            self.proc_id)
+        # Each group, with its sub-master as local master
+        self.node_comm = world.Split(
+            MPI.UNDEFINED if group_id is None else group_id,
+            self.proc_id)
+
+        self.comm = top_comm if top_comm != MPI.COMM_NULL else self.node_comm
+        self.proc_count = self.comm.Get_size()
+        self.proc_id = self.comm.Get_rank()
+        if is_leader:
+            self._local = Parallelizer(
+                prepared_tasks=self.prepared_tasks.values(),
+                comm=self.node_comm,
+                chunk_size=chunk_size,
+                typed_transport=typed_transport)
+
+    @staticmethod
+    def _get_groups(processor_names, group_size=None):
+        """
+        Ranks of each group (first one is the sub-master),
+        master rank excluded
+        """
+        nodes = {}
+        for rank, name in enumerate(processor_names):
+            if rank != MASTER_PROC_ID:
+                nodes.setdefault(name, []).append(rank)
+
+        groups = []
+        for ranks in sorted(nodes.values()):
+            size = group_size or len(ranks)
+            for start in xrange(0, len(ranks), size):
+                groups.append(ranks[start:start + size])
+        return groups
+
+    def __enter__(self):
+        """
+        Start workers and sub-masters
+        """
+        if self._local is not None:
+            # Single-rank group computes by itself
+            self._local = self._local.__enter__()
+            super(HierarchicalParallelizer, self).__enter__()
+            # Master is done, stop local workers
+            self._local.__exit__(None, None, None)
+            return self
+        return super(HierarchicalParallelizer, self).__enter__()
+
+    def _run_task(self, task_id, task):
+        if self._local is None:
+            return super(HierarchicalParallelizer, self)._run_task(
+                task_id, task)
+        self._local.start_task(task_id, task)
+        return dict(self._local.finished_tasks())[task_id]
+
+    def _run_prepared_tasks(self, task_name, tasks):
+        if self._local is None:
+            return super(HierarchicalParallelizer, self)._run_prepared_tasks(
+                task_name, tasks)
+        self._local.start_prepared_tasks(task_name, tasks)
+        return list(self._local.finished_tasks())
+
+    def _run_array_tasks(self, task_name, task_ids, genomes, prototype):
+        if self._local is None:
+            return super(HierarchicalParallelizer, self)._run_array_tasks(
+                task_name, task_ids, genomes, prototype)
+        self._local.start_array_tasks(task_name, task_ids, genomes, prototype)
+        results = dict(self._local.finished_tasks())
+        return np.array([results[task_id] for task_id in task_ids])
+
+    def _receive_data(self, received_data):
+        super(HierarchicalParallelizer, self)._receive_data(received_data)
+        if self._local is not None:
+            self._local.broadcast(**received_data)
+
+
+class CollectiveParallelizer(Parallelizer):
+    """
+    Bulk synchronous (SPMD) evaluation: tasks started by master are
+    only collected, 'finished_tasks' then splits them evenly among all
+    ranks, master included. Genome matrix rows (see 'start_array_tasks')
+    are sent with a single Scatterv and results returned with a single
+    Gatherv, other tasks with scatter/gather of pickled chunks.
+    Workers follow master through broadcasted commands instead of
+    point-to-point messages. Tasks of the same kind started one after
+    another (e.g. one by one) share a single collective round.
+    Worker metrics count all ranks busy for whole rounds they have
+    tasks in, and bytes of genome rows only (not of pickled chunks).
+    """
+    def __init__(self, prepared_tasks=None, comm=None, typed_transport=True,
+                 metrics_file=None):
+        super(CollectiveParallelizer, self).__init__(
+            prepared_tasks=prepared_tasks, comm=comm,
+            typed_transport=typed_transport, metrics_file=metrics_file)
+        # [command, task name, tasks or task IDs, genome matrices,
+        # prototype] of batches started since the last collection
+        self._batches = []
+
+    def _stop_workers(self):
+        if self.metrics_file is not None and self._metrics is not None:
+            self._metrics.write(self.metrics_file)
+        self.comm.bcast((TAG_TERMINATE, None), root=MASTER_PROC_ID)
+        self._free_shared()
+
+    def start_task(self, task_id, task):
+        self._add_batch(TAG_START_TASK, None, [(task_id, task)])
+
+    def start_prepared_task(self, task_id, task_name, **kwargs):
+        self.start_prepared_tasks(task_name, [(task_id, kwargs)])
+
+    def start_prepared_tasks(self, task_name, tasks):
+        if self.get_prepared_task(task_name) is None:
+            raise ValueError("Prepared task with such name was not found")
+        self._add_batch(TAG_START_PREPARED_BATCH, task_name, list(tasks))
+
+    def start_array_tasks(self, task_name, task_ids, genomes, prototype):
+        if self.get_prepared_task(task_name) is None:
+            raise ValueError("Prepared task with such name was not found")
+        self._add_batch(
+            TAG_START_ARRAY_BATCH, task_name, list(task_ids),
+            np.asarray(genomes), prototype)
+
+    def _add_batch(self, command, task_name, tasks, genomes=None,
+                   prototype=None):
+        """
+        Extend the last batch if it runs the same task (on rows
+        of the same shape and type), otherwise start a new one
+        """
+        self._task_semaphore += len(tasks)
+        if self._batches:
+            last = self._batches[-1]
+            if last[:2] == [command, task_name] and (
+                    genomes is None or (
+                        last[3][0].shape[1:] == genomes.shape[1:] and
+                        last[3][0].dtype == genomes.dtype)):
+                last[2].extend(tasks)
+                if genomes is not None:
+                    last[3].append(genomes)
+                return
+        self._batches.append([
+            command, task_name, tasks,
+            None if genomes is None else [genomes], prototype])
+
+    def finished_tasks(self):
+        """
+        Run all started tasks on all ranks, return their results
+        """
+        if self.master_process:
+            self._run_batches()
+            for task_id, task_result in self._task_results.iteritems():
+                yield task_id, task_result
+            self._task_results = {}
+
+    def next_finished_task(self):
+        """
+        Run all started tasks, return results one by one
+        """
+        self._run_batches()
+        if not self._task_results:
+            raise RuntimeError("No running tasks")
+        return self._task_results.popitem()
+
+    def broadcast(self, **kwargs):
+        """
+        Master keeps the data too, as it runs tasks as well
+        """
+        if self.master_process:
+            self.comm.bcast((TAG_BROADCAST_DATA, None), root=MASTER_PROC_ID)
+            self._bcast_shared(kwargs)
+            self._receive_data(kwargs)
+        return self
+
+    def _run_batches(self):
+        start = time.time()
+        for command, task_name, tasks, genomes, prototype in self._batches:
+            self.comm.bcast((command, None), root=MASTER_PROC_ID)
+            if command == TAG_START_ARRAY_BATCH:
+                results = self._evaluate_arrays(
+                    task_name, tasks, np.concatenate(genomes), prototype)
+            else:
+                results = self._run_chunks(task_name, tasks)
+            self._task_results.update(results)
+        self._batches = []
+        self._task_semaphore = 0
+        self._metrics.blocked(time.time() - start)
+        self.metrics = self._metrics.snapshot()
+
+    def _worker(self):
+        """
+        Follow commands of master process
+        """
+        while True:
+            command, _ = self.comm.bcast(None, root=MASTER_PROC_ID)
+            if command == TAG_START_ARRAY_BATCH:
+                self._evaluate_arrays()
+            elif command in (TAG_START_TASK, TAG_START_PREPARED_BATCH):
+                self._run_chunks()
+            elif command == TAG_BROADCAST_DATA:
+                self._receive_data(self._bcast_shared())
+            elif command == TAG_TERMINATE:
+                self._free_shared()
+                break
+            else:
+                raise RuntimeError(
+                    "Worker: invalid command")
+
+    @staticmethod
+    def _split(count, proc_count):
+        """
+        Number of tasks and index of the first one for each rank
+        """
+        counts = np.full(proc_count, count // proc_count, int)
+        counts[:count % proc_count] += 1
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        return counts, offsets
+
+    def _run_chunks(self, task_name=None, tasks=None):
+        """
+        Collective run of prepared tasks, or callables without task name
+        """
+        chunks = None
+        if self.master_process:
+            counts, offsets = self._split(len(tasks), self.proc_count)
+            chunks = [
+                (task_name, tasks[offset:offset + count])
+                for offset, count in zip(offsets, counts)
+            ]
+            self._round_started(counts)
+        task_name, chunk = self.comm.scatter(chunks, root=MASTER_PROC_ID)
+
+        if task_name is None:
+            results = [
+                (task_id, self._run_task(task_id, task))
+                for task_id, task in chunk
+            ]
+        else:
+            results = self._run_prepared_tasks(task_name, chunk)
+
+        results = self.comm.gather(results, root=MASTER_PROC_ID)
+        if self.master_process:
+            self._round_finished(counts)
+            return [result for chunk in results for result in chunk]
+
+    def _evaluate_arrays(self, task_name=None, task_ids=None, genomes=None,
+                         prototype=None):
+        """
+        Collective evaluation of genome matrix rows: one Scatterv
+        of genes (as bytes), one Gatherv of float results
+        """
+        header = None
+        if self.master_process:
+            genomes = np.ascontiguousarray(genomes)
+            header = (
+                task_name, prototype, genomes.dtype.str, genomes.shape)
+        task_name, prototype, dtype, shape = self.comm.bcast(
+            header, root=MASTER_PROC_ID)
+
+        counts, offsets = self._split(shape[0], self.proc_count)
+        row_bytes = int(np.prod(shape[1:])) * np.dtype(dtype).itemsize
+        rows = np.empty(
+            (counts[self.proc_id],) + tuple(shape[1:]), dtype=dtype)
+        send = None
+        if self.master_process:
+            send = [
+                genomes.reshape(-1).view(np.uint8),
+                counts * row_bytes, offsets * row_bytes, MPI.BYTE,
+            ]
+            self._round_started(counts, row_bytes)
+        self.comm.Scatterv(
+            send, [rows.reshape(-1).view(np.uint8), MPI.BYTE],
+            root=MASTER_PROC_ID)
+
+        # Ranks beyond the row count get nothing to evaluate
+        results = np.empty(0)
+        if len(rows):
+            results = np.asarray(self._run_array_tasks(
+                task_name, xrange(len(rows)), rows, prototype), dtype=float)
+
+        fitness = None
+        receive = None
+        if self.master_process:
+            fitness = np.empty(shape[0])
+            receive = [fitness, counts, offsets, MPI.DOUBLE]
+        self.comm.Gatherv(results, receive, root=MASTER_PROC_ID)
+        if self.master_process:
+            self._round_finished(counts, np.dtype(float).itemsize)
+            return zip(task_ids, fitness)
+
+    def _round_started(self, counts, bytes_per_task=0):
+        """
+        Worker metrics: ranks with tasks become busy
+        """
+        for worker_id in self._get_worker_ids():
+            if counts[worker_id]:
+                self._metrics.sent(
+                    worker_id, counts[worker_id] * bytes_per_task)
+
+    def _round_finished(self, counts, bytes_per_task=0):
+        for worker_id in self._get_worker_ids():
+            if counts[worker_id]:
+                self._metrics.received(
+                    worker_id, counts[worker_id] * bytes_per_task,
+                    counts[worker_id])
+
+
+# Pool process state, set once when the pool starts
+_POOL_WORKER = {}
+
+
+def _init_pool_worker(received_data, prepared_tasks, late_data):
+    _POOL_WORKER['received_data'] = received_data
+    _POOL_WORKER['prepared_tasks'] = prepared_tasks
+    _POOL_WORKER['late_data'] = late_data
+
+
+def _run_pool_chunk(task_name, chunk, worker=None, late_version=0):
+    """
+    Run prepared tasks inside pool process (or thread, with its own
+    'worker' state). Chunk needs data broadcasted after the pool
+    started, up to 'late_version' (0 - none), fetched once per version.
+    Returns (task_id, result, error) triples, so that a failed task
+    does not go unnoticed by the master.
+    """
+    if worker is None:
+        worker = _POOL_WORKER
+    task = worker['prepared_tasks'].get(task_name)
+    if task is None:
+        task = PREPARED_TASKS[task_name]
+    received_data = worker['received_data']
+    if late_version:
+        if worker.get('late_version') != late_version:
+            worker['late_version'] = late_version
+            worker['late_received_data'] = dict(
+                received_data, **worker['late_data'][late_version])
+        received_data = worker['late_received_data']
+
+    results = []
+    for task_id, kwargs in chunk:
+        # Broadcasted arguments have priority, as with MPI workers
+        kwargs = dict(kwargs.items() + received_data.items())
+        try:
+            results.append((task_id, task(**kwargs), None))
+        except Exception:
+            results.append((task_id, None, traceback.format_exc()))
+    return results
+
+
+def _run_pool_task(task_id, task):
+    try:
+        return [(task_id, pickle.loads(task)(), None)]
+    except Exception:
+        return [(task_id, None, traceback.format_exc())]
+
+
+def _run_thread_task(task_id, task):
+    try:
+        return [(task_id, task(), None)]
+    except Exception:
+        return [(task_id, None, traceback.format_exc())]
+
+
+class PoolParallelizer(Parallelizer):
+    """
+    Runs tasks in a pool of local processes, without MPI.
+    Broadcasted data is handed to each process once, when the pool
+    starts with the first task. Data broadcasted later (e.g. genome
+    matrix of each generation) is stored once by version in a manager
+    process, so the pool keeps running. Chunks carry only the version
+    and each process fetches the data of a version once.
+    Worker metrics (see 'WorkerMetrics') are measured from MPI messages
+    only, pool calls leave 'metrics' None.
+    """
+    def __init__(self, prepared_tasks=None, processes=None,
+                 chunk_size=None):
+        super(PoolParallelizer, self).__init__(
+            prepared_tasks=prepared_tasks, chunk_size=chunk_size)
+        self.comm = None
+        self.processes = processes or multiprocessing.cpu_count()
+        # Master plus workers, as with MPI
+        self.proc_count = self.processes + 1
+        self.proc_id = MASTER_PROC_ID
+
+        self._pool = None
+        # Worker state passed along with tasks, None - set by initializer
+        self._worker = None
+        # Data broadcasted since the pool started, all of it by version
+        # in manager's dictionary, older versions kept for running chunks
+        self._late_data = {}
+        self._manager = None
+        self._late_store = None
+        self._late_versions = []
+        self._broadcast_count = 0
+        # Pool calls without results yet (AsyncResult)
+        self._pending = []
+        self._task_results = {}
+        self._task_semaphore = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if self._pool is not None:
+            if type is None:
+                self._pool.close()
+            else:
+                self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+    @property
+    def worker_count(self):
+        return self.processes
+
+    def broadcast(self, **kwargs):
+        """
+        Data for pool processes, see class docstring
+        """
+        self.received_data.update(kwargs)
+        if self._pool is not None:
+            self._late_data.update(kwargs)
+            self._broadcast_count += 1
+            if not self._pending:
+                for version in self._late_versions:
+                    del self._late_store[version]
+                self._late_versions = []
+            self._late_store[self._broadcast_count] = self._late_data
+            self._late_versions.append(self._broadcast_count)
+        return self
+
+    def start_task(self, task_id, task):
+        self._submit(_run_pool_task, (
+            task_id,
+            pickle.dumps(task, pickle.HIGHEST_PROTOCOL),
+        ))
+
+    def start_prepared_task(self, task_id, task_name, **kwargs):
+        self.start_prepared_tasks(task_name, [(task_id, kwargs)])
+
+    def start_prepared_tasks(self, task_name, tasks):
+        """
+        Several tasks per pool call, see 'chunk_size'
+        """
+        if self.get_prepared_task(task_name) is None:
+            raise ValueError("Prepared task with such name was not found")
+        tasks = list(tasks)
+        chunk_size = self.chunk_size(len(tasks))
+        self._start_pool()
+        for start in xrange(0, len(tasks), chunk_size):
+            self._submit(
+                _run_pool_chunk,
+                (task_name, tasks[start:start + chunk_size], self._worker,
+                 self._broadcast_count))
+
+    def finished_tasks(self):
+        """
+        Wait for all tasks, return all results collected so far
+        """
+        while self._task_semaphore > 0:
+            self._wait_for_result()
+
+        for task_id, task_result in self._task_results.iteritems():
+            yield task_id, task_result
+        self._task_results = {}
+
+    def snapshot_metrics(self):
+        """
+        No worker metrics, see class docstring
+        """
+        return None
+
+    def next_finished_task(self):
+        if not self._task_results:
+            if self._task_semaphore == 0:
+                raise RuntimeError("No running tasks")
+            self._wait_for_result()
+        return self._task_results.popitem()
+
+    def _create_pool(self):
+        if self._manager is None:
+            self._manager = multiprocessing.Manager()
+            self._late_store = self._manager.dict()
+        return multiprocessing.Pool(
+            self.processes,
+            _init_pool_worker,
+            (self.received_data, self.prepared_tasks, self._late_store))
+
+    def _start_pool(self):
+        if self._pool is None:
+            # Gets all data broadcasted so far
+            self._pool = self._create_pool()
+            self._late_data = {}
+            self._late_versions = []
+            self._broadcast_count = 0
+
+    def _submit(self, function, args):
+        self._start_pool()
+        self._pending.append(self._pool.apply_async(function, args))
+        self._task_semaphore += 1
+
+    def _wait_for_result(self):
+        """
+        Store results of any single completed pool call. Errors outside
+        of tasks (e.g. result failing to pickle) are re-raised by 'get'.
+        """
+        while not any(result.ready() for result in self._pending):
+            self._pending[0].wait(POOL_POLL_INTERVAL)
+        result = next(result for result in self._pending if result.ready())
+        self._pending.remove(result)
+        self._task_semaphore -= 1
+        chunk_results = result.get()
+        for task_id, task_result, error in chunk_results:
+            if error is not None:
+                raise RuntimeError("Task %s failed:\n%s" % (task_id, error))
+            self._task_results[task_id] = task_result
+
+
+class ThreadPoolParallelizer(PoolParallelizer):
+    """
+    Runs tasks in threads of the master process. All of them share
+    broadcasted data (e.g. source and target images) without copying
+    or pickling. Pays off only when tasks spend most of their time
+    in code releasing the GIL, like NumPy and scipy.ndimage kernels.
+    """
+    def __init__(self, prepared_tasks=None, processes=None,
+                 chunk_size=None):
+        super(ThreadPoolParallelizer, self).__init__(
+            prepared_tasks=prepared_tasks, processes=processes,
+            chunk_size=chunk_size)
+        # Same dictionaries as master's, updated by 'broadcast'
+        self._worker = {
+            'received_data': self.received_data,
+            'prepared_tasks': self.prepared_tasks,
+        }
+
+    def broadcast(self, **kwargs):
+        """
+        Threads see new data right away
+        """
+        self.received_data.update(kwargs)
+        return self
+
+    def start_task(self, task_id, task):
+        self._submit(_run_thread_task, (task_id, task))
+
+    def _create_pool(self):
+        return multiprocessing.pool.ThreadPool(self.processes)
+
 
 class NullParallelizer(Parallelizer):
     """
@@ -320,6 +1764,10 @@ class NullParallelizer(Parallelizer):
     def master_process(self):
         return True
 
+    @property
+    def worker_count(self):
+        return 1
+
     def start_task(self, task_id, task):
         """
         Run the task and save results
@@ -336,6 +1784,23 @@ class NullParallelizer(Parallelizer):
         self._task_results[task_id] = task(**all_kwargs)
         return self
 
+    def start_prepared_tasks(self, task_name, tasks):
+        """
+        Run them one by one
+        """
+        for task_id, kwargs in tasks:
+            self.start_prepared_task(task_id, task_name, **kwargs)
+        return self
+
+    def start_array_tasks(self, task_name, task_ids, genomes, prototype):
+        """
+        Rebuild chromosomes and run them one by one
+        """
+        for task_id, genes in zip(task_ids, genomes):
+            self.start_prepared_task(
+                task_id, task_name, chromosome=prototype.from_wire(genes))
+        return self
+
     def broadcast(self, **kwargs):
         self._received_data.update(kwargs)
 
@@ -346,3 +1811,11 @@ class NullParallelizer(Parallelizer):
         for task_id, task_result in self._task_results.iteritems():
             yield task_id, task_result
         self._task_results = {}
+
+    def next_finished_task(self):
+        """
+        Tasks have already been run, return any of them
+        """
+        if not self._task_results:
+            raise RuntimeError("No running tasks")
+        return self._task_results.popitem()
@@ -1,6 +1,30 @@
+import numpy as np
+from core.timing import PhaseTimer
+
+
+def top_indexes(values, count):
+    """
+    Indexes of 'count' highest values, ordered from the highest one.
+    Equal values keep their original order, as in stable sort.
+    Takes O(n + k log k) instead of sorting all values.
+    """
+    n = len(values)
+    if count >= n:
+        return np.argsort(-values, kind='mergesort')
+    if count <= 0:
+        return np.empty(0, dtype=int)
+
+    # k-th highest value splits the array into two parts
+    threshold = np.partition(values, n - count)[n - count]
+    above = np.flatnonzero(values > threshold)
+    equal = np.flatnonzero(values == threshold)[:count - len(above)]
+    top = np.concatenate((above, equal))
+    return top[np.argsort(-values[top], kind='mergesort')]
+
 
 class Population(object):
-    def __init__(self, phenotype, size=0, parallelizer=None):
+    def __init__(self, phenotype, size=0, parallelizer=None,
+                 fitness_cache=None):
         # Class of concrete individual
         self.phenotype = phenotype
 
@@ -8,13 +32,28 @@ class Population(object):
         # Distribute chromosome creation/fitness calculation to workers
         self.parallelizer = parallelizer
 
+        # Optional FitnessCache, shared between generations
+        self.fitness_cache = fitness_cache
+        # Cache usage during the last fitness calculation
+        self.cache_statistics = None
+        # Time spent creating and evaluating this population,
+        # algorithm adds its own phases (selection, crossover...)
+        self.timer = PhaseTimer()
+        # Fitness calculation in progress
+        self._reset_evaluation()
+
         self._individuals = [
             phenotype()
             for _ in xrange(size)
         ]
         self._total_fitness = None
         self._average_fitness = None
-        self._best_individuals = []
+
+        # Fitness values as of the last 'calculate_fitness' call
+        self._fitness = np.empty(0)
+        # Indexes from the best individual to the worst one,
+        # sorted only when needed
+        self._ranking = None
 
     def __len__(self):
         return self._individuals.__len__()
@@ -36,50 +75,245 @@ class Population(object):
             self._individuals.append(individual)
         return self
 
+    @property
+    def fitness_values(self):
+        """
+        Fitness of all individuals as an array, in population order
+        """
+        return self._fitness
+
+    @property
+    def ranking(self):
+        """
+        Individual indexes, ordered from the highest fitness
+        """
+        if self._ranking is None:
+            # Stable sort keeps the original order of equally fit individuals
+            self._ranking = np.argsort(
+                -self.fitness_values, kind='mergesort')
+        return self._ranking
+
+    def chromosome(self, index):
+        """
+        Chromosome of specified individual
+        """
+        return self[index].chromosome
+
+    @property
+    def genomes(self):
+        """
+        Genome matrix, one row per individual
+        """
+        return np.array([
+            self.chromosome(index).to_array()
+            for index in xrange(len(self))
+        ])
+
+    def add_genomes(self, genomes, fitness_values, prototype):
+        """
+        Add individuals with already known fitness, given as genome
+        matrix rows and any chromosome of the same genotype.
+        Without fitness values, 'calculate_fitness' evaluates them.
+        """
+        if fitness_values is None:
+            fitness_values = [None] * len(genomes)
+        for genes, fitness in zip(genomes, fitness_values):
+            individual = self.phenotype(chromosome=prototype.from_array(genes))
+            individual.fitness = fitness
+            self += individual
+
+    def start_evaluation(self, indexes):
+        """
+        Start calculating fitness of specified individuals without
+        waiting for results, 'calculate_fitness' collects them later.
+        With pipelined parallelizer, workers compute while
+        the rest of population is being created.
+        """
+        self._dispatch(indexes)
+
+    def _evaluate(self, indexes):
+        """
+        Calculate fitness of specified individuals, in parallel if possible,
+        together with any individuals from 'start_evaluation'.
+        Returns list of (index, fitness) pairs.
+        """
+        self._dispatch(indexes)
+        return self._collect()
+
+    def _dispatch(self, indexes):
+        """
+        Fitness cache is consulted first, so each distinct chromosome
+        is evaluated only once
+        """
+        # (task ID, kwargs) pairs for parallelizer
+        tasks = []
+
+        timer = self.timer
+        for index in indexes:
+            self._dispatched.add(index)
+            if self.fitness_cache is not None:
+                timer.switch('cache')
+                key = self.fitness_cache.key(self.chromosome(index))
+                if key in self._key_indexes:
+                    # Identical chromosome is already being evaluated
+                    self._key_indexes[key].append(index)
+                    continue
+                fitness = self.fitness_cache.get(key)
+                if fitness is not None:
+                    self._cached.append((index, fitness))
+                    continue
+                self._key_indexes[key] = [index]
+                self._task_keys[index] = key
+
+            # Distribute: individual index as task ID
+            if self.parallelizer is not None:
+                tasks.append((index, {'chromosome': self.chromosome(index)}))
+            else:
+                # Calculate fitness in an ordinary way
+                timer.switch('evaluation')
+                self._calculated.append(
+                    (index, self[index]._calculate_fitness()))
+
+        if tasks:
+            # Many individuals per message
+            timer.switch('dispatch')
+            if self.parallelizer.typed_transport:
+                self._dispatch_arrays(tasks)
+            else:
+                self.parallelizer.start_prepared_tasks(
+                    'calculate_fitness_parallel', tasks)
+
+    def _dispatch_arrays(self, tasks):
+        """
+        Send genes only, as matrix of 'Chromosome.to_wire' rows,
+        if those are of equal length
+        """
+        task_ids = [task_id for task_id, _ in tasks]
+        rows = [kwargs['chromosome'].to_wire() for _, kwargs in tasks]
+        if len(set(len(row) for row in rows)) > 1:
+            self.parallelizer.start_prepared_tasks(
+                'calculate_fitness_parallel', tasks)
+        else:
+            self.parallelizer.start_array_tasks(
+                'calculate_fitness_parallel', task_ids, np.array(rows),
+                prototype=tasks[0][1]['chromosome'])
+
+    def _collect(self):
+        """
+        Wait for all dispatched fitness calculations
+        """
+        cached, calculated = self._cached, self._calculated
+        if self.parallelizer is not None:
+            # Collect calculated fitness values for each individual
+            self.timer.switch('wait')
+            calculated += list(self.parallelizer.finished_tasks())
+
+        if self.fitness_cache is not None:
+            self.timer.switch('cache')
+            for task_id, task_result in calculated:
+                key = self._task_keys[task_id]
+                self.fitness_cache.put(key, task_result)
+                # Duplicates share the result
+                cached += [
+                    (index, task_result)
+                    for index in self._key_indexes[key][1:]
+                ]
+
+            count = len(self._dispatched)
+            self.cache_statistics = {
+                'hits': len(cached),
+                'misses': len(calculated),
+                'hit_rate': float(len(cached)) / count if count else 0.0,
+                'size': len(self.fitness_cache),
+            }
+
+        self._reset_evaluation()
+        return cached + calculated
+
+    def _reset_evaluation(self):
+        # Indexes of individuals being evaluated
+        self._dispatched = set()
+        # (index, fitness) pairs known so far
+        self._cached = []
+        self._calculated = []
+        # Task ID (index of first individual) -> cache key
+        self._task_keys = {}
+        # Cache key -> indexes of all individuals with such chromosome
+        self._key_indexes = {}
+
     def calculate_fitness(self, truncate_if_above=None):
         """
         Calculate individual fitness values in parallel
         """
-        # Distribute: individual index as task ID
-        if self.parallelizer is not None:
-            for task_id, individual in enumerate(self):
-                if individual.fitness is None:
-                    # This is quite inefficient in this case:
-                    # self.parallelizer.start_task(
-                    #     task_id, lambda: individual._calculate_fitness())
-
-                    # So use this:
-                    self.parallelizer.start_prepared_task(
-                        task_id, 'calculate_fitness_parallel',
-                        # Arbitrary number of kwargs
-                        chromosome=individual.chromosome)
-
-            # Collect and assign calculated fitness values for each individual
-            for task_id, task_result in self.parallelizer.finished_tasks():
-                self[task_id].fitness = task_result
-        else:
-            # Calculate fitness in an ordinary way
-            for individual in self:
-                if individual.fitness is None:
-                    individual.fitness = individual._calculate_fitness()
+        self.timer.switch('bookkeeping')
+        unknown = [
+            index
+            for index, individual in enumerate(self)
+            if individual.fitness is None and index not in self._dispatched
+        ]
+        results = self._evaluate(unknown)
+
+        self.timer.switch('bookkeeping')
+        for index, fitness in results:
+            self[index].fitness = fitness
 
-        self._best_individuals = sorted(
-            self,
-            key=lambda individual: individual.fitness,
-            reverse=True)
+        self._fitness = np.array(
+            [individual.fitness for individual in self], dtype=float)
+        self._rank(truncate_if_above)
+        self.timer.stop()
+
+    @property
+    def timings(self):
+        """
+        Seconds spent in each phase of creating this population
+        """
+        return self.timer.record
+
+    def _rank(self, truncate_if_above=None):
+        """
+        Update ranking and statistics after fitness calculation
+        """
+        self.timer.switch('sorting')
+        self._ranking = None
 
         # HACK: if actual population size is larger than expected,
         # remove least fit individuals
         if truncate_if_above is not None:
-            to_remove = len(self) - truncate_if_above
-            if to_remove > 0:
-                for individual in self.worst_individuals(to_remove):
-                    self._individuals.remove(individual)
-                    self._best_individuals.remove(individual)
+            if len(self) - truncate_if_above > 0:
+                self._keep(np.sort(
+                    top_indexes(self._fitness, truncate_if_above)))
 
         # Calculate these properties once
-        self._total_fitness = sum([individual.fitness for individual in self])
+        self._total_fitness = float(self._fitness.sum())
+        self._average_fitness = self._total_fitness / len(self)
+
+    def _keep(self, indexes):
+        """
+        Leave only the individuals at specified (sorted) indexes
+        """
+        self._individuals = [self._individuals[index] for index in indexes]
+        self._fitness = self._fitness[indexes]
+
+    @property
+    def worst_index(self):
+        """
+        Index of the individual with lowest fitness
+        (the last one of equally unfit, as in 'worst_individual')
+        """
+        fitness = self.fitness_values
+        return np.flatnonzero(fitness == fitness.min())[-1]
+
+    def replace(self, index, individual):
+        """
+        Put an evaluated individual in place of another one,
+        keeping fitness statistics up to date.
+        Used by steady state algorithm instead of 'calculate_fitness'.
+        """
+        self._total_fitness += individual.fitness - self._fitness[index]
         self._average_fitness = self._total_fitness / len(self)
+        self._fitness[index] = individual.fitness
+        self[index] = individual
+        self._ranking = None
 
     @property
     def total_fitness(self):
@@ -103,10 +337,12 @@ class Population(object):
         """
         Specified number of solutions with highest fitness
         """
-        if count is None:
-            return self._best_individuals
+        if count is None or self._ranking is not None:
+            indexes = self.ranking[:count]
         else:
-            return self._best_individuals[:count]
+            # Partial ranking is enough for a few elite individuals
+            indexes = top_indexes(self.fitness_values, count)
+        return [self[index] for index in indexes]
 
     @property
     def worst_individual(self):
@@ -123,7 +359,182 @@ class Population(object):
         """
         Specified number of individuals with lowest fitness
         """
-        if count is None:
-            return self._best_individuals[::-1]
+        return [self[index] for index in self.ranking[::-1][:count]]
+
+
+class ArrayPopulation(Population):
+    """
+    Population keeping genomes of all individuals in a single
+    (population_size, chromosome_length) numpy matrix and fitness values
+    in a parallel float array (NaN - not calculated yet).
+    Individual instances are only created when population gets indexed.
+    Suitable for fixed length chromosomes only.
+    """
+    def __init__(self, phenotype, size=0, parallelizer=None,
+                 fitness_cache=None):
+        super(ArrayPopulation, self).__init__(
+            phenotype, size=0, parallelizer=parallelizer,
+            fitness_cache=fitness_cache)
+
+        # Any chromosome of this population, used to turn
+        # genome matrix rows back into chromosomes
+        self._prototype = None
+        self._genomes = None
+
+        # Already created individuals by row index
+        self._cache = {}
+        # Individuals added since the last update of genome matrix
+        self._pending = []
+
+        if size > 0:
+            self += [phenotype() for _ in xrange(size)]
+
+    def __len__(self):
+        packed = 0 if self._genomes is None else len(self._genomes)
+        return packed + len(self._pending)
+
+    def __iter__(self):
+        for index in xrange(len(self)):
+            yield self[index]
+
+    def __getitem__(self, key):
+        self._pack()
+        if isinstance(key, slice):
+            return [self[index] for index in xrange(*key.indices(len(self)))]
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("Population index out of range")
+
+        if key not in self._cache:
+            individual = self.phenotype(chromosome=self.chromosome(key))
+            if not np.isnan(self._fitness[key]):
+                individual.fitness = self._fitness[key]
+            self._cache[key] = individual
+        return self._cache[key]
+
+    def __setitem__(self, index, individual):
+        self._pack()
+        self._genomes[index] = individual.chromosome.to_array()
+        self._fitness[index] = self._fitness_or_nan(individual)
+        self._cache[index] = individual
+        self._ranking = None
+
+    def __iadd__(self, individual):
+        if isinstance(individual, list):
+            self._pending += individual
         else:
-            return self._best_individuals[::-1][:count]
+            self._pending.append(individual)
+        return self
+
+    @property
+    def genomes(self):
+        """
+        Genome matrix, one row per individual
+        """
+        self._pack()
+        return self._genomes
+
+    def add_genomes(self, genomes, fitness_values, prototype):
+        """
+        Append rows without creating individuals
+        """
+        self._pack()
+        if fitness_values is None:
+            fitness_values = np.full(len(genomes), np.nan)
+        if self._prototype is None:
+            self._prototype = prototype
+        if self._genomes is None:
+            self._genomes = np.array(genomes)
+        else:
+            self._genomes = np.vstack((self._genomes, genomes))
+        self._fitness = np.concatenate((self._fitness, fitness_values))
+        self._ranking = None
+
+    @property
+    def fitness_values(self):
+        """
+        Fitness array parallel to genome matrix rows
+        """
+        self._pack()
+        return self._fitness
+
+    def chromosome(self, index):
+        """
+        Chromosome of specified individual, without creating the individual
+        """
+        if index in self._cache:
+            return self._cache[index].chromosome
+        packed = 0 if self._genomes is None else len(self._genomes)
+        if index >= packed:
+            # Not in genome matrix yet
+            return self._pending[index - packed].chromosome
+        return self._prototype.from_array(self._genomes[index])
+
+    def calculate_fitness(self, truncate_if_above=None):
+        """
+        Calculate missing fitness values in parallel
+        """
+        self.timer.switch('bookkeeping')
+        self._pack()
+        unknown = [
+            index
+            for index in np.flatnonzero(np.isnan(self._fitness))
+            if index not in self._dispatched
+        ]
+        results = self._evaluate(unknown)
+
+        self.timer.switch('bookkeeping')
+        for index, fitness in results:
+            self._fitness[index] = fitness
+            if index in self._cache:
+                self._cache[index].fitness = fitness
+
+        self._rank(truncate_if_above)
+        self.timer.stop()
+
+    def _pack(self):
+        """
+        Move pending individuals into genome matrix and fitness array
+        """
+        if not self._pending:
+            return
+
+        if self._prototype is None:
+            self._prototype = self._pending[0].chromosome
+
+        rows = [
+            individual.chromosome.to_array()
+            for individual in self._pending
+        ]
+        if self._genomes is None:
+            self._genomes = np.array(rows)
+        else:
+            self._genomes = np.vstack([self._genomes] + rows)
+        self._fitness = np.concatenate((
+            self._fitness,
+            [self._fitness_or_nan(individual) for individual in self._pending]
+        ))
+
+        # Rows and fitness are all that is kept, individuals
+        # get rebuilt by __getitem__ when needed
+        self._pending = []
+
+    def _keep(self, indexes):
+        """
+        Leave only the rows at specified (sorted) indexes
+        """
+        self._genomes = self._genomes[indexes]
+        self._fitness = self._fitness[indexes]
+        self._cache = dict(
+            (new_index, self._cache[old_index])
+            for new_index, old_index in enumerate(indexes)
+            if old_index in self._cache
+        )
+
+    @staticmethod
+    def _fitness_or_nan(individual):
+        if individual.fitness is None:
+            return np.nan
+        return individual.fitness
@@ -0,0 +1,68 @@
+import zlib
+import numpy as np
+from core.chromosomes import Chromosome
+from core.crossovers import Crossover
+from core.selections import Selection
+
+
+# Upper bound of integer seeds drawn from streams
+MAX_SEED = np.iinfo(np.int32).max
+
+# Randomizers of GA operators, replaced by streams and saved by checkpoints
+RANDOMIZERS = {
+    'chromosome': Chromosome,
+    'crossover': Crossover,
+    'selection': Selection,
+}
+
+
+def _key_word(part):
+    """
+    32-bit word of stream key: integers as they are, names by checksum,
+    which (unlike 'hash') is the same in every process
+    """
+    if isinstance(part, basestring):
+        return zlib.crc32(part) & 0xffffffff
+    return int(part) & 0xffffffff
+
+
+class RandomStreams(object):
+    """
+    Independent random number generators derived from a single seed
+    and a key, e.g. ('selection', generation) or ('breeding', generation,
+    pair). The same seed and key give the same stream in every process,
+    regardless of process count or of the order tasks complete in.
+
+    streams = RandomStreams(seed=42)
+    streams.install(generation)
+    island_streams = streams.spawn('island', island_id)
+    """
+    def __init__(self, seed=None, key=()):
+        if seed is None:
+            seed = np.random.randint(MAX_SEED)
+        self.seed = seed
+        self._key = tuple(key)
+
+    def key(self, *key):
+        """
+        Seed of the stream, as accepted by np.random.RandomState.
+        Cheap to send to other processes instead of the generator itself.
+        """
+        return [_key_word(part) for part in (self.seed,) + self._key + key]
+
+    def stream(self, *key):
+        return np.random.RandomState(self.key(*key))
+
+    def spawn(self, *key):
+        """
+        Streams of e.g. a single island, with keys prefixed by specified one
+        """
+        return RandomStreams(self.seed, self._key + key)
+
+    def install(self, *key):
+        """
+        Replace randomizers of all GA operators (see 'RANDOMIZERS')
+        with streams named after them
+        """
+        for name, owner in RANDOMIZERS.items():
+            owner._randomizer = self.stream(name, *key)
@@ -29,6 +29,24 @@ class Selection(object):
         """
         pass
 
+    def select(self, population, count):
+        """
+        Returns specified number of selected individuals at once.
+        Implementations should override 'select_indices'
+        with a batched version.
+        """
+        indexes = self.select_indices(population, count)
+        if indexes is None:
+            return [self.run(population) for _ in xrange(count)]
+        return [population[index] for index in indexes]
+
+    def select_indices(self, population, count):
+        """
+        Population indexes of specified number of selected individuals
+        (numpy array), None - only 'run' is implemented
+        """
+        return None
+
 
 class RouletteWheelSelection(Selection):
     """
@@ -51,6 +69,23 @@ class RouletteWheelSelection(Selection):
         # Should never reach this
         raise RuntimeError('Roulette wheel did not pick any chromosome.')
 
+    def select_indices(self, population, count):
+        """
+        Binary search of all picked values in cumulative fitness ratios
+        """
+        # Best individuals first, as in 'run'
+        ranking = population.ranking
+        fitness = population.fitness_values[ranking]
+        cumulative_ratios = np.cumsum(fitness / population.total_fitness)
+
+        picked_values = self._randomizer.random_sample(count)
+        # First individual whose cumulative ratio reaches picked value.
+        # Rounding errors might leave the last ratio slightly below 1.0
+        ranks = np.minimum(
+            np.searchsorted(cumulative_ratios, picked_values, side='left'),
+            len(ranking) - 1)
+        return ranking[ranks]
+
 
 class RankSelection(Selection):
     """
@@ -71,6 +106,20 @@ class RankSelection(Selection):
         # Should never reach this
         raise RuntimeError('Rank selection did not pick any chromosome.')
 
+    def select_indices(self, population, count):
+        """
+        Binary search of all picked values in cumulative ranks
+        """
+        ranking = population.ranking
+        n = len(ranking)
+        rank_sum = (n * (n - 1)) / 2
+        alphas = self._randomizer.random_integers(1, rank_sum, count)
+
+        # Ranks from the best individual: n, n - 1, ..., 1
+        cumulative_ranks = np.cumsum(np.arange(n, 0, -1))
+        positions = np.searchsorted(cumulative_ranks, alphas, side='left')
+        return ranking[positions]
+
 
 class TournamentSelection(Selection):
     """
@@ -93,3 +142,18 @@ class TournamentSelection(Selection):
         best_individual = max(
             tournament_population, key=lambda a: a.fitness)
         return best_individual
+
+    def select_indices(self, population, count):
+        """
+        Draw participants of all tournaments at once
+        """
+        fitness = population.fitness_values
+        # One row of population indexes per tournament
+        participants = self._randomizer.random_integers(
+            0, len(population) - 1,
+            (count, int(self.tournament_size)))
+
+        # First of the fittest participants wins, as in 'max'
+        return participants[
+            np.arange(count),
+            np.argmax(fitness[participants], axis=1)]
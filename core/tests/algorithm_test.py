@@ -1,10 +1,24 @@
 from mock import Mock
+import os
+import numpy as np
+import json
+import shutil
+import time
+import tempfile
 import unittest
 from core.chromosomes import Chromosome
-from core.algorithm import Algorithm
+from core.algorithm import Algorithm, SteadyStateAlgorithm
+from core.population import Population, ArrayPopulation
+from core.crossovers import OnePointCrossover, CutSpliceCrossover
+from core.selections import TournamentSelection
+from core.tests.population_test import _BitCountIndividual
+from core.tests.population_test import _bit_count_individual
+from core.parallelizer import NullParallelizer, ThreadPoolParallelizer
 from core.crossovers import Crossover
 from core.selections import Selection
 from core.solution import Solution, SolutionFactory
+from core.rng import RandomStreams
+from core.fitness_cache import FitnessCache
 
 
 class AlgorithmTests(unittest.TestCase):
@@ -14,6 +28,7 @@ class AlgorithmTests(unittest.TestCase):
         """
         class _FakeIndividual(Mock):
             mutation_count = 0
+            fitness = None
 
             def mutate(self, rate):
                 _FakeIndividual.mutation_count += 1
@@ -29,6 +44,9 @@ class AlgorithmTests(unittest.TestCase):
                 self.count += 1
                 return _FakeIndividual()
 
+            def select(self, population, count):
+                return [self.run(population) for _ in xrange(count)]
+
         class _FakeCrossover(Mock):
             count = 0
 
@@ -123,6 +141,179 @@ class AlgorithmTests(unittest.TestCase):
         pass
 
 
+class PhaseTimingTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_phase_timings(self):
+        """
+        Algorithm - each generation records time of its phases
+        """
+        filepath = os.path.join(self.directory, 'timings.jsonl')
+        alg = Algorithm(
+            _BitCountIndividual,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=6,
+            elitism_count=2,
+            timings_file=filepath)
+        for population, generation in alg.run(3):
+            timings = population.timings
+            for phase in ('selection', 'crossover', 'mutation',
+                          'evaluation', 'sorting', 'bookkeeping'):
+                self.assertIn(phase, timings)
+            self.assertAlmostEquals(
+                timings['total'],
+                sum(timings.values()) - timings['total'])
+
+        with open(filepath) as fp:
+            records = [json.loads(line) for line in fp]
+        self.assertEquals(
+            [record['generation'] for record in records], [1, 2, 3])
+
+
+class WorkerBreedingTests(unittest.TestCase):
+    def _run(self, parallelizer):
+        Chromosome._randomizer = np.random.RandomState(0)
+        Crossover._randomizer = np.random.RandomState(1)
+        Selection._randomizer = np.random.RandomState(2)
+        alg = Algorithm(
+            _BitCountIndividual,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=7,
+            mutation_rate=0.05,
+            elitism_count=1,
+            parallelizer=parallelizer,
+            worker_breeding=True)
+        for population, generation in alg.run(4):
+            self.assertEquals(len(population), 7)
+        return population.genomes.tolist(), list(population.fitness_values)
+
+    def tearDown(self):
+        Chromosome._randomizer = np.random.RandomState()
+        Crossover._randomizer = np.random.RandomState()
+        Selection._randomizer = np.random.RandomState()
+
+    def test_reproducible(self):
+        """
+        Algorithm - offspring bred by workers do not depend on where
+        they were bred
+        """
+        parallelizer = NullParallelizer()
+        parallelizer.broadcast(phenotype=_BitCountIndividual)
+        serial = self._run(None)
+        self.assertEquals(self._run(parallelizer), serial)
+
+        genomes, fitness = serial
+        self.assertSequenceEqual(
+            fitness, [float(sum(genes)) for genes in genomes])
+
+
+class _SlowBitCountIndividual(_BitCountIndividual):
+    """
+    Lets other threads run while decoding
+    """
+    def _decode(self, chromosome):
+        time.sleep(0.001)
+        super(_SlowBitCountIndividual, self)._decode(chromosome)
+
+
+class RandomStreamsTests(unittest.TestCase):
+    phenotype = _BitCountIndividual
+
+    def _run(self, parallelizer=None, worker_breeding=False):
+        alg = Algorithm(
+            self.phenotype,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=7,
+            mutation_rate=0.05,
+            elitism_count=1,
+            parallelizer=parallelizer,
+            worker_breeding=worker_breeding,
+            random_streams=RandomStreams(seed=5))
+        for population, generation in alg.run(4):
+            pass
+        return population.genomes.tolist(), list(population.fitness_values)
+
+    def tearDown(self):
+        Chromosome._randomizer = np.random.RandomState()
+        Crossover._randomizer = np.random.RandomState()
+        Selection._randomizer = np.random.RandomState()
+
+    def test_reproducible(self):
+        """
+        Algorithm - run is reproduced from the seed of streams alone
+        """
+        serial = self._run()
+        Selection._randomizer = np.random.RandomState(42)
+        self.assertEquals(self._run(), serial)
+
+        parallelizer = NullParallelizer()
+        parallelizer.broadcast(phenotype=_BitCountIndividual)
+        bred = self._run(worker_breeding=True)
+        self.assertEquals(
+            self._run(parallelizer, worker_breeding=True), bred)
+
+    def test_threads(self):
+        """
+        Algorithm - offspring bred in threads do not share randomizers
+        """
+        self.phenotype = _SlowBitCountIndividual
+        serial = self._run(worker_breeding=True)
+        with ThreadPoolParallelizer(processes=4, chunk_size=1) as pool:
+            pool.broadcast(phenotype=self.phenotype)
+            self.assertEquals(self._run(pool, worker_breeding=True), serial)
+
+    def test_steady_state(self):
+        """
+        Algorithm - steady state does not accept random streams
+        """
+        with self.assertRaises(ValueError):
+            SteadyStateAlgorithm(
+                _BitCountIndividual,
+                OnePointCrossover(0.8),
+                TournamentSelection(2),
+                random_streams=RandomStreams(seed=5))
+
+
+class BatchBreedingTests(unittest.TestCase):
+    def test_generations(self):
+        """
+        Algorithm - offspring bred on genome matrix, fitness evaluated
+        """
+        alg = Algorithm(
+            _BitCountIndividual,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=7,
+            mutation_rate=0.05,
+            elitism_count=1,
+            population_class=ArrayPopulation,
+            batch_breeding=True)
+        for population, generation in alg.run(3):
+            self.assertEquals(len(population), 7)
+        self.assertSequenceEqual(
+            list(population.fitness_values),
+            [float(sum(genes)) for genes in population.genomes])
+
+    def test_ragged_crossover(self):
+        """
+        Algorithm - batch breeding needs offspring genome matrices
+        """
+        with self.assertRaises(ValueError):
+            Algorithm(
+                _BitCountIndividual,
+                CutSpliceCrossover(0.8),
+                TournamentSelection(2),
+                population_class=ArrayPopulation,
+                batch_breeding=True)
+
+
 class _FakeChromosome(Chromosome):
     """
     Fake chromosome with mutation count tracking
@@ -194,3 +385,93 @@ class _FakeCrossover(Crossover):
         self.call_count += 1
         # Just return the parents
         return parent1, parent2
+
+
+class SteadyStateAlgorithmTests(unittest.TestCase):
+    def test_pseudo_generations(self):
+        """
+        Steady state algorithm - one pseudo-generation per
+        population size evaluations
+        """
+        alg = SteadyStateAlgorithm(
+            _BitCountIndividual,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=6,
+            mutation_rate=0.05,
+            replacement='worst_if_better')
+
+        previous_worst = None
+        for population, generation in alg.run(generations=5):
+            self.assertEquals(len(population), 6)
+            self.assertEquals(alg.evaluations, generation * 6)
+            self.assertAlmostEquals(
+                population.total_fitness,
+                sum(individual.fitness for individual in population))
+            # Worst individual never gets worse
+            worst = population.worst_individual.fitness
+            if previous_worst is not None:
+                self.assertGreaterEqual(worst, previous_worst)
+            previous_worst = worst
+        self.assertEquals(generation, 5)
+
+    def test_cache_statistics(self):
+        """
+        Steady state algorithm - cache use of each pseudo-generation
+        """
+        alg = SteadyStateAlgorithm(
+            _BitCountIndividual,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=6,
+            mutation_rate=0.05,
+            fitness_cache=FitnessCache())
+        statistics = []
+        for population, generation in alg.run(generations=4):
+            statistics.append(population.cache_statistics)
+        # Every dispatched offspring, incl. the first one still running
+        self.assertEquals(
+            sum(item['hits'] + item['misses'] for item in statistics),
+            alg.evaluations + 1)
+        # 8-bit chromosomes, offspring soon repeat
+        self.assertGreater(statistics[-1]['hit_rate'], 0.0)
+        self.assertEquals(len(set(map(id, statistics))), 4)
+
+    def test_worst_if_better(self):
+        """
+        Steady state algorithm - offspring not fitter than the worst
+        individual is discarded
+        """
+        alg = SteadyStateAlgorithm(
+            _BitCountIndividual,
+            OnePointCrossover(0.8),
+            TournamentSelection(2),
+            population_size=4,
+            replacement='worst_if_better')
+        alg._population = Population(_BitCountIndividual)
+        alg._population += [
+            _bit_count_individual([1, 1, 0, 0, 0, 0, 0, 0]),
+            _bit_count_individual([1, 0, 0, 0, 0, 0, 0, 0]),
+        ]
+        alg._population.calculate_fitness()
+
+        offspring = _bit_count_individual([1, 0, 0, 0, 0, 0, 0, 0])
+        offspring.fitness = 1.0
+        alg._insert(offspring)
+        self.assertIsNot(alg.population[1], offspring)
+
+        offspring.fitness = 3.0
+        alg._insert(offspring)
+        self.assertIs(alg.population[1], offspring)
+        self.assertEquals(alg.population.total_fitness, 5.0)
+
+    def test_timings_file(self):
+        """
+        Steady state algorithm - generation timings are not written
+        """
+        with self.assertRaises(ValueError):
+            SteadyStateAlgorithm(
+                _BitCountIndividual,
+                OnePointCrossover(0.8),
+                TournamentSelection(2),
+                timings_file='timings.json')
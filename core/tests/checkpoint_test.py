@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from mock import patch
+from core.algorithm import Algorithm
+from core.checkpoint import Checkpoint
+from core.rng import RANDOMIZERS
+from core.crossovers import OnePointCrossover
+from core.selections import TournamentSelection
+from core.individual import Individual
+from core.chromosomes import BinaryChromosome
+
+
+class _BinaryValueIndividual(Individual):
+    """
+    Fitness is the integer value of binary chromosome
+    """
+    def __init__(self, chromosome=None):
+        super(_BinaryValueIndividual, self).__init__(
+            genotype=lambda: BinaryChromosome(16),
+            chromosome=chromosome)
+
+    def _decode(self, chromosome):
+        self.bits = chromosome.to_array()
+
+    def _calculate_fitness(self):
+        return float(self.bits.dot(1 << np.arange(16)))
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.directory, 'run.npz')
+        self.randomizers = dict(
+            (name, owner._randomizer) for name, owner in RANDOMIZERS.items())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        for name, owner in RANDOMIZERS.items():
+            owner._randomizer = self.randomizers[name]
+
+    def _seed(self, seed):
+        for idx, owner in enumerate(RANDOMIZERS.values()):
+            owner._randomizer = np.random.RandomState(seed + idx)
+        np.random.seed(seed)
+
+    def _algorithm(self, checkpoint=None):
+        return Algorithm(
+            _BinaryValueIndividual,
+            OnePointCrossover(rate=0.9),
+            TournamentSelection(size=2),
+            population_size=8,
+            mutation_rate=0.05,
+            elitism_count=1,
+            checkpoint=checkpoint)
+
+    def _history(self, algorithm, generations):
+        history = []
+        for population, generation in algorithm.run(generations):
+            algorithm.iteration_stats.append(generation)
+            history.append((
+                generation,
+                [population.chromosome(idx).to_array().tolist()
+                 for idx in xrange(len(population))],
+                population.fitness_values.tolist()))
+        return history
+
+    def test_save_and_load(self):
+        """
+        Checkpoint - arrays survive a round trip
+        """
+        checkpoint = Checkpoint(self.filepath)
+        self.assertFalse(checkpoint.exists())
+        checkpoint.save(generation=3, fitness=np.array([0.5, 0.25]))
+        self.assertTrue(checkpoint.exists())
+        self.assertFalse(os.path.exists(self.filepath + '.tmp'))
+
+        state = checkpoint.load()
+        self.assertEquals(int(state['generation']), 3)
+        self.assertEquals(state['fitness'].tolist(), [0.5, 0.25])
+
+        checkpoint.remove()
+        self.assertFalse(checkpoint.exists())
+
+    def test_interval(self):
+        """
+        Checkpoint - save every N generations
+        """
+        checkpoint = Checkpoint(self.filepath, interval=3, max_overhead=None)
+        self.assertEquals(
+            [checkpoint.due(generation) for generation in xrange(1, 7)],
+            [False, False, True, False, False, True])
+
+    @patch('core.checkpoint.time.time')
+    def test_overhead(self, time_mock):
+        """
+        Checkpoint - skip snapshots costing too much time, report them
+        """
+        checkpoint = Checkpoint(self.filepath, max_overhead=0.01)
+        time_mock.side_effect = [0.0, 1.0]
+        checkpoint.save(generation=1)
+
+        # 1 s save is more than 1% of 10 s
+        time_mock.side_effect = [11.0]
+        self.assertFalse(checkpoint.due(2))
+        self.assertEquals(checkpoint.skipped_count, 1)
+
+        time_mock.side_effect = [12.0]
+        self.assertFalse(checkpoint.due(3))
+        self.assertEquals(checkpoint.skipped_count, 2)
+
+        time_mock.side_effect = [101.0]
+        self.assertTrue(checkpoint.due(4))
+        self.assertEquals(checkpoint.skipped_count, 2)
+
+    def test_resume(self):
+        """
+        Checkpoint - resumed run continues exactly as uninterrupted one
+        """
+        self._seed(0)
+        expected = self._history(self._algorithm(), 6)
+
+        self._seed(0)
+        checkpoint = Checkpoint(self.filepath, max_overhead=None)
+        history = self._history(self._algorithm(checkpoint), 3)
+
+        # Different randomizers in a new process
+        self._seed(100)
+        algorithm = self._algorithm(checkpoint)
+        history += self._history(algorithm, 6)
+
+        self.assertEquals(history, expected)
+        self.assertEquals(algorithm.iteration_stats, range(1, 7))
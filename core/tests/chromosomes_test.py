@@ -1,7 +1,8 @@
 import unittest
 import numpy as np
 from mock import Mock
-from core.chromosomes import BinaryChromosome
+from core.chromosomes import BinaryChromosome, IntegerChromosome
+from core.chromosomes import RealStatChromosome
 
 
 class BinaryChromosomeTests(unittest.TestCase):
@@ -23,46 +24,180 @@ class BinaryChromosomeTests(unittest.TestCase):
         """
         Binary chromosome - mutation does happen to every odd bit
         """
-        chromo = BinaryChromosome(0)
-        # Normally content isn't supposed to be set this way
-        chromo._content = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+        chromo = BinaryChromosome(0).from_array([0, 0, 0, 0, 1, 1, 1, 1])
 
         class _FakeRandomizer(object):
-            def __init__(self):
-                self.call_count = 0
-
-            def random_sample(self):
+            def random_sample(self, shape):
                 # Alternate between two values: 0.0002 and 0.5
-                self.call_count += 1
-                return 0.0002 if self.call_count % 2 == 1 else 0.5
+                return np.resize([0.0002, 0.5], shape)
 
         chromo._randomizer = _FakeRandomizer()
-        chromo.mutate(0.001)
+        mutated = chromo.mutate(0.001)
 
         expected = np.array([1, 0, 1, 0, 0, 1, 0, 1])
-        self.assertTrue((chromo._content == expected).all())
+        self.assertTrue((mutated.to_array() == expected).all())
+        # Chromosomes are immutable
+        original = np.array([0, 0, 0, 0, 1, 1, 1, 1])
+        self.assertTrue((chromo.to_array() == original).all())
+
+    def test_mutate_array(self):
+        """
+        Binary chromosome - mutate whole genome matrix at once
+        """
+        chromo = BinaryChromosome(0)
+        chromo._randomizer = Mock(
+            random_sample=Mock(return_value=np.array([
+                [0.5, 0.0, 0.5],
+                [0.0, 0.5, 0.0],
+            ])))
+        genomes = np.array([[0, 0, 0], [1, 1, 1]])
+        mutated = chromo.mutate_array(genomes, 0.1)
+        self.assertTrue((mutated == np.array([[0, 1, 0], [0, 1, 0]])).all())
+        self.assertTrue((genomes == np.array([[0, 0, 0], [1, 1, 1]])).all())
 
     def test_split_one_point(self):
         """
         Chromosome: split at one point
         """
-        chromo = BinaryChromosome(0)
-        chromo._content = np.array([1, 1, 1, 0, 0, 0])
+        chromo = BinaryChromosome(0).from_array([1, 1, 1, 0, 0, 0])
         part1, part2 = chromo.split(2)
-        self.assertTrue((part1._content == np.array([1, 1])).all())
-        self.assertTrue((part2._content == np.array([1, 0, 0, 0])).all())
+        self.assertTrue((part1.to_array() == np.array([1, 1])).all())
+        self.assertTrue((part2.to_array() == np.array([1, 0, 0, 0])).all())
 
     def test_split_two_points(self):
         """
         Chromosome: split at two points
         """
-        chromo = BinaryChromosome(0)
-        chromo._content = np.array([1, 1, 0, 0, 1, 1])
+        chromo = BinaryChromosome(0).from_array([1, 1, 0, 0, 1, 1])
         part1, part2, part3 = chromo.split([2, 4])
-        self.assertTrue((part1._content == np.array([1, 1])).all())
-        self.assertTrue((part2._content == np.array([0, 0])).all())
-        self.assertTrue((part3._content == np.array([1, 1])).all())
+        self.assertTrue((part1.to_array() == np.array([1, 1])).all())
+        self.assertTrue((part2.to_array() == np.array([0, 0])).all())
+        self.assertTrue((part3.to_array() == np.array([1, 1])).all())
+
+    def test_packed_splice(self):
+        """
+        Binary chromosome - split and concat across byte boundaries
+        """
+        bits = np.random.RandomState(0).randint(2, size=21)
+        chromo = BinaryChromosome(0).from_array(bits)
+        self.assertEquals(len(chromo._content), 3)
+        for point in (3, 8, 13):
+            part1, part2 = chromo.split(point)
+            self.assertTrue((part2.to_array() == bits[point:]).all())
+            self.assertEquals(part1.concat(part2), chromo)
+        self.assertEquals(chromo[5], bits[5])
+        self.assertEquals(repr(chromo[:4]), ''.join(map(str, bits[:4])))
+
+    def test_wire(self):
+        """
+        Binary chromosome - sent to workers as length and packed bits
+        """
+        bits = np.random.RandomState(0).randint(2, size=21)
+        chromo = BinaryChromosome(0).from_array(bits)
+        row = chromo.to_wire()
+        self.assertEquals(row.dtype, np.uint8)
+        self.assertEquals(len(row), 8 + 3)
+        received = BinaryChromosome(0).from_wire(row)
+        self.assertEquals(len(received), 21)
+        self.assertEquals(received, chromo)
+
+    def test_to_ints(self):
+        """
+        Binary chromosome - integers from bit fields, binary and Gray coded
+        """
+        chromo = BinaryChromosome(0).from_array(
+            [0, 0, 1, 1, 1, 1, 1, 1, 0, 1, 1, 0])
+        self.assertEquals(list(chromo.to_ints(4)), [3, 15, 6])
+        self.assertEquals(list(chromo.to_ints(4, gray=True)), [2, 10, 4])
+        self.assertRaises(ValueError, chromo.to_ints, 5)
+
+
+class IntegerChromosomeTests(unittest.TestCase):
+    def test_mutation_bounds(self):
+        """
+        Integer chromosome - mutated genes stay within min/max interval
+        """
+        chromo = IntegerChromosome(100, 3, 7)()
+        mutated = chromo.mutate(1.0)
+        self.assertEquals(len(mutated), 100)
+        self.assertTrue(((mutated._content >= 3) &
+                         (mutated._content <= 7)).all())
+
+    def test_slice_copy_on_write(self):
+        """
+        Integer chromosome - slices share genes until changed
+        """
+        chromo = IntegerChromosome(10, 0, 5)()
+        original = chromo.to_array().copy()
+        part = chromo[2:6]
+        self.assertTrue(np.may_share_memory(part._content, chromo._content))
+        part[0] = 9
+        self.assertTrue((chromo.to_array() == original).all())
+        chromo[3] = 9
+        self.assertEquals(part[1], original[3])
+
+    def test_concat_several(self):
+        """
+        Integer chromosome - several parts joined at once
+        """
+        chromo = IntegerChromosome(10, 0, 5)()
+        joined = chromo[:3].concat(chromo[3:5], chromo[5:])
+        self.assertTrue((joined.to_array() == chromo.to_array()).all())
+        self.assertEquals(joined.max_val, 5)
 
 
 class VarIntegerChromosomeTests(unittest.TestCase):
-    pass
+    def test_mutation_deactivates_genes(self):
+        """
+        Variable length integer chromosome - mutation into inactive genes
+        """
+        chromo = IntegerChromosome(10, 0, 5, null_gene_rate=0.0)()
+        self.assertEquals(chromo.active_gene_count(), 10)
+        chromo.null_gene_rate = 1.0
+        mutated = chromo.mutate(1.0)
+        self.assertEquals(len(mutated), 10)
+        self.assertEquals(mutated.active_gene_count(), 0)
+        self.assertEquals(chromo.active_gene_count(), 10)
+
+    def test_mutation_activates_genes(self):
+        """
+        Variable length integer chromosome - inactive genes get activated
+        """
+        chromo = IntegerChromosome(10, 0, 5, null_gene_rate=1.0)()
+        self.assertEquals(chromo.active_gene_count(), 0)
+        chromo.null_gene_rate = 0.0
+        mutated = chromo.mutate(1.0)
+        self.assertEquals(mutated.active_gene_count(), 10)
+        self.assertTrue(all(0 <= gene <= 5 for gene in mutated))
+
+    def test_active_genes(self):
+        """
+        Variable length integer chromosome - active genes, array round trip
+        """
+        chromo = IntegerChromosome(6, 0, 5, null_gene_rate=0.5)()
+        chromo = chromo.from_array([3, -1, 0, 5, -1, 2])
+        self.assertEquals(chromo.active_genes().tolist(), [3, 0, 5, 2])
+        self.assertEquals(list(chromo), [3, 0, 5, 2])
+        self.assertEquals(chromo.active_gene_count(), 4)
+        self.assertEquals(chromo[1], None)
+        self.assertEquals(chromo.to_array().tolist(), [3, -1, 0, 5, -1, 2])
+
+        # Slice shares genes until changed
+        part = chromo[1:4]
+        part[0] = 4
+        part[1] = None
+        self.assertEquals(part.to_array().tolist(), [4, -1, 5])
+        self.assertEquals(chromo.to_array().tolist(), [3, -1, 0, 5, -1, 2])
+        joined = chromo[:1].concat(part, chromo[4:])
+        self.assertEquals(joined.to_array().tolist(), [3, 4, -1, 5, -1, 2])
+
+
+class RealStatChromosomeTests(unittest.TestCase):
+    def test_mutation_per_index_distribution(self):
+        """
+        Real chromosome with statistics - mutation uses per-index mean
+        """
+        means = [1.0, 2.0, 3.0]
+        chromo = RealStatChromosome(3, means, [1e-12, 1e-12, 1e-12])
+        mutated = chromo.mutate(1.0)
+        self.assertTrue(np.allclose(mutated.to_array(), means))
@@ -1,8 +1,10 @@
 import unittest
+import numpy as np
 from mock import Mock, patch
 from core.crossovers import Crossover,  UniformCrossover
 from core.crossovers import OnePointCrossover, TwoPointCrossover
-from core.chromosomes import BinaryChromosome
+from core.crossovers import CutSpliceCrossover, WholeArithmeticCrossover
+from core.chromosomes import BinaryChromosome, IntegerChromosome
 
 
 class CrossoverTest(unittest.TestCase):
@@ -42,6 +44,40 @@ class CrossoverTest(unittest.TestCase):
         self.assertEquals(parent1.chromosome, 'aaa')
         self.assertEquals(parent2.chromosome, 'bbb')
 
+    def test_no_batch_form(self):
+        """
+        Crossover - without batch form, rows need prototype chromosome
+        """
+        crossover = self._SpecificCrossover(0.5)
+        self.assertFalse(crossover.batch_matrices)
+        self.assertTrue(OnePointCrossover(0.5).batch_matrices)
+        self.assertFalse(CutSpliceCrossover(0.5).batch_matrices)
+        self.assertRaises(
+            ValueError,
+            lambda: crossover.run_batch(np.zeros((2, 4)), np.ones((2, 4))))
+
+    def test_row_by_row(self):
+        """
+        Crossover - without batch form, rows crossed one by one
+        """
+        class _SwapCrossover(Crossover):
+            batch_matrices = True
+
+            def _run_specific(self, chromo1, chromo2):
+                return chromo2, chromo1
+
+        crossover = _SwapCrossover(0.5)
+        crossover._randomizer = Mock()
+        # Crossover happens for the first row only
+        crossover._randomizer.random_sample.return_value = np.array(
+            [0.1, 0.9])
+        genomes1 = np.array([[1, 2, 3], [4, 5, 6]])
+        genomes2 = np.array([[7, 8, 9], [0, 1, 2]])
+        new1, new2 = crossover.run_batch(
+            genomes1, genomes2, prototype=IntegerChromosome(3, 0, 9)())
+        self.assertEquals(new1.tolist(), [[7, 8, 9], [4, 5, 6]])
+        self.assertEquals(new2.tolist(), [[1, 2, 3], [0, 1, 2]])
+
 
 class OnePointCrossoverTest(unittest.TestCase):
     def test_one_point_crossover(self):
@@ -80,8 +116,8 @@ class TwoPointCrossoverTest(unittest.TestCase):
             def pick_split_point(self):
                 pass
 
-            def concat(self, other):
-                return _FakeChromosome(self + other)
+            def concat(self, *others):
+                return _FakeChromosome(self + ''.join(others))
 
             def split(self, split_points):
                 return (
@@ -118,3 +154,84 @@ class UniformCrossoverTest(unittest.TestCase):
         new1, new2 = crossover._run_specific(chromo1, chromo2)
         self.assertSequenceEqual(new1, [1, 0, 1, 0])
         self.assertSequenceEqual(new2, [0, 1, 0, 1])
+
+
+class BatchCrossoverTest(unittest.TestCase):
+    def setUp(self):
+        self.genomes1 = np.zeros((3, 6), dtype=int)
+        self.genomes2 = np.ones((3, 6), dtype=int)
+
+    def _run_batch(self, crossover, **kwargs):
+        crossover._randomizer = Mock()
+        # Crossover happens for the first two rows only
+        crossover._randomizer.random_sample.return_value = np.array(
+            [0.1, 0.1, 0.9])
+        for name, value in kwargs.items():
+            getattr(crossover._randomizer, name).return_value = value
+        return crossover.run_batch(self.genomes1, self.genomes2)
+
+    def test_one_point(self):
+        """
+        Crossover - one point, batch of genome matrix rows
+        """
+        new1, new2 = self._run_batch(
+            OnePointCrossover(0.5),
+            random_integers=np.array([[2], [4], [1]]))
+        self.assertEquals(new1.tolist(), [
+            [0, 0, 1, 1, 1, 1],
+            [0, 0, 0, 0, 1, 1],
+            [0, 0, 0, 0, 0, 0],
+        ])
+        self.assertTrue((new2 == 1 - new1).all())
+
+    def test_two_point(self):
+        """
+        Crossover - two point, batch of genome matrix rows
+        """
+        new1, _ = self._run_batch(
+            TwoPointCrossover(0.5),
+            random_integers=np.array([[4, 1], [2, 3], [1, 5]]))
+        self.assertEquals(new1.tolist(), [
+            [0, 1, 1, 1, 0, 0],
+            [0, 0, 1, 0, 0, 0],
+            [0, 0, 0, 0, 0, 0],
+        ])
+
+    def test_uniform(self):
+        """
+        Crossover - uniform, batch of genome matrix rows
+        """
+        swaps = np.array([[1, 0, 1, 0, 1, 0]] * 3)
+        new1, new2 = self._run_batch(UniformCrossover(0.5), randint=swaps)
+        self.assertEquals(new1.tolist()[0], [1, 0, 1, 0, 1, 0])
+        self.assertEquals(new2.tolist()[1], [0, 1, 0, 1, 0, 1])
+        self.assertEquals(new1.tolist()[2], [0] * 6)
+
+    def test_cut_splice(self):
+        """
+        Crossover - cut and splice, offspring rows of different lengths
+        """
+        crossover = CutSpliceCrossover(0.5)
+        crossover._randomizer = Mock()
+        crossover._randomizer.random_sample.return_value = np.array(
+            [0.1, 0.1, 0.9])
+        # Split points of first and second parents
+        crossover._randomizer.random_integers.side_effect = [
+            np.array([[2], [5], [1]]),
+            np.array([[4], [0], [3]]),
+        ]
+        new1, new2 = crossover.run_batch(self.genomes1, self.genomes2)
+        self.assertEquals(new1[0].tolist(), [0, 0, 1, 1])
+        self.assertEquals(new2[0].tolist(), [0, 0, 0, 0, 1, 1, 1, 1])
+        self.assertEquals(new1[1].tolist(), [0] * 5 + [1] * 6)
+        self.assertEquals(new1[2].tolist(), [0] * 6)
+        self.assertEquals(new2[2].tolist(), [1] * 6)
+
+    def test_whole_arithmetic(self):
+        """
+        Crossover - whole arithmetic, batch of genome matrix rows
+        """
+        new1, new2 = self._run_batch(WholeArithmeticCrossover(0.25, 0.5))
+        self.assertTrue(np.allclose(new1[:2], 0.75))
+        self.assertTrue(np.allclose(new2[:2], 0.25))
+        self.assertTrue((new1[2] == 0).all())
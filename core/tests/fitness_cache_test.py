@@ -0,0 +1,47 @@
+import unittest
+from core.fitness_cache import FitnessCache
+from core.chromosomes import BinaryChromosome
+
+
+def _chromosome(bits):
+    return BinaryChromosome(0).from_array(bits)
+
+
+class FitnessCacheTest(unittest.TestCase):
+    def test_content_key(self):
+        """
+        Fitness cache - identical genes give identical keys
+        """
+        key1 = FitnessCache.key(_chromosome([1, 0, 1]))
+        key2 = FitnessCache.key(_chromosome([1, 0, 1]))
+        key3 = FitnessCache.key(_chromosome([1, 1, 1]))
+        self.assertEquals(key1, key2)
+        self.assertNotEquals(key1, key3)
+
+    def test_hits_and_misses(self):
+        """
+        Fitness cache - lookup statistics
+        """
+        cache = FitnessCache()
+        key = FitnessCache.key(_chromosome([1, 0, 1]))
+        self.assertIsNone(cache.get(key))
+        cache.put(key, 0.5)
+        self.assertEquals(cache.get(key), 0.5)
+        self.assertEquals(cache.hits, 1)
+        self.assertEquals(cache.misses, 1)
+        self.assertEquals(cache.hit_rate, 0.5)
+
+    def test_lru_eviction(self):
+        """
+        Fitness cache - least recently used entry is evicted
+        """
+        cache = FitnessCache(max_size=2)
+        cache.put('a', 1.0)
+        cache.put('b', 2.0)
+        # 'a' becomes most recently used
+        cache.get('a')
+        cache.put('c', 3.0)
+        self.assertEquals(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEquals(cache.get('a'), 1.0)
+        self.assertEquals(cache.get('c'), 3.0)
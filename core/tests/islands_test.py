@@ -0,0 +1,62 @@
+import unittest
+from core.islands import IslandModel, ring_topology, random_topology
+from core.islands import MPI
+from core.algorithm import Algorithm
+from core.crossovers import OnePointCrossover
+from core.selections import TournamentSelection
+from core.tests.population_test import _BitCountIndividual
+
+
+class TopologyTests(unittest.TestCase):
+    def test_ring(self):
+        """
+        Islands - ring migration topology
+        """
+        self.assertSequenceEqual(ring_topology(4, epoch=1), [1, 2, 3, 0])
+
+    def test_random(self):
+        """
+        Islands - random ring, same for the same seed and epoch
+        """
+        for epoch in xrange(10):
+            destinations = random_topology(5, epoch, seed=42)
+            # Every island sends to another island and receives once
+            self.assertItemsEqual(destinations, range(5))
+            for island, destination in enumerate(destinations):
+                self.assertNotEqual(island, destination)
+            # Single cycle over all islands
+            island, visited = 0, set()
+            while island not in visited:
+                visited.add(island)
+                island = destinations[island]
+            self.assertEquals(len(visited), 5)
+            self.assertSequenceEqual(
+                destinations, random_topology(5, epoch, seed=42))
+
+
+@unittest.skipIf(MPI is None, "mpi4py not installed")
+class IslandModelTests(unittest.TestCase):
+    def test_single_island(self):
+        """
+        Islands - single process island migrates to itself
+        """
+        with IslandModel(
+                island_count=1,
+                migration_interval=2,
+                migration_size=2) as islands:
+            self.assertTrue(islands.master_process)
+            islands.parallelizer.broadcast(phenotype=_BitCountIndividual)
+            algorithm = Algorithm(
+                _BitCountIndividual,
+                OnePointCrossover(0.8),
+                TournamentSelection(2),
+                population_size=6,
+                parallelizer=islands.parallelizer)
+            for population, generation in islands.run(algorithm, 5):
+                self.assertEquals(len(population), 6)
+            self.assertEquals(generation, 5)
+            self.assertEquals(len(islands.statistics), 1)
+            self.assertEquals(islands.statistics[0]['generation'], 5)
+            self.assertEquals(
+                islands.global_best.fitness,
+                population.best_individual.fitness)
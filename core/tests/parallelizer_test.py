@@ -0,0 +1,789 @@
+import time
+import unittest
+import numpy as np
+from mock import patch
+from multiprocessing.pool import MaybeEncodingError
+from core.chromosomes import IntegerChromosome, RealChromosome
+from core.parallelizer import Parallelizer, NullParallelizer
+from core.parallelizer import HierarchicalParallelizer, WorkerMetrics
+from core.parallelizer import CollectiveParallelizer, PipelinedParallelizer
+from core.parallelizer import PoolParallelizer, ThreadPoolParallelizer
+from core.parallelizer import get_parallelizer
+from core.parallelizer import _dumps_shared, _copy_shared, _loads_shared
+from core.parallelizer import _run_pool_chunk
+from core.parallelizer import MPI, pickle
+from core.parallelizer import TAG_START_PREPARED_BATCH, TAG_BATCH_COMPLETE
+from core.parallelizer import TAG_START_PREPARED_TASK, TAG_TASK_COMPLETE
+from core.parallelizer import TAG_START_ARRAY_BATCH, TAG_ARRAY_BATCH_COMPLETE
+from core.parallelizer import TAG_REGISTER_GENOTYPE, TAG_BROADCAST_DATA
+from core.parallelizer import TAG_TERMINATE
+
+
+class _FakeComm(object):
+    def __init__(self, size):
+        self.size = size
+
+    def Get_size(self):
+        return self.size
+
+    def Get_rank(self):
+        return 0
+
+
+class _ScriptedComm(_FakeComm):
+    """
+    Master's side of MPI messages: records sent messages,
+    replies of workers are queued by test as (source, tag, message).
+    Probing replies needs real 'MPI.Status', i.e. mpi4py.
+    """
+    def __init__(self, size):
+        super(_ScriptedComm, self).__init__(size)
+        self.sent = []
+        self.replies = []
+        # Non-blocking sends, as 'MPI.Request' subclass set by test
+        self.requests = []
+        self.request_class = None
+        # Results of the next 'Iprobe' calls, then whether any reply
+        # is queued
+        self.probes = []
+
+    def Send(self, message, dest, tag):
+        self.sent.append((dest, tag, message[0]))
+
+    def send(self, message, dest, tag):
+        self.sent.append((dest, tag, message))
+
+    def Iprobe(self, source, tag):
+        if self.probes:
+            return self.probes.pop(0)
+        return bool(self.replies)
+
+    def Probe(self, source, tag, status):
+        reply_source, reply_tag, message = self.replies[0]
+        status.Set_source(reply_source)
+        status.Set_tag(reply_tag)
+        if isinstance(message, np.ndarray):
+            # Typed buffer
+            status.Set_elements(MPI.BYTE, message.nbytes)
+        else:
+            status.Set_elements(MPI.BYTE, len(pickle.dumps(message)))
+
+    def recv(self, source, tag):
+        return self.replies.pop(0)[2]
+
+    def Recv(self, message, source, tag):
+        message[0][:] = self.replies.pop(0)[2]
+
+    def Isend(self, message, dest, tag):
+        self.sent.append((dest, tag, message[0]))
+        request = self.request_class()
+        self.requests.append(request)
+        return request
+
+    def improbe(self, source, tag, status):
+        if not self.replies:
+            return None
+        return self.mprobe(source, tag, status)
+
+    def mprobe(self, source, tag, status):
+        self.Probe(source, tag, status)
+        return _ScriptedMessage(self.replies.pop(0)[2])
+
+
+class _GroupComm(_ScriptedComm):
+    """
+    Group of a sub-master: workers run each batch as soon as it is
+    sent and queue their reply
+    """
+    def __init__(self, size, prepared_tasks):
+        super(_GroupComm, self).__init__(size)
+        self.worker = Parallelizer(prepared_tasks, comm=_FakeComm(size))
+        self.genotypes = {}
+
+    def send(self, message, dest, tag):
+        super(_GroupComm, self).send(message, dest, tag)
+        if tag == TAG_REGISTER_GENOTYPE:
+            genotype_id, task_name, prototype = message
+            self.genotypes[genotype_id] = (task_name, prototype)
+
+    def Send(self, message, dest, tag):
+        super(_GroupComm, self).Send(message, dest, tag)
+        if tag == TAG_START_PREPARED_BATCH:
+            message_id, task_name, chunk = pickle.loads(message[0])
+            results = self.worker._run_prepared_tasks(
+                task_name, pickle.loads(chunk))
+            self.replies.append(
+                (dest, TAG_BATCH_COMPLETE, (message_id, results, 0.0)))
+        elif tag == TAG_START_ARRAY_BATCH:
+            # See 'Parallelizer.start_array_tasks'
+            header = message[0][:24].view(np.int64)
+            message_id, genotype_id, count = header
+            task_ids = message[0][24:8 * (count + 3)].view(np.int64)
+            task_name, prototype = self.genotypes[genotype_id]
+            genomes = message[0][8 * (count + 3):].view(
+                prototype.to_wire().dtype).reshape(count, -1)
+            results = self.worker._run_array_tasks(
+                task_name, task_ids, genomes, prototype)
+            reply = np.concatenate(([message_id, 0.0], task_ids, results))
+            self.replies.append((dest, TAG_ARRAY_BATCH_COMPLETE, reply))
+
+
+class _ScriptedMessage(object):
+    def __init__(self, message):
+        self.message = message
+
+    def recv(self):
+        return self.message
+
+
+def _double(**kwargs):
+    return kwargs['value'] * kwargs['factor']
+
+
+def _gene_sum(**kwargs):
+    return float(kwargs['chromosome'].to_array().sum())
+
+
+def _fail(**kwargs):
+    raise ValueError("Here be dragons")
+
+
+def _unpicklable(**kwargs):
+    return lambda: None
+
+
+class ChunkSizeTest(unittest.TestCase):
+    def test_fixed(self):
+        """
+        Parallelizer - fixed chunk size
+        """
+        parallelizer = Parallelizer(comm=_FakeComm(5), chunk_size=7)
+        self.assertEquals(parallelizer.chunk_size(100), 7)
+
+    def test_balanced(self):
+        """
+        Parallelizer - several chunks per worker, until times are measured
+        """
+        parallelizer = Parallelizer(comm=_FakeComm(5))
+        self.assertEquals(parallelizer.chunk_size(100), 7)
+        self.assertEquals(parallelizer.chunk_size(3), 1)
+
+    def test_adaptive(self):
+        """
+        Parallelizer - chunks amortize message overhead
+        """
+        parallelizer = Parallelizer(comm=_FakeComm(5))
+        parallelizer.message_overhead = 0.001
+
+        # Expensive tasks are sent one by one
+        parallelizer.task_time = 0.1
+        self.assertEquals(parallelizer.chunk_size(1000), 1)
+
+        parallelizer.task_time = 0.001
+        self.assertEquals(parallelizer.chunk_size(1000), 10)
+
+        # Still limited by load balancing
+        parallelizer.task_time = 0.000001
+        self.assertEquals(parallelizer.chunk_size(1000), 63)
+
+
+class HierarchicalParallelizerTest(unittest.TestCase):
+    def test_groups(self):
+        """
+        HierarchicalParallelizer - ranks grouped by node, master excluded
+        """
+        names = ['a', 'a', 'b', 'a', 'b', 'b', 'c']
+        self.assertEquals(
+            HierarchicalParallelizer._get_groups(names),
+            [[1, 3], [2, 4, 5], [6]])
+
+    def test_group_size(self):
+        """
+        HierarchicalParallelizer - large nodes split into several groups
+        """
+        names = ['a'] * 8
+        self.assertEquals(
+            HierarchicalParallelizer._get_groups(names, group_size=3),
+            [[1, 2, 3], [4, 5, 6], [7]])
+
+    def _sub_master(self):
+        """
+        Rank 1 of master and sub-masters, leading a group
+        of itself and two workers
+        """
+        self.top_comm = _ScriptedComm(2)
+        self.group_comm = _GroupComm(3, [_double, _gene_sum])
+        sub_master = HierarchicalParallelizer(
+            [_double, _gene_sum], comm=_FakeComm(1))
+        # As set up by __init__ after splitting the world
+        sub_master.comm = self.top_comm
+        sub_master.proc_count, sub_master.proc_id = 2, 1
+        sub_master._local = Parallelizer(
+            [_double, _gene_sum], comm=self.group_comm, chunk_size=2)
+        return sub_master
+
+    def _group_messages(self, tag):
+        """
+        Worker IDs of messages sent to the group
+        """
+        return [
+            dest
+            for dest, sent_tag, _ in self.group_comm.sent
+            if sent_tag == tag
+        ]
+
+    @unittest.skipIf(MPI is None, "mpi4py not installed")
+    def test_prepared_batch(self):
+        """
+        HierarchicalParallelizer - batch of master split among workers
+        of a group, results returned in a single reply
+        """
+        sub_master = self._sub_master()
+        tasks = [(task_id, {'value': task_id, 'factor': 2})
+                 for task_id in xrange(4)]
+        self.top_comm.replies = [
+            (0, TAG_START_PREPARED_BATCH,
+             (7, '_double', pickle.dumps(tasks))),
+            (0, TAG_TERMINATE, None),
+        ]
+        # Worker loop until master terminates it
+        sub_master.__enter__()
+
+        self.assertItemsEqual(
+            self._group_messages(TAG_START_PREPARED_BATCH), [1, 2])
+        [(dest, tag, (message_id, results, _))] = self.top_comm.sent
+        self.assertEquals((dest, tag, message_id), (0, TAG_BATCH_COMPLETE, 7))
+        self.assertItemsEqual(results, [(0, 0), (1, 2), (2, 4), (3, 6)])
+        # Group stopped with the sub-master
+        self.assertEquals(self._group_messages(TAG_TERMINATE), [1, 2])
+
+    @unittest.skipIf(MPI is None, "mpi4py not installed")
+    def test_array_batch(self):
+        """
+        HierarchicalParallelizer - genome rows split among workers
+        of a group, results in order of task IDs
+        """
+        sub_master = self._sub_master()
+        sub_master._local = sub_master._local.__enter__()
+        prototype = IntegerChromosome(3, 0, 9)()
+        genomes = np.array([[1, 2, 3], [0, 0, 1], [4, 4, 4]])
+
+        results = sub_master._run_array_tasks(
+            '_gene_sum', [5, 6, 7], genomes, prototype)
+        self.assertSequenceEqual(list(results), [6.0, 1.0, 12.0])
+        self.assertEquals(self._group_messages(TAG_REGISTER_GENOTYPE), [1, 2])
+        self.assertItemsEqual(
+            self._group_messages(TAG_START_ARRAY_BATCH), [1, 2])
+
+    @patch.object(Parallelizer, '_bcast_shared')
+    def test_broadcast(self, bcast):
+        """
+        HierarchicalParallelizer - data received by a sub-master
+        is broadcasted to its group
+        """
+        sub_master = self._sub_master()
+        sub_master._local = sub_master._local.__enter__()
+        sub_master._receive_data({'factor': 3})
+
+        self.assertEquals(sub_master.received_data, {'factor': 3})
+        self.assertEquals(self._group_messages(TAG_BROADCAST_DATA), [1, 2])
+        bcast.assert_called_once_with({'factor': 3})
+
+
+@unittest.skipIf(MPI is None, "mpi4py not installed")
+class PipelinedParallelizerTest(unittest.TestCase):
+    def setUp(self):
+        class _ScriptedRequest(MPI.Request):
+            """
+            Null request (nothing to wait for), completed when test says so
+            """
+            completed = False
+
+            def Test(self):
+                return self.completed
+
+        # Workers 1 and 2, up to two tasks each
+        self.comm = _ScriptedComm(3)
+        self.comm.request_class = _ScriptedRequest
+        self.parallelizer = PipelinedParallelizer(
+            [_double], comm=self.comm, depth=2).__enter__()
+
+    def _start(self, task_ids):
+        self.parallelizer.start_prepared_tasks(
+            '_double',
+            [(task_id, {'value': task_id, 'factor': 2})
+             for task_id in task_ids])
+
+    def _sent_tasks(self):
+        """
+        (worker ID, task ID) of sent tasks
+        """
+        return [
+            (dest, pickle.loads(message)[1])
+            for dest, tag, message in self.comm.sent
+            if tag == TAG_START_PREPARED_TASK
+        ]
+
+    def _reply(self, worker_id, task_id, result):
+        self.comm.replies.append(
+            (worker_id, TAG_TASK_COMPLETE, (None, task_id, result)))
+
+    def test_depth(self):
+        """
+        Pipelined parallelizer - tasks wait in queue for free slots
+        """
+        self._start(range(5))
+        self.assertEquals(
+            self._sent_tasks(), [(1, 0), (2, 1), (1, 2), (2, 3)])
+        self.assertEquals(len(self.parallelizer._queue), 1)
+        self.assertEquals(self.parallelizer._in_flight, {1: 2, 2: 2})
+
+        # Result frees a slot of its worker
+        self._reply(2, 1, 2)
+        self.parallelizer.poll()
+        self.assertEquals(self._sent_tasks()[-1], (2, 4))
+        self.assertEquals(len(self.parallelizer._queue), 0)
+        self.assertEquals(self.parallelizer._in_flight, {1: 2, 2: 2})
+        self.assertEquals(self.parallelizer._task_semaphore, 4)
+        self.assertEquals(self.parallelizer.next_finished_task(), (1, 2))
+
+    def test_finished_tasks(self):
+        """
+        Pipelined parallelizer - wait for all results, whatever size
+        """
+        self._start(range(3))
+        big = np.zeros(300000)
+        for worker_id, task_id in [(1, 0), (2, 1), (1, 2)]:
+            self._reply(worker_id, task_id, task_id * 2)
+        self.comm.replies[1] = (2, TAG_TASK_COMPLETE, (None, 1, big))
+
+        results = dict(self.parallelizer.finished_tasks())
+        self.assertEquals(sorted(results), [0, 1, 2])
+        self.assertIs(results[1], big)
+        self.assertEquals(self.parallelizer._task_semaphore, 0)
+        self.assertEquals(self.parallelizer._in_flight, {1: 0, 2: 0})
+        self.assertEquals(list(self.parallelizer.finished_tasks()), [])
+
+    def test_completed_sends(self):
+        """
+        Pipelined parallelizer - completed sends are forgotten
+        """
+        self._start(range(2))
+        self.assertEquals(len(self.parallelizer._send_requests), 2)
+        self.comm.requests[0].completed = True
+        self.parallelizer.poll()
+        self.assertEquals(
+            self.parallelizer._send_requests, self.comm.requests[1:])
+
+    def test_exit(self):
+        """
+        Pipelined parallelizer - running tasks complete before workers stop
+        """
+        self._start(range(3))
+        for worker_id, task_id in [(1, 0), (2, 1), (1, 2)]:
+            self._reply(worker_id, task_id, task_id * 2)
+        self.parallelizer.__exit__(None, None, None)
+        self.assertEquals(self.comm.replies, [])
+        self.assertEquals(self.parallelizer._task_semaphore, 0)
+        self.assertEquals(
+            [(dest, tag) for dest, tag, _ in self.comm.sent[-2:]],
+            [(1, TAG_TERMINATE), (2, TAG_TERMINATE)])
+
+
+@unittest.skipIf(MPI is None, "mpi4py not installed")
+class SpeculationTest(unittest.TestCase):
+    def setUp(self):
+        # Workers 1, 2 and 3, tasks sent one per message
+        self.comm = _ScriptedComm(4)
+        self.parallelizer = Parallelizer(
+            [_double], comm=self.comm, chunk_size=1,
+            speculation_percentile=90).__enter__()
+        self.parallelizer._runtimes.extend([0.001] * 20)
+
+    def _start(self, task_ids):
+        self.parallelizer.start_prepared_tasks(
+            '_double',
+            [(task_id, {'value': task_id, 'factor': 2})
+             for task_id in task_ids])
+
+    def _sent_messages(self):
+        """
+        (worker ID, message ID) of sent tasks
+        """
+        return [
+            (dest, pickle.loads(message)[0])
+            for dest, tag, message in self.comm.sent
+            if tag == TAG_START_PREPARED_BATCH
+        ]
+
+    def _straggle(self):
+        """
+        Worker 3 runs the first message (task 0) for too long,
+        worker 2 the second one (task 1) is just started
+        """
+        self._start([0, 1])
+        now = time.time()
+        self.parallelizer._busy_workers[3] = (0, now - 10.0)
+        self.parallelizer._busy_workers[2] = (1, now + 10.0)
+        # Duplicate is sent while no replies are available
+        self.comm.probes = [False]
+        self.comm.replies = [
+            (1, TAG_BATCH_COMPLETE, (0, [(0, 'duplicate')], 0.0)),
+            (2, TAG_BATCH_COMPLETE, (1, [(1, 2)], 0.0)),
+        ]
+        return dict(self.parallelizer.finished_tasks())
+
+    def test_first_result_wins(self):
+        """
+        Parallelizer - slow task is sent to idle worker, first result wins
+        """
+        results = self._straggle()
+        self.assertEquals(self._sent_messages(), [(3, 0), (2, 1), (1, 0)])
+        self.assertEquals(results, {0: 'duplicate', 1: 2})
+        self.assertEquals(self.parallelizer._task_semaphore, 0)
+        # Worker still running the duplicate is not available
+        self.assertItemsEqual(self.parallelizer._available_workers, [1, 2])
+
+    def test_late_result_dropped(self):
+        """
+        Parallelizer - late result of a duplicate is dropped,
+        its worker gets available again
+        """
+        self._straggle()
+        self._start([2])
+        self.comm.replies = [
+            (3, TAG_BATCH_COMPLETE, (0, [(0, 'late')], 0.0)),
+            (2, TAG_BATCH_COMPLETE, (2, [(2, 4)], 0.0)),
+        ]
+        self.assertEquals(dict(self.parallelizer.finished_tasks()), {2: 4})
+        self.assertEquals(self.parallelizer._task_semaphore, 0)
+        self.assertEquals(self.parallelizer._busy_workers, {})
+        self.assertItemsEqual(
+            self.parallelizer._available_workers, [1, 2, 3])
+
+    def test_stop_waits_for_duplicates(self):
+        """
+        Parallelizer - workers are stopped once duplicates complete
+        """
+        self._straggle()
+        self.comm.replies = [
+            (3, TAG_BATCH_COMPLETE, (0, [(0, 'late')], 0.0)),
+        ]
+        self.parallelizer.__exit__(None, None, None)
+        self.assertEquals(self.comm.replies, [])
+        self.assertEquals(
+            [(dest, tag) for dest, tag, _ in self.comm.sent[-3:]],
+            [(1, TAG_TERMINATE), (2, TAG_TERMINATE), (3, TAG_TERMINATE)])
+
+
+class MetricsSnapshotTest(unittest.TestCase):
+    def test_snapshot(self):
+        """
+        Parallelizer - metrics closed on demand, without finished_tasks
+        """
+        parallelizer = Parallelizer(comm=_ScriptedComm(3)).__enter__()
+        parallelizer._metrics.sent(1, 100)
+        metrics = parallelizer.snapshot_metrics()
+        self.assertIs(parallelizer.metrics, metrics)
+        self.assertEquals(metrics['workers'][1]['bytes_sent'], 100)
+        self.assertEquals(
+            parallelizer.snapshot_metrics()['workers'][1]['bytes_sent'], 0)
+
+        self.assertIsNone(NullParallelizer().snapshot_metrics())
+
+
+class ArrayTasksTest(unittest.TestCase):
+    def test_broadcast_data_unchanged(self):
+        """
+        Parallelizer - array tasks leave broadcasted data unchanged
+        """
+        parallelizer = Parallelizer([_fail], comm=_FakeComm(2))
+        parallelizer._receive_data({'factor': 2})
+        prototype = IntegerChromosome(3, 0, 9)()
+        self.assertRaises(
+            ValueError, parallelizer._run_array_tasks,
+            '_fail', [0], np.array([[1, 2, 3]]), prototype)
+        self.assertEquals(parallelizer.received_data, {'factor': 2})
+
+    def test_register_genotype(self):
+        """
+        Parallelizer - task gets another genotype under a new ID
+        """
+        comm = _ScriptedComm(2)
+        parallelizer = Parallelizer([_gene_sum], comm=comm)
+        integer = IntegerChromosome(3, 0, 9)()
+        parallelizer.register_genotype('_gene_sum', integer)
+        parallelizer.register_genotype('_gene_sum', RealChromosome(3, 0, 1))
+        parallelizer.register_genotype('_double', integer)
+        self.assertEquals(
+            [message[:2] for _, tag, message in comm.sent
+             if tag == TAG_REGISTER_GENOTYPE],
+            [(0, '_gene_sum'), (1, '_gene_sum'), (2, '_double')])
+        self.assertEquals(
+            parallelizer._genotypes['_gene_sum'], (1, np.dtype(float)))
+
+
+class CollectiveParallelizerTest(unittest.TestCase):
+    def test_split(self):
+        """
+        CollectiveParallelizer - tasks split evenly, master included
+        """
+        counts, offsets = CollectiveParallelizer._split(10, 4)
+        self.assertEquals(list(counts), [3, 3, 2, 2])
+        self.assertEquals(list(offsets), [0, 3, 6, 8])
+
+        counts, offsets = CollectiveParallelizer._split(2, 4)
+        self.assertEquals(list(counts), [1, 1, 0, 0])
+        self.assertEquals(list(offsets), [0, 1, 2, 2])
+
+    def test_merged_batches(self):
+        """
+        CollectiveParallelizer - tasks started one by one share a round
+        """
+        parallelizer = CollectiveParallelizer([_double], comm=_FakeComm(4))
+        parallelizer._task_semaphore = 0
+        for task_id in xrange(3):
+            parallelizer.start_prepared_task(task_id, '_double', value=1)
+        prototype = IntegerChromosome(3, 0, 9)()
+        parallelizer.start_array_tasks(
+            '_double', [3], np.zeros((1, 3), int), prototype)
+        parallelizer.start_array_tasks(
+            '_double', [4, 5], np.ones((2, 3), int), prototype)
+        # Rows of another length can't be scattered together
+        parallelizer.start_array_tasks(
+            '_double', [6], np.ones((1, 2), int), prototype)
+
+        self.assertEquals(parallelizer._task_semaphore, 7)
+        self.assertEquals(
+            [batch[2] for batch in parallelizer._batches],
+            [[(0, {'value': 1}), (1, {'value': 1}), (2, {'value': 1})],
+             [3, 4, 5], [6]])
+        self.assertEquals(len(parallelizer._batches[1][3]), 2)
+
+
+class WorkerMetricsTest(unittest.TestCase):
+    @patch('core.parallelizer.time.time')
+    def test_snapshot(self, time_mock):
+        """
+        WorkerMetrics - busy/idle time, tasks and bytes per batch
+        """
+        metrics = WorkerMetrics([1, 2])
+        time_mock.return_value = 10.0
+        metrics.sent(1, 100)
+        metrics.sent(2, 50)
+        time_mock.return_value = 12.0
+        metrics.received(1, 8, 4)
+        metrics.blocked(1.5)
+        time_mock.return_value = 14.0
+        batch = metrics.snapshot()
+
+        self.assertEquals(batch['wall_time'], 4.0)
+        self.assertEquals(batch['master_blocked'], 1.5)
+        self.assertEquals(batch['workers'][1], {
+            'busy': 2.0, 'idle': 2.0, 'tasks': 4,
+            'bytes_sent': 100, 'bytes_received': 8,
+        })
+        # Still running, counted up to the end of batch
+        self.assertEquals(batch['workers'][2]['busy'], 4.0)
+        self.assertEquals(batch['workers'][2]['tasks'], 0)
+
+        # Rest of the running message belongs to the next batch
+        time_mock.return_value = 15.0
+        metrics.received(2, 8, 0)
+        time_mock.return_value = 16.0
+        batch = metrics.snapshot()
+        self.assertEquals(batch['workers'][2]['busy'], 1.0)
+        self.assertEquals(batch['workers'][1]['idle'], 2.0)
+        self.assertEquals(metrics.totals['batches'], 2)
+        self.assertEquals(metrics.totals['workers'][2]['busy'], 5.0)
+
+
+class SharedBroadcastTest(unittest.TestCase):
+    def test_round_trip(self):
+        """
+        Parallelizer - large arrays unpickled as read-only segment views
+        """
+        large = np.arange(100.0).reshape(10, 10)
+        data = {
+            'large': large,
+            # Same memory, stored once
+            'same': large.view(np.ndarray),
+            'transposed': large.T,
+            'small': np.arange(3),
+            'label': 'foo',
+        }
+        pickled, arrays, size = _dumps_shared(data, min_bytes=100)
+        self.assertEquals(len(arrays), 2)
+        self.assertEquals(size, 2 * 832)
+
+        segment = np.zeros(size, dtype=np.uint8)
+        _copy_shared(arrays, segment)
+        loaded = _loads_shared(pickled, segment)
+        for name in ('large', 'same', 'transposed'):
+            self.assertTrue((loaded[name] == data[name]).all())
+            self.assertFalse(loaded[name].flags.writeable)
+            self.assertTrue(np.may_share_memory(loaded[name], segment))
+        self.assertTrue(loaded['small'].flags.writeable)
+        self.assertEquals(loaded['label'], 'foo')
+
+    def test_without_shared_windows(self):
+        """
+        Parallelizer - plain broadcast when MPI has no shared windows
+        """
+        class _Comm(_FakeComm):
+            def bcast(self, data, root):
+                self.broadcasted = data
+                return data
+
+        comm = _Comm(3)
+        parallelizer = Parallelizer(comm=comm)
+        data = {'large': np.arange(1 << 16)}
+        self.assertIs(parallelizer._bcast_shared(data), data)
+        self.assertIs(comm.broadcasted, data)
+        self.assertIsNone(parallelizer._shared_comm)
+
+
+class NullParallelizerTest(unittest.TestCase):
+    def test_prepared_tasks(self):
+        """
+        Null parallelizer - run batch of prepared tasks serially
+        """
+        parallelizer = NullParallelizer([_double])
+        parallelizer.broadcast(factor=2)
+        parallelizer.start_prepared_tasks(
+            '_double', [(task_id, {'value': task_id}) for task_id in xrange(5)])
+        self.assertEquals(
+            sorted(parallelizer.finished_tasks()),
+            [(task_id, task_id * 2) for task_id in xrange(5)])
+
+    def test_array_tasks(self):
+        """
+        Null parallelizer - rebuild chromosomes from genome matrix
+        """
+        def _gene_sum(**kwargs):
+            return kwargs['chromosome'].to_array().sum() * kwargs['factor']
+
+        parallelizer = NullParallelizer([_gene_sum])
+        parallelizer.broadcast(factor=2)
+        prototype = IntegerChromosome(3, 0, 9)()
+        parallelizer.start_array_tasks(
+            '_gene_sum', [4, 7], np.array([[1, 2, 3], [4, 5, 6]]), prototype)
+        self.assertEquals(
+            sorted(parallelizer.finished_tasks()), [(4, 12), (7, 30)])
+
+
+class PoolParallelizerTest(unittest.TestCase):
+    def test_prepared_tasks(self):
+        """
+        Pool parallelizer - run prepared tasks in local processes
+        """
+        with PoolParallelizer([_double], processes=2) as parallelizer:
+            parallelizer.broadcast(factor=3)
+            parallelizer.start_prepared_tasks(
+                '_double',
+                [(task_id, {'value': task_id}) for task_id in xrange(10)])
+            parallelizer.start_prepared_task(10, '_double', value=10)
+            self.assertEquals(
+                sorted(parallelizer.finished_tasks()),
+                [(task_id, task_id * 3) for task_id in xrange(11)])
+
+            # New broadcasted data reaches the running pool
+            pool = parallelizer._pool
+            parallelizer.broadcast(factor=-1)
+            parallelizer.start_prepared_task(0, '_double', value=5)
+            self.assertEquals(parallelizer.next_finished_task(), (0, -5))
+            self.assertRaises(RuntimeError, parallelizer.next_finished_task)
+            parallelizer.broadcast(factor=2)
+            parallelizer.start_prepared_tasks(
+                '_double',
+                [(task_id, {'value': task_id}) for task_id in xrange(10)])
+            self.assertEquals(
+                sorted(parallelizer.finished_tasks()),
+                [(task_id, task_id * 2) for task_id in xrange(10)])
+            self.assertIs(parallelizer._pool, pool)
+            # Worker metrics are MPI-only
+            self.assertIsNone(parallelizer.snapshot_metrics())
+            self.assertIsNone(parallelizer.metrics)
+
+    def test_late_data_fetched_once(self):
+        """
+        Pool parallelizer - data broadcasted to running pool is fetched
+        once per version, instead of being sent with every chunk
+        """
+        class _Store(dict):
+            fetched = 0
+
+            def __getitem__(self, version):
+                self.fetched += 1
+                return dict.__getitem__(self, version)
+
+        store = _Store({1: {'factor': 2}, 2: {'factor': 5}})
+        worker = {
+            'received_data': {'factor': 3},
+            'prepared_tasks': {'_double': _double},
+            'late_data': store,
+        }
+        chunk = [(0, {'value': 1})]
+        self.assertEquals(
+            _run_pool_chunk('_double', chunk, worker), [(0, 3, None)])
+        for _ in xrange(3):
+            self.assertEquals(
+                _run_pool_chunk('_double', chunk, worker, 1), [(0, 2, None)])
+        self.assertEquals(
+            _run_pool_chunk('_double', chunk, worker, 2), [(0, 5, None)])
+        self.assertEquals(store.fetched, 2)
+
+    def test_failed_task(self):
+        """
+        Pool parallelizer - task errors reach the master
+        """
+        with PoolParallelizer([_fail], processes=1) as parallelizer:
+            parallelizer.start_prepared_task(0, '_fail')
+            self.assertRaises(
+                RuntimeError, lambda: list(parallelizer.finished_tasks()))
+
+    def test_unpicklable_result(self):
+        """
+        Pool parallelizer - results failing to get back reach the master
+        """
+        with PoolParallelizer([_unpicklable], processes=1) as parallelizer:
+            parallelizer.start_prepared_task(0, '_unpicklable')
+            self.assertRaises(
+                MaybeEncodingError,
+                lambda: list(parallelizer.finished_tasks()))
+
+    def test_factory(self):
+        """
+        Parallelizer factory - pick backend from parameters
+        """
+        parallelizer = get_parallelizer(
+            {'parallelizer': 'pool', 'processes': 3})
+        self.assertIsInstance(parallelizer, PoolParallelizer)
+        self.assertEquals(parallelizer.worker_count, 3)
+        self.assertRaises(
+            ValueError, get_parallelizer, {'parallelizer': 'carrier_pigeon'})
+
+    @patch('core.parallelizer.MPI', None)
+    def test_without_mpi(self):
+        """
+        Parallelizer - serial fallback when MPI is not installed
+        """
+        with Parallelizer([_double]) as parallelizer:
+            self.assertIsInstance(parallelizer, NullParallelizer)
+
+
+class ThreadPoolParallelizerTest(unittest.TestCase):
+    def test_shared_data(self):
+        """
+        Thread pool parallelizer - tasks share broadcasted objects
+        """
+        def _identity(**kwargs):
+            return kwargs['image']
+
+        image = np.zeros((4, 4))
+        with ThreadPoolParallelizer([_identity], processes=2) as parallelizer:
+            parallelizer.broadcast(image=image)
+            parallelizer.start_prepared_tasks(
+                '_identity', [(task_id, {}) for task_id in xrange(4)])
+            for _, task_result in parallelizer.finished_tasks():
+                self.assertIs(task_result, image)
@@ -1,7 +1,11 @@
 import unittest
+import numpy as np
 from mock import Mock
 from core.solution import Solution, SolutionFactory
-from core.population import Population
+from core.population import Population, ArrayPopulation, top_indexes
+from core.individual import Individual
+from core.chromosomes import BinaryChromosome
+from core.fitness_cache import FitnessCache
 
 
 class _FakeIndividual(object):
@@ -84,3 +88,221 @@ class PopulationTest(unittest.TestCase):
         self.assertSequenceEqual(
             population.best_individuals(2),
             [population[2], population[0]])
+
+
+class _BitCountIndividual(Individual):
+    """
+    Fitness is the number of ones in binary chromosome
+    """
+    evaluation_count = 0
+
+    def __init__(self, chromosome=None):
+        super(_BitCountIndividual, self).__init__(
+            genotype=lambda: BinaryChromosome(8),
+            chromosome=chromosome)
+
+    def _decode(self, chromosome):
+        self.bits = chromosome.to_array()
+
+    def _calculate_fitness(self):
+        _BitCountIndividual.evaluation_count += 1
+        return float(self.bits.sum())
+
+
+def _bit_count_individual(bits):
+    chromosome = BinaryChromosome(0).from_array(bits)
+    return _BitCountIndividual(chromosome=chromosome)
+
+
+class ArrayPopulationTest(unittest.TestCase):
+    def _individual(self, bits):
+        return _bit_count_individual(bits)
+
+    def test_initialize_with_size(self):
+        """
+        Array population - genomes stored as a single matrix
+        """
+        population = ArrayPopulation(_BitCountIndividual, size=5)
+        self.assertEquals(len(population), 5)
+        self.assertEquals(population.genomes.shape, (5, 8))
+        self.assertTrue(np.isnan(population.fitness_values).all())
+
+    def test_calculate_fitness(self):
+        """
+        Array population - fitness, ranking and statistics
+        """
+        population = ArrayPopulation(_BitCountIndividual)
+        population += [
+            self._individual([1, 0, 0, 0]),
+            self._individual([1, 1, 1, 0]),
+            self._individual([1, 1, 0, 0]),
+        ]
+        population.calculate_fitness()
+        self.assertSequenceEqual(
+            list(population.fitness_values), [1.0, 3.0, 2.0])
+        self.assertEquals(population.total_fitness, 6.0)
+        self.assertEquals(population.average_fitness, 2.0)
+        self.assertSequenceEqual(
+            population.best_individuals(2),
+            [population[1], population[2]])
+        self.assertEquals(population.worst_individual.fitness, 1.0)
+
+    def test_lazy_individuals(self):
+        """
+        Array population - individuals created from matrix rows on demand
+        """
+        population = ArrayPopulation(_BitCountIndividual)
+        population += self._individual([0, 1, 0, 1])
+        population.calculate_fitness()
+        # Forget created individual
+        population._cache = {}
+        individual = population[0]
+        self.assertSequenceEqual(list(individual.bits), [0, 1, 0, 1])
+        self.assertEquals(individual.fitness, 2.0)
+        self.assertIs(population[0], individual)
+
+    def test_pack_releases_individuals(self):
+        """
+        Array population - added individuals are not kept once packed
+        """
+        population = ArrayPopulation(_BitCountIndividual)
+        individual = self._individual([1, 1, 0, 0])
+        individual.fitness = 2.0
+        population += [individual, self._individual([1, 0, 0, 0])]
+        self.assertEquals(population.genomes.shape, (2, 4))
+        self.assertEquals(population._cache, {})
+        self.assertIsNot(population[0], individual)
+        self.assertEquals(population[0].fitness, 2.0)
+        self.assertSequenceEqual(list(population[1].bits), [1, 0, 0, 0])
+
+    def test_truncate(self):
+        """
+        Array population - remove least fit individuals
+        """
+        population = ArrayPopulation(_BitCountIndividual)
+        population += [
+            self._individual([1, 1, 0, 0]),
+            self._individual([0, 0, 0, 0]),
+            self._individual([1, 1, 1, 1]),
+        ]
+        population.calculate_fitness(truncate_if_above=2)
+        self.assertEquals(len(population), 2)
+        self.assertSequenceEqual(
+            [individual.fitness for individual in population],
+            [2.0, 4.0])
+        self.assertEquals(population.best_individual.fitness, 4.0)
+        self.assertEquals(population.total_fitness, 6.0)
+
+    def test_add_genomes(self):
+        """
+        Population - rows with known fitness, nothing to evaluate
+        """
+        for population_class in (Population, ArrayPopulation):
+            population = population_class(_BitCountIndividual)
+            population += self._individual([1, 0, 0, 0])
+            population.add_genomes(
+                np.array([[1, 1, 0, 0], [1, 1, 1, 0]]), [2.0, 3.0],
+                BinaryChromosome(4))
+            count = _BitCountIndividual.evaluation_count
+            population.calculate_fitness()
+            self.assertEquals(_BitCountIndividual.evaluation_count, count + 1)
+            self.assertSequenceEqual(
+                population.genomes.tolist(),
+                [[1, 0, 0, 0], [1, 1, 0, 0], [1, 1, 1, 0]])
+            self.assertEquals(population.best_individual.fitness, 3.0)
+            self.assertSequenceEqual(list(population[2].bits), [1, 1, 1, 0])
+
+
+class FitnessCachePopulationTest(unittest.TestCase):
+    def _evaluate(self, population_class, cache, bit_strings):
+        population = population_class(
+            _BitCountIndividual, fitness_cache=cache)
+        population += [
+            _bit_count_individual(bits)
+            for bits in bit_strings
+        ]
+        population.calculate_fitness()
+        return population
+
+    def test_cached_fitness(self):
+        """
+        Population - identical chromosomes are evaluated once
+        """
+        for population_class in (Population, ArrayPopulation):
+            _BitCountIndividual.evaluation_count = 0
+            cache = FitnessCache()
+
+            population = self._evaluate(
+                population_class, cache,
+                [[1, 1, 0], [1, 1, 0], [0, 0, 1]])
+            self.assertEquals(_BitCountIndividual.evaluation_count, 2)
+            self.assertSequenceEqual(
+                [individual.fitness for individual in population],
+                [2.0, 2.0, 1.0])
+            self.assertEquals(population.cache_statistics['hits'], 1)
+            self.assertEquals(population.cache_statistics['misses'], 2)
+
+            # Next generation
+            population = self._evaluate(
+                population_class, cache,
+                [[1, 1, 0], [1, 1, 1], [0, 0, 1]])
+            self.assertEquals(_BitCountIndividual.evaluation_count, 3)
+            self.assertEquals(population.total_fitness, 6.0)
+            self.assertEquals(population.cache_statistics['hits'], 2)
+            self.assertAlmostEquals(
+                population.cache_statistics['hit_rate'], 2.0 / 3)
+
+    def test_start_evaluation(self):
+        """
+        Population - evaluation started while population is being filled
+        """
+        for population_class in (Population, ArrayPopulation):
+            _BitCountIndividual.evaluation_count = 0
+            population = population_class(
+                _BitCountIndividual, fitness_cache=FitnessCache())
+            population += [
+                _bit_count_individual([1, 1, 0]),
+                _bit_count_individual([0, 0, 1]),
+            ]
+            population.start_evaluation([0, 1])
+            population += _bit_count_individual([1, 1, 0])
+            population.calculate_fitness()
+
+            self.assertEquals(_BitCountIndividual.evaluation_count, 2)
+            self.assertSequenceEqual(
+                list(population.fitness_values), [2.0, 1.0, 2.0])
+            self.assertEquals(population.cache_statistics['hits'], 1)
+
+
+class RankingTest(unittest.TestCase):
+    def test_top_indexes(self):
+        """
+        Population - partial ranking with stable order of equal values
+        """
+        values = np.array([0.3, 0.9, 0.1, 0.9, 0.5, 0.3, 0.3])
+        full_ranking = list(np.argsort(-values, kind='mergesort'))
+        for count in xrange(len(values) + 1):
+            self.assertSequenceEqual(
+                list(top_indexes(values, count)),
+                full_ranking[:count])
+
+    def test_truncate(self):
+        """
+        Population - remove least fit individuals, keep order of the rest
+        """
+        population = Population(Mock)
+        population += [
+            _FakeIndividual(0.5),
+            _FakeIndividual(0.1),
+            _FakeIndividual(0.9),
+            _FakeIndividual(0.3),
+        ]
+        population.calculate_fitness(truncate_if_above=2)
+        self.assertSequenceEqual(
+            [individual.fitness for individual in population], [0.5, 0.9])
+        self.assertSequenceEqual(
+            [individual.fitness
+             for individual in population.best_individuals()],
+            [0.9, 0.5])
+        self.assertAlmostEquals(population.total_fitness, 1.4)
+        self.assertEquals(population.worst_individual.fitness, 0.5)
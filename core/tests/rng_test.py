@@ -0,0 +1,51 @@
+import unittest
+import numpy as np
+from core.chromosomes import Chromosome
+from core.crossovers import Crossover
+from core.selections import Selection
+from core.rng import RandomStreams
+
+
+class RandomStreamsTest(unittest.TestCase):
+    def tearDown(self):
+        Chromosome._randomizer = np.random.RandomState()
+        Crossover._randomizer = np.random.RandomState()
+        Selection._randomizer = np.random.RandomState()
+
+    def test_stream(self):
+        """
+        Random streams - same seed and key give the same numbers
+        """
+        streams = RandomStreams(seed=3)
+        numbers = streams.stream('breeding', 1, 2).random_sample(5)
+        self.assertSequenceEqual(
+            RandomStreams(seed=3).stream('breeding', 1, 2).random_sample(5)
+            .tolist(), numbers.tolist())
+        for other in (streams.stream('breeding', 2, 1),
+                      streams.stream('selection', 1, 2),
+                      RandomStreams(seed=4).stream('breeding', 1, 2)):
+            self.assertNotEqual(other.random_sample(5).tolist(),
+                                numbers.tolist())
+
+    def test_spawn(self):
+        """
+        Random streams - spawned streams prefix keys of their parent
+        """
+        streams = RandomStreams(seed=3)
+        island = streams.spawn('island', 1)
+        self.assertEquals(island.key('topology'),
+                          streams.key('island', 1, 'topology'))
+        self.assertNotEqual(island.key(), streams.spawn('island', 2).key())
+
+    def test_install(self):
+        """
+        Random streams - operators get their own stream of a generation
+        """
+        streams = RandomStreams(seed=3)
+        streams.install(7)
+        self.assertEquals(
+            Crossover._randomizer.randint(1000, size=5).tolist(),
+            streams.stream('crossover', 7).randint(1000, size=5).tolist())
+        self.assertNotEqual(
+            Selection._randomizer.randint(1000, size=5).tolist(),
+            streams.stream('crossover', 7).randint(1000, size=5).tolist())
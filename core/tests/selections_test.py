@@ -1,4 +1,5 @@
 import unittest
+import numpy as np
 from mock import Mock, MagicMock, patch
 from core.selections import RouletteWheelSelection
 from core.selections import TournamentSelection
@@ -15,6 +16,15 @@ class _FakePopulation(list):
     def total_fitness(self):
         return sum([chromo.fitness for chromo in self])
 
+    @property
+    def fitness_values(self):
+        return np.array([chromo.fitness for chromo in self])
+
+    @property
+    def ranking(self):
+        # Already ordered from the best
+        return np.arange(len(self))
+
 
 class _FakeIndividual(object):
     def __init__(self, fitness):
@@ -53,6 +63,24 @@ class RouletteWheelSelectionTests(unittest.TestCase):
         self.assertEquals(selection.run(population), population[2])
 
 
+    def test_select_batch(self):
+        """
+        Roulette wheel selection - pick several chromosomes at once
+        """
+        population = _FakePopulation()
+        population += [
+            _FakeIndividual(fitness=0.1),  # probability: 1/15
+            _FakeIndividual(fitness=1.0),  # probability: 10/15
+            _FakeIndividual(fitness=0.4),  # probability: 4/15
+        ]
+        selection = RouletteWheelSelection()
+        selection._randomizer = Mock(
+            random_sample=Mock(return_value=np.array([0.01, 0.5, 0.9, 1.0])))
+        self.assertSequenceEqual(
+            selection.select(population, 4),
+            [population[0], population[1], population[2], population[2]])
+
+
 class TournamentSelectionTests(unittest.TestCase):
     def test_selection(self):
         """
@@ -78,6 +106,51 @@ class TournamentSelectionTests(unittest.TestCase):
             selection.run(population).fitness, 0.3)
 
 
+    def test_select_batch(self):
+        """
+        Tournament selection - several tournaments at once
+        """
+        population = _FakePopulation()
+        population += [
+            _FakeIndividual(fitness=0.1),
+            _FakeIndividual(fitness=0.2),
+            _FakeIndividual(fitness=0.3),
+            _FakeIndividual(fitness=0.4),
+        ]
+        selection = TournamentSelection(size=2)
+        fake_rand = Mock()
+        fake_rand.random_integers.return_value = np.array([
+            [0, 2],
+            [3, 1],
+            [1, 1],
+        ])
+        selection._randomizer = fake_rand
+        self.assertSequenceEqual(
+            [individual.fitness
+             for individual in selection.select(population, 3)],
+            [0.3, 0.4, 0.2])
+
+    def test_select_indices(self):
+        """
+        Tournament selection - population indexes of winners
+        """
+        population = _FakePopulation()
+        population += [
+            _FakeIndividual(fitness=0.1),
+            _FakeIndividual(fitness=0.2),
+            _FakeIndividual(fitness=0.3),
+        ]
+        selection = TournamentSelection(size=2)
+        fake_rand = Mock()
+        fake_rand.random_integers.return_value = np.array([
+            [0, 2],
+            [1, 0],
+        ])
+        selection._randomizer = fake_rand
+        self.assertSequenceEqual(
+            list(selection.select_indices(population, 2)), [2, 1])
+
+
 class RankSelectionTests(unittest.TestCase):
     def test_selection(self):
         """
@@ -110,3 +183,23 @@ class RankSelectionTests(unittest.TestCase):
         # Third
         self.assertEqual(
             selection.run(population).fitness, 0.2)
+
+    def test_select_batch(self):
+        """
+        Rank selection - pick several individuals at once
+        """
+        population = _FakePopulation()
+        population += [
+            _FakeIndividual(fitness=0.4),
+            _FakeIndividual(fitness=0.3),
+            _FakeIndividual(fitness=0.2),
+            _FakeIndividual(fitness=0.1),
+        ]
+        selection = RankSelection()
+        fake_rand = Mock()
+        fake_rand.random_integers.return_value = np.array([6, 4, 8, 1, 10])
+        selection._randomizer = fake_rand
+        self.assertSequenceEqual(
+            [individual.fitness
+             for individual in selection.select(population, 5)],
+            [0.3, 0.4, 0.2, 0.4, 0.1])
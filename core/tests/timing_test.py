@@ -0,0 +1,23 @@
+import unittest
+from mock import patch
+from core.timing import PhaseTimer
+
+
+class PhaseTimerTest(unittest.TestCase):
+    @patch('core.timing.time.time')
+    def test_switch(self, clock):
+        """
+        Phase timer - time is accumulated per phase
+        """
+        clock.side_effect = [0.0, 1.0, 3.0, 3.5, 10.0]
+        timer = PhaseTimer()
+        timer.switch('selection')
+        timer.switch('crossover')
+        timer.switch('selection')
+        timer.stop()
+        # Stopped timer does not count anything
+        timer.stop()
+
+        self.assertEquals(
+            timer.durations, {'selection': 1.5, 'crossover': 2.0})
+        self.assertEquals(timer.record['total'], 3.5)
@@ -0,0 +1,43 @@
+import time
+
+
+class PhaseTimer(object):
+    """
+    Accumulates wall time of named phases, one phase at a time.
+    Switching phases costs a single clock reading, so timers can
+    surround even small per-individual steps.
+
+    timer.switch('selection')
+    ...
+    timer.switch('crossover')
+    ...
+    timer.stop()
+    """
+    def __init__(self):
+        # Seconds by phase name
+        self.durations = {}
+        self._phase = None
+        self._started = None
+
+    def switch(self, phase):
+        """
+        Stop current phase, if any, and start the specified one
+        """
+        now = time.time()
+        if self._phase is not None:
+            self.durations[self._phase] = (
+                self.durations.get(self._phase, 0.0) + now - self._started)
+        self._phase = phase
+        self._started = now
+
+    def stop(self):
+        self.switch(None)
+
+    @property
+    def record(self):
+        """
+        Phase durations together with their total
+        """
+        record = dict(self.durations)
+        record['total'] = sum(self.durations.values())
+        return record
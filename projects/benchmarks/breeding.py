@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Compares per-generation wall time and master time spent breeding
+(selection, crossover, mutation) of master-side breeding against
+breeding by workers from parent indexes. Fitness calculation is simulated
+with a fixed delay, so ranks don't need dedicated cores.
+
+mpirun -n 8 python -m projects.benchmarks.breeding
+mpirun -n 32 python -m projects.benchmarks.breeding
+"""
+import time
+import numpy as np
+from mpi4py import MPI
+from core.algorithm import Algorithm
+from core.chromosomes import RealChromosome
+from core.crossovers import TwoPointCrossover
+from core.individual import Individual
+from core.parallelizer import Parallelizer
+from core.selections import TournamentSelection
+
+
+POPULATION_SIZES = [100, 1000]
+CHROMOSOME_LENGTH = 5000
+TASK_TIME = 0.001
+GENERATIONS = 10
+
+
+class DelayedIndividual(Individual):
+    """
+    Sphere function, takes a fixed time to calculate
+    """
+    def __init__(self, chromosome=None):
+        super(DelayedIndividual, self).__init__(
+            genotype=lambda: RealChromosome(CHROMOSOME_LENGTH, -1.0, 1.0),
+            chromosome=chromosome)
+
+    def _decode(self, chromosome):
+        self.genes = chromosome.to_array()
+
+    def _calculate_fitness(self):
+        time.sleep(TASK_TIME)
+        return -float(np.dot(self.genes, self.genes))
+
+
+def measure(population_size, worker_breeding):
+    with Parallelizer() as parallelizer:
+        if not parallelizer.master_process:
+            return None
+        parallelizer.broadcast(phenotype=DelayedIndividual)
+        algorithm = Algorithm(
+            DelayedIndividual,
+            TwoPointCrossover(rate=0.9),
+            TournamentSelection(size=3),
+            population_size=population_size,
+            mutation_rate=0.01,
+            parallelizer=parallelizer,
+            worker_breeding=worker_breeding)
+
+        wall_times = []
+        breeding_times = []
+        start = time.time()
+        for population, _generation in algorithm.run(GENERATIONS):
+            now = time.time()
+            wall_times.append(now - start)
+            timings = population.timings
+            breeding_times.append(sum(
+                timings.get(phase, 0.0)
+                for phase in ('selection', 'crossover', 'mutation')))
+            start = now
+        # Ignore warm up
+        return np.median(wall_times[1:]), np.median(breeding_times[1:])
+
+
+rows = []
+for population_size in POPULATION_SIZES:
+    master = measure(population_size, False)
+    workers = measure(population_size, True)
+    rows.append((population_size, master, workers))
+
+if MPI.COMM_WORLD.Get_rank() == 0:
+    print "Ranks: %i, fitness time: %.1f ms, chromosome length: %i" % (
+        MPI.COMM_WORLD.Get_size(), TASK_TIME * 1e3, CHROMOSOME_LENGTH)
+    print "Median time per generation (ms): wall / master breeding"
+    print "%10s %20s %20s %8s" % (
+        'population', 'master breeding', 'worker breeding', 'speedup')
+    for population_size, master, workers in rows:
+        print "%10i %9.1f / %8.1f %9.1f / %8.1f %7.2fx" % (
+            population_size, master[0] * 1e3, master[1] * 1e3,
+            workers[0] * 1e3, workers[1] * 1e3, master[0] / workers[0])
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+"""
+Compares pair by pair crossover of chromosomes against 'run_batch'
+on parent genome matrices, for a whole population of offspring.
+
+python -m projects.benchmarks.crossover
+"""
+import time
+import numpy as np
+from core.chromosomes import IntegerChromosome, RealChromosome
+from core.crossovers import OnePointCrossover, TwoPointCrossover
+from core.crossovers import UniformCrossover, WholeArithmeticCrossover
+
+
+PAIR_COUNT = 250
+LENGTHS = [10, 100, 1000]
+REPEATS = 5
+
+
+class _Parent(object):
+    def __init__(self, chromosome):
+        self.chromosome = chromosome
+
+
+def measure(crossover, genotype, length):
+    prototype = genotype(length)
+    genomes1, genomes2 = [
+        np.array([genotype(length).to_array() for _ in xrange(PAIR_COUNT)])
+        for _ in xrange(2)
+    ]
+    pairs = [
+        (_Parent(prototype.from_array(genes1)),
+         _Parent(prototype.from_array(genes2)))
+        for genes1, genes2 in zip(genomes1, genomes2)
+    ]
+
+    start = time.time()
+    for _ in xrange(REPEATS):
+        for parent1, parent2 in pairs:
+            crossover.run(parent1, parent2)
+    pairwise = (time.time() - start) / REPEATS
+
+    start = time.time()
+    for _ in xrange(REPEATS):
+        crossover.run_batch(genomes1, genomes2)
+    batch = (time.time() - start) / REPEATS
+    return pairwise, batch
+
+
+operators = [
+    ('one_point', OnePointCrossover(0.9),
+     lambda length: IntegerChromosome(length, 0, 50)()),
+    ('two_point', TwoPointCrossover(0.9),
+     lambda length: IntegerChromosome(length, 0, 50)()),
+    ('uniform', UniformCrossover(0.9),
+     lambda length: IntegerChromosome(length, 0, 50)()),
+    ('arithmetic', WholeArithmeticCrossover(0.3, 0.9),
+     lambda length: RealChromosome(length, -1.0, 1.0)),
+]
+
+print "Pairs: %i, time per population (ms)" % PAIR_COUNT
+print "%-12s %6s %10s %10s %8s" % (
+    'crossover', 'length', 'pairwise', 'batch', 'speedup')
+for name, crossover, genotype in operators:
+    for length in LENGTHS:
+        pairwise, batch = measure(crossover, genotype, length)
+        print "%-12s %6i %10.2f %10.2f %7.1fx" % (
+            name, length, pairwise * 1e3, batch * 1e3, pairwise / batch)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""
+Compares vectorized chromosome mutation against the gene-by-gene
+loop of baseline commit, at mutation rates used in experiments.
+Baseline chromosomes are loaded unchanged from git history,
+so run it from a git checkout.
+
+python -m projects.benchmarks.mutation
+"""
+import imp
+import subprocess
+import time
+import numpy as np
+from core.chromosomes import BinaryChromosome, IntegerChromosome
+from core.chromosomes import RealChromosome, RealStatChromosome
+
+
+RATES = [0.001, 0.005, 0.01, 0.05, 0.1]
+LENGTH = 100
+REPEATS = 2000
+# Last commit with one random number per gene in 'Chromosome.mutate'
+BASELINE_COMMIT = '8485af9b881f414fe14a3e2aafa536e15d0474d7'
+
+
+def load_baseline():
+    """
+    core.chromosomes module of baseline commit
+    """
+    source = subprocess.check_output(
+        ['git', 'show', BASELINE_COMMIT + ':core/chromosomes.py'])
+    module = imp.new_module('baseline_chromosomes')
+    exec source in module.__dict__
+    return module
+
+
+def measure(chromosome, rate):
+    start = time.time()
+    for _ in xrange(REPEATS):
+        chromosome.mutate(rate)
+    return (time.time() - start) / REPEATS
+
+
+baseline = load_baseline()
+baseline_chromosomes = [
+    baseline.BinaryChromosome(LENGTH),
+    baseline.IntegerChromosome(LENGTH, 0, 50)(),
+    baseline.IntegerChromosome(LENGTH, 0, 50, null_gene_rate=0.1)(),
+    baseline.RealChromosome(LENGTH, -1.0, 1.0),
+    baseline.RealStatChromosome(LENGTH, np.zeros(LENGTH), np.ones(LENGTH)),
+]
+chromosomes = [
+    ('binary', BinaryChromosome(LENGTH)),
+    ('integer', IntegerChromosome(LENGTH, 0, 50)()),
+    ('var_integer', IntegerChromosome(LENGTH, 0, 50, null_gene_rate=0.1)()),
+    ('real', RealChromosome(LENGTH, -1.0, 1.0)),
+    ('real_stat', RealStatChromosome(
+        LENGTH, np.zeros(LENGTH), np.ones(LENGTH))),
+]
+
+print "Chromosome length: %i, time per mutation (us)" % LENGTH
+print "%-12s %6s %10s %10s %8s" % (
+    'type', 'rate', 'baseline', 'vector', 'speedup')
+for (name, chromosome), baseline_chromosome in zip(
+        chromosomes, baseline_chromosomes):
+    for rate in RATES:
+        baseline_time = measure(baseline_chromosome, rate)
+        vector_time = measure(chromosome, rate)
+        print "%-12s %6.3f %10.1f %10.1f %7.1fx" % (
+            name, rate, baseline_time * 1e6, vector_time * 1e6,
+            baseline_time / vector_time)
+
+# Whole population at once
+population_size = 500
+genomes = np.array([
+    BinaryChromosome(LENGTH).to_array()
+    for _ in xrange(population_size)
+])
+prototype = chromosomes[0][1]
+print
+print "Population of %i, binary, time per generation (ms)" % population_size
+for rate in RATES:
+    start = time.time()
+    for _ in xrange(100):
+        for row in genomes:
+            prototype.from_array(row).mutate(rate)
+    per_chromosome = (time.time() - start) / 100
+    start = time.time()
+    for _ in xrange(100):
+        prototype.mutate_array(genomes, rate)
+    per_matrix = (time.time() - start) / 100
+    print "rate %5.3f: per chromosome %8.2f, whole matrix %8.2f" % (
+        rate, per_chromosome * 1e3, per_matrix * 1e3)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Compares per-generation wall time of the blocking master against
+the pipelined one, where offspring are evaluated while the rest of
+population is still being bred. Fitness calculation is simulated
+with a fixed delay, but the master still breeds on the CPU, so only
+runs with a core per rank show the overlap (the output says when
+ranks outnumber cores of this node).
+
+mpirun -n 8 python -m projects.benchmarks.pipelining
+mpirun -n 16 python -m projects.benchmarks.pipelining
+mpirun -n 32 python -m projects.benchmarks.pipelining
+"""
+import time
+import multiprocessing
+import numpy as np
+from mpi4py import MPI
+from core.algorithm import Algorithm
+from core.chromosomes import RealChromosome
+from core.crossovers import WholeArithmeticCrossover
+from core.individual import Individual
+from core.parallelizer import Parallelizer, PipelinedParallelizer
+from core.selections import TournamentSelection
+
+
+CHROMOSOME_LENGTH = 2000
+TASK_TIME = 0.002
+GENERATIONS = 20
+
+
+class DelayedIndividual(Individual):
+    """
+    Sphere function, takes a fixed time to calculate
+    """
+    def __init__(self, chromosome=None):
+        super(DelayedIndividual, self).__init__(
+            genotype=lambda: RealChromosome(CHROMOSOME_LENGTH, -1.0, 1.0),
+            chromosome=chromosome)
+
+    def _decode(self, chromosome):
+        self.genes = chromosome.to_array()
+
+    def _calculate_fitness(self):
+        time.sleep(TASK_TIME)
+        return -float(np.dot(self.genes, self.genes))
+
+
+def measure(parallelizer_class, population_size):
+    with parallelizer_class() as parallelizer:
+        if not parallelizer.master_process:
+            return None
+        parallelizer.broadcast(phenotype=DelayedIndividual)
+        algorithm = Algorithm(
+            DelayedIndividual,
+            WholeArithmeticCrossover(0.3, 0.9),
+            TournamentSelection(size=3),
+            population_size=population_size,
+            mutation_rate=0.01,
+            parallelizer=parallelizer)
+
+        times = []
+        start = time.time()
+        for _population, _generation in algorithm.run(GENERATIONS):
+            now = time.time()
+            times.append(now - start)
+            start = now
+        # Ignore warm up
+        return np.median(times[2:])
+
+
+# Offspring per worker in each generation
+MULTIPLIERS = [2, 8]
+
+worker_count = max(1, MPI.COMM_WORLD.Get_size() - 1)
+rows = []
+for multiplier in MULTIPLIERS:
+    population_size = multiplier * worker_count
+    blocking = measure(Parallelizer, population_size)
+    pipelined = measure(PipelinedParallelizer, population_size)
+    rows.append((population_size, blocking, pipelined))
+
+if MPI.COMM_WORLD.Get_rank() == 0:
+    print "Ranks: %i, fitness time: %.1f ms, chromosome length: %i" % (
+        MPI.COMM_WORLD.Get_size(), TASK_TIME * 1e3, CHROMOSOME_LENGTH)
+    if MPI.COMM_WORLD.Get_size() > multiprocessing.cpu_count():
+        print "Ranks outnumber %i cores, times are not representative" % (
+            multiprocessing.cpu_count())
+    print "Median time per generation (ms)"
+    print "%10s %10s %10s %8s" % (
+        'population', 'blocking', 'pipelined', 'speedup')
+    for population_size, blocking, pipelined in rows:
+        print "%10i %10.2f %10.2f %7.2fx" % (
+            population_size, blocking * 1e3, pipelined * 1e3,
+            blocking / pipelined)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""
+Compares thread and process pools on denoising-like fitness:
+a sequence of scipy.ndimage filters applied to the source image,
+compared against the target image. Threads share both images,
+processes get their own copies once, when the pool starts.
+
+python -m projects.benchmarks.threads
+"""
+import time
+import numpy as np
+import scipy.ndimage as ndimage
+from core.chromosomes import IntegerChromosome
+from core.individual import Individual
+from core.parallelizer import PoolParallelizer, ThreadPoolParallelizer
+from core.population import Population
+
+
+IMAGE_SIZES = [40, 200]
+POPULATION_SIZE = 100
+FILTER_COUNT = 10
+REPEATS = 5
+
+# Kernels releasing the GIL
+FILTERS = [
+    lambda image: ndimage.minimum_filter(image, size=3),
+    lambda image: ndimage.maximum_filter(image, size=3),
+    lambda image: ndimage.grey_erosion(image, size=(3, 3)),
+    lambda image: ndimage.grey_dilation(image, size=(3, 3)),
+    lambda image: np.hypot(
+        ndimage.sobel(image, axis=0), ndimage.sobel(image, axis=1)),
+    lambda image: image - ndimage.laplace(image),
+    lambda image: np.clip(image * 1.1, 0.0, 1.0),
+    lambda image: np.sqrt(np.abs(image)),
+]
+
+
+class FilterSequence(Individual):
+    """
+    Chromosome genes are filter indexes
+    """
+    source_image = None
+    target_image = None
+
+    def __init__(self, chromosome=None):
+        super(FilterSequence, self).__init__(
+            genotype=IntegerChromosome(
+                FILTER_COUNT, 0, len(FILTERS) - 1),
+            chromosome=chromosome)
+
+    def _decode(self, chromosome):
+        self.filters = [FILTERS[gene] for gene in chromosome.to_array()]
+
+    def _calculate_fitness(self):
+        image = self.source_image
+        for image_filter in self.filters:
+            image = image_filter(image)
+        return 1.0 - np.abs(image - self.target_image).mean()
+
+
+def measure(parallelizer_class, processes):
+    with parallelizer_class(processes=processes) as parallelizer:
+        parallelizer.broadcast(phenotype=FilterSequence)
+        population = Population(
+            FilterSequence, size=POPULATION_SIZE, parallelizer=parallelizer)
+
+        # Pool is started by the first batch
+        population.calculate_fitness()
+
+        start = time.time()
+        for _ in xrange(REPEATS):
+            for individual in population:
+                individual.fitness = None
+            population.calculate_fitness()
+        return (time.time() - start) / REPEATS
+
+
+processes = ThreadPoolParallelizer().processes
+print "Workers: %i, population: %i, filters per individual: %i" % (
+    processes, POPULATION_SIZE, FILTER_COUNT)
+print "Time per population evaluation (ms)"
+print "%10s %10s %10s %8s" % ('image', 'processes', 'threads', 'ratio')
+for size in IMAGE_SIZES:
+    random = np.random.RandomState(size)
+    FilterSequence.target_image = random.random_sample((size, size))
+    FilterSequence.source_image = np.clip(
+        FilterSequence.target_image + random.normal(0, 0.1, (size, size)),
+        0.0, 1.0)
+
+    process_time = measure(PoolParallelizer, processes)
+    thread_time = measure(ThreadPoolParallelizer, processes)
+    print "%10s %10.1f %10.1f %7.2fx" % (
+        '%ix%i' % (size, size), process_time * 1e3, thread_time * 1e3,
+        process_time / thread_time)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Compares pickled kwargs messages against typed gene buffers:
+message size per chromosome and round trip time of a trivial task,
+with one and with many chromosomes per message.
+
+mpirun -n 2 python -m projects.benchmarks.transport
+"""
+import time
+import numpy as np
+from mpi4py import MPI
+from core.chromosomes import BinaryChromosome, IntegerChromosome
+from core.chromosomes import RealChromosome
+from core.parallelizer import Parallelizer, parallel_task
+from core.parallelizer import pickle
+
+
+LENGTHS = [10, 100, 1000, 10000]
+REPEATS = 500
+CHUNK_SIZE = 100
+
+
+@parallel_task
+def _gene_count(**kwargs):
+    return len(kwargs['chromosome'])
+
+
+def genotypes(length):
+    return [
+        ('binary', BinaryChromosome(length)),
+        ('integer', IntegerChromosome(length, 0, 255)()),
+        ('real', RealChromosome(length, -1.0, 1.0)),
+    ]
+
+
+def payload_sizes(chromosome):
+    """
+    Bytes sent by 'start_prepared_task' and 'start_array_tasks'
+    """
+    pickled = len(pickle.dumps((
+        0, 0, '_gene_count',
+        pickle.dumps({'chromosome': chromosome}, pickle.HIGHEST_PROTOCOL),
+    ), pickle.HIGHEST_PROTOCOL))
+    typed = 8 * 4 + chromosome.to_wire().nbytes
+    return pickled, typed
+
+
+def check_binary_payload():
+    """
+    Packed bits must not grow on the way to workers
+    """
+    for length in LENGTHS:
+        pickled, typed = payload_sizes(BinaryChromosome(length))
+        assert typed <= pickled, (
+            "Binary chromosome of length %i: typed message %i B, "
+            "pickled %i B" % (length, typed, pickled))
+
+
+def measure(parallelizer, start, task_count):
+    """
+    Seconds per task
+    """
+    repeats = max(1, REPEATS // task_count)
+    start_time = time.time()
+    for _ in xrange(repeats):
+        start(range(task_count))
+        for _ in parallelizer.finished_tasks():
+            pass
+    return (time.time() - start_time) / (repeats * task_count)
+
+
+def compare(parallelizer, chunk_size):
+    print "Ranks: %i, tasks per message: %i, time per task (us)" % (
+        MPI.COMM_WORLD.Get_size(), chunk_size)
+    print "%-8s %6s %10s %10s %10s %10s" % (
+        'type', 'length', 'pickled B', 'typed B', 'pickled', 'typed')
+    for length in LENGTHS:
+        for name, chromosome in genotypes(length):
+            genes = chromosome.to_wire()[np.newaxis].repeat(
+                chunk_size, axis=0)
+            # Distinct objects, otherwise pickle sends just one
+            tasks = [
+                (task_id, {'chromosome': chromosome.from_wire(row)})
+                for task_id, row in enumerate(genes)
+            ]
+            pickled_time = measure(
+                parallelizer,
+                lambda task_ids: parallelizer.start_prepared_tasks(
+                    '_gene_count', tasks),
+                chunk_size)
+            # Same task, another genotype
+            parallelizer.register_genotype('_gene_count', chromosome)
+            typed_time = measure(
+                parallelizer,
+                lambda task_ids: parallelizer.start_array_tasks(
+                    '_gene_count', task_ids, genes, chromosome),
+                chunk_size)
+            pickled_size, typed_size = payload_sizes(chromosome)
+            print "%-8s %6i %10i %10i %10.1f %10.1f" % (
+                name, length, pickled_size, typed_size,
+                pickled_time * 1e6, typed_time * 1e6)
+
+
+check_binary_payload()
+for chunk_size in (1, CHUNK_SIZE):
+    with Parallelizer(chunk_size=chunk_size) as parallelizer:
+        if parallelizer.master_process:
+            compare(parallelizer, chunk_size)
+            print
@@ -3,13 +3,15 @@ import os
 import time
 import json
 import pickle
-import numpy as np
 from bunch import bunchify
 
-from core.algorithm import Algorithm
+from core.algorithm import Algorithm, SteadyStateAlgorithm
 from core.crossovers import get_crossover
 from core.selections import get_selection
-from core.parallelizer import Parallelizer
+from core.parallelizer import get_parallelizer, PoolParallelizer
+from core.fitness_cache import FitnessCache
+from core.checkpoint import Checkpoint
+from core.rng import RandomStreams, MAX_SEED
 from projects.denoising.solution import get_phenotype
 import projects.denoising.neural.solution as neural
 import projects.denoising.imaging.noises as noises
@@ -21,20 +23,19 @@ warnings.filterwarnings('ignore')
 
 
 def run(args):
+    random_streams = None
     if args['rng_freeze'] is True:
-        from core.chromosomes import Chromosome
-        from core.crossovers import Crossover
-        from core.selections import Selection
-
-        Chromosome._randomizer = np.random.RandomState(0)
-        Crossover._randomizer = np.random.RandomState(1)
-        Selection._randomizer = np.random.RandomState(2)
-        noises._rng_seed = 3
+        # Operators and breeding tasks get streams keyed by generation,
+        # so the run does not depend on process count
+        random_streams = RandomStreams(seed=0)
+        random_streams.install('setup')
+        noises._rng_seed = random_streams.stream('noise').randint(MAX_SEED)
 
     #---------------------------------------------------------------------------
     # GA setup
     #---------------------------------------------------------------------------
-    with Parallelizer() as parallelizer:
+    # MPI (default) or local process pool
+    with get_parallelizer(args) as parallelizer:
         if parallelizer.master_process:
             # Create phenotype representing specific problem to solve
             # and distribute copies to workers
@@ -71,15 +72,41 @@ def run(args):
 
             solution = None
 
+            # Reuse fitness of already evaluated chromosomes?
+            fitness_cache = None
+            if args.get('fitness_cache_size'):
+                fitness_cache = FitnessCache(args['fitness_cache_size'])
+
+            # Generational or asynchronous steady state GA
+            algorithm_kwargs = {}
+            if args.get('steady_state') is True:
+                algorithm_class = SteadyStateAlgorithm
+            else:
+                algorithm_class = Algorithm
+                algorithm_kwargs['random_streams'] = random_streams
+
+            # Periodically save state to continue interrupted run
+            checkpoint = None
+            if args.get('checkpoint_file'):
+                checkpoint = Checkpoint(
+                    args['checkpoint_file'],
+                    interval=args.get('checkpoint_interval', 1))
+
             # Start GA
-            algorithm = Algorithm(
+            algorithm = algorithm_class(
                 phenotype=phenotype,
                 crossover=crossover,
                 selection=selection,
                 population_size=args['population_size'],
                 mutation_rate=args['mutation_rate'],
                 elitism_count=args['elite_size'],
-                parallelizer=parallelizer)
+                parallelizer=parallelizer,
+                fitness_cache=fitness_cache,
+                checkpoint=checkpoint,
+                timings_file=args.get('timings_file'),
+                worker_breeding=args.get('worker_breeding', False),
+                batch_breeding=args.get('batch_breeding', False),
+                **algorithm_kwargs)
 
             # Start counting NOW!
             start = time.time()
@@ -100,7 +127,18 @@ def run(args):
                     # 'worst_fitness': population.worst_individual.fitness,
                     'average_fitness': population.average_fitness,
                 }
-                output['iterations'].append(iteration_output)
+                if algorithm_class is Algorithm:
+                    # Selection, crossover, dispatch, waiting...
+                    iteration_output['phases'] = population.timings
+                if algorithm_class is SteadyStateAlgorithm:
+                    iteration_output['evaluations'] = algorithm.evaluations
+                if parallelizer.metrics is not None:
+                    # Worker utilization and traffic of the last batch
+                    iteration_output['parallelizer'] = parallelizer.metrics
+                if population.cache_statistics is not None:
+                    iteration_output['cache_hit_rate'] = \
+                        population.cache_statistics['hit_rate']
+                algorithm.iteration_stats.append(iteration_output)
 
                 solution = population.best_individual
                 if solution.fitness >= args['fitness_threshold']:
@@ -110,6 +148,11 @@ def run(args):
             end = time.time()
             duration = end - start
 
+            # Including iterations done before resuming from checkpoint
+            output['iterations'] = algorithm.iteration_stats
+            if checkpoint is not None:
+                checkpoint.remove()
+
             if 'filter_type' in args and args['filter_type'] == 'mlp':
                 # Get filtered image
                 solution._calculate_fitness()
@@ -143,6 +186,16 @@ def run(args):
                     'iterations': generation,
                 }
 
+            if isinstance(parallelizer, PoolParallelizer):
+                # Iterations carry worker metrics with MPI parallelizers
+                output['results']['parallelizer'] = \
+                    "worker metrics are measured with MPI only"
+
+            if checkpoint is not None:
+                # Snapshots not written to keep saving overhead low
+                output['results']['checkpoint_skipped'] = \
+                    checkpoint.skipped_count
+
             with open(args['output_file'], 'w') as f:
                 json.dump(output, f)
 
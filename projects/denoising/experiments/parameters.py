@@ -49,6 +49,49 @@ def parse_cli_args():
                         action='store', type=int, default=1000)
     parser.add_argument('--rng-freeze',
                         action='store', type=bool, default=False)
+    # Asynchronous steady state GA instead of generational one
+    parser.add_argument('--steady-state',
+                        action='store', type=bool, default=False)
+    # Fitness cache entry count, 0 - no caching
+    parser.add_argument('--fitness-cache-size',
+                        action='store', type=int, default=0)
+    # Distribute fitness calculation through MPI or local processes
+    parser.add_argument('--parallelizer',
+                        action='store', type=str,
+                        choices=(
+                            'mpi',
+                            'hierarchical',
+                            'collective',
+                            'pipelined',
+                            'pool',
+                            'threads'),
+                        default='mpi')
+    # Hierarchical: ranks per sub-master group, 0 - whole node
+    parser.add_argument('--group-size',
+                        action='store', type=int, default=0)
+    # Only relevant to process/thread pools, 0 - one per CPU core
+    parser.add_argument('--processes',
+                        action='store', type=int, default=0)
+    # Send chromosomes to workers as raw gene arrays
+    parser.add_argument('--typed-transport',
+                        action='store', type=bool, default=False)
+    # Re-send fitness tasks slower than this percentile to idle workers
+    parser.add_argument('--speculation-percentile',
+                        action='store', type=float, default=None)
+    # Workers breed offspring from parent indexes, master only selects
+    parser.add_argument('--worker-breeding',
+                        action='store', type=bool, default=False)
+    # Crossover and mutation of all offspring at once, on genome matrix
+    parser.add_argument('--batch-breeding',
+                        action='store', type=bool, default=False)
+    # Write per-worker utilization and message totals on exit
+    parser.add_argument('--metrics-file',
+                        action='store', type=str, default=None)
+    # Save state every N generations to resume interrupted run
+    parser.add_argument('--checkpoint-file',
+                        action='store', type=str, default=None)
+    parser.add_argument('--checkpoint-interval',
+                        action='store', type=int, default=1)
 
     # Filtering params
     parser.add_argument('--noise-type',
@@ -65,6 +108,9 @@ def parse_cli_args():
                         action='store', type=str, default='output.json')
     parser.add_argument('--print-iterations',
                         action='store', type=bool, default=False)
+    # Per-generation phase timings as JSON lines
+    parser.add_argument('--timings-file',
+                        action='store', type=str, default=None)
 
     args = parser.parse_args()
     return args
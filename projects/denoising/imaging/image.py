@@ -30,15 +30,18 @@ class Image(np.ndarray):
 
     def __reduce__(self):
         """
-        Black magic for correct pickling of numpy subclasses
-        http://stackoverflow.com/questions/26598109/preserve-custom-attributes-when-pickling-subclass-of-numpy-array
+        Pickled as plain pixel array, channels and histogram, so that
+        pixels can be broadcasted through shared memory like any other
+        array (see 'Parallelizer.broadcast')
         """
-        pickled_state = super(Image, self).__reduce__()
-        new_state = pickled_state[2] + (self._channels, self._histogram,)
-        return (pickled_state[0], pickled_state[1], new_state)
-        pass
+        return (
+            _rebuild_image,
+            (self.view(np.ndarray), self._channels, self._histogram))
 
     def __setstate__(self, state):
+        """
+        Images pickled before '__reduce__' above
+        """
         self._channels = state[-2]
         self._histogram = state[-1]
         super(Image, self).__setstate__(state[0:-2])
@@ -225,6 +228,18 @@ class Histogram(object):
         return white_hist - black_hist
 
 
+def _rebuild_image(pixels, channels, histogram):
+    """
+    Image viewing the same pixels, without recalculating histogram
+    """
+    image = np.ndarray.__new__(
+        Image, pixels.shape, pixels.dtype,
+        buffer=np.ascontiguousarray(pixels))
+    image.channels = channels
+    image.histogram = histogram
+    return image
+
+
 class _Channels(object):
     """
     Helper class for convenient access of separate color channels (ie. RGB)
@@ -71,9 +71,10 @@ class _FilterSequence(Individual):
         """
         Collect filter calls by indexes from integer chromosome
         """
+        filter_calls = self.filter_calls
         self.filter_sequence = [
-            self.filter_calls[int(idx)]
-            for idx in chromosome
+            filter_calls[idx]
+            for idx in chromosome.active_genes().tolist()
         ]
         return self
 
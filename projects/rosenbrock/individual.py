@@ -1,4 +1,3 @@
-import numpy as np
 from core.individual import Individual
 from core.chromosomes import BinaryChromosome
 
@@ -14,11 +13,7 @@ class RosenbrockSolution(Individual):
     print STEP_X
 
     def _decode(self, chromosome):
-        length = self.VAR_LENGTH
-        binary_x = chromosome[0:length]
-        binary_y = chromosome[length:length * 2]
-        int_x = self.binary_to_int(binary_x)
-        int_y = self.binary_to_int(binary_y)
+        int_x, int_y = chromosome.to_ints(self.VAR_LENGTH)
         self.x = self.MIN_X + (int_x * self.STEP_X)
         self.y = self.MIN_Y + (int_y * self.STEP_Y)
 
@@ -30,14 +25,6 @@ class RosenbrockSolution(Individual):
     def _initialize_chromosome(self):
         return BinaryChromosome(RosenbrockSolution.VAR_LENGTH * 2)
 
-    def binary_to_int(self, binary):
-        # Convert gray coding to int
-        i = 0
-        for bit in binary:
-            i = i * 2 + bit
-        # print i
-        return i
-
     def __repr__(self):
         res = "X=" + "{:1.5f}".format(self.x)
         res += ", Y=" + "{:1.5f}".format(self.y)
@@ -53,15 +40,13 @@ class _RosenbrockSolution(Individual):
         """
         Decodes chromosome to set x and y
         """
-        length = RosenbrockSolution.VAR_LENGTH
-        binary_x = chromosome[0:length]
-        binary_y = chromosome[length:length * 2]
-        self.x = self._binary_to_real(
-            binary_x,
+        int_x, int_y = chromosome.to_ints(RosenbrockSolution.VAR_LENGTH)
+        self.x = self._int_to_real(
+            int_x,
             RosenbrockSolution.MIN_X,
             RosenbrockSolution.MAX_X)
-        self.y = self._binary_to_real(
-            binary_y,
+        self.y = self._int_to_real(
+            int_y,
             RosenbrockSolution.MIN_Y,
             RosenbrockSolution.MAX_Y)
 
@@ -83,10 +68,8 @@ class _RosenbrockSolution(Individual):
         res = scale_top * (value - min_val) / (max_val - min_val)
         return "{0:b}".format(int(res))
 
-    def _binary_to_real(self, value, min_val, max_val):
-        if isinstance(value, np.ndarray):
-            value = ''.join([str(c) for c in value])
-        value = float(int(value, 2))
+    def _int_to_real(self, value, min_val, max_val):
+        value = float(value)
         scale_top = 2 ** RosenbrockSolution.VAR_LENGTH
         res = (value * (max_val - min_val)) / scale_top + min_val
         return res